@@ -0,0 +1,170 @@
+import threading
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+
+@dataclass(slots=True)
+class UserAction:
+    timestamp: datetime
+    action_type: str
+    window_title: str
+    process_name: str
+    extra_data: Dict = None
+
+
+class StringTable:
+    """Intern repeated strings (window titles, process names) as small integer ids"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._strings: List[str] = []
+
+    def intern(self, value: str) -> int:
+        index = self._ids.get(value)
+        if index is None:
+            index = len(self._strings)
+            self._ids[value] = index
+            self._strings.append(value)
+        return index
+
+    def lookup(self, value: str) -> Optional[int]:
+        return self._ids.get(value)
+
+    def __getitem__(self, index: int) -> str:
+        return self._strings[index]
+
+    def __len__(self):
+        return len(self._strings)
+
+
+class ActionHistory:
+    """Fixed-capacity ring buffer of user actions stored column by column
+
+    Timestamps live in a float array and strings are interned into int
+    columns, so appends are O(1) and queries by time, window or process
+    run over contiguous arrays. UserAction objects are only built on read.
+    """
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self._timestamps = array('d', bytes(8 * capacity))
+        self._types = array('i', bytes(4 * capacity))
+        self._windows = array('i', bytes(4 * capacity))
+        self._processes = array('i', bytes(4 * capacity))
+        self._extra: List[Optional[Dict]] = [None] * capacity
+        self._strings = StringTable()
+        self._start = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def _slot(self, index: int) -> int:
+        """Physical slot of the index-th oldest action"""
+        return (self._start + index) % self.capacity
+
+    def append(self, action: UserAction):
+        """Add an action, overwriting the oldest one when full"""
+        self.append_values(action.timestamp.timestamp(), action.action_type,
+                           action.window_title, action.process_name, action.extra_data)
+
+    def append_values(self, timestamp: float, action_type: str, window_title: str,
+                      process_name: str, extra_data: Optional[Dict] = None):
+        with self._lock:
+            if self._size == self.capacity:
+                slot = self._start
+                self._start = (self._start + 1) % self.capacity
+            else:
+                slot = self._slot(self._size)
+                self._size += 1
+            self._timestamps[slot] = timestamp
+            self._types[slot] = self._strings.intern(action_type)
+            self._windows[slot] = self._strings.intern(window_title)
+            self._processes[slot] = self._strings.intern(process_name)
+            self._extra[slot] = extra_data
+            # Titles change constantly, so drop strings no longer referenced
+            if len(self._strings) > 4 * self.capacity:
+                self._compact_strings()
+
+    def _compact_strings(self):
+        old = self._strings
+        self._strings = StringTable()
+        for column in (self._types, self._windows, self._processes):
+            for i in range(self._size):
+                slot = self._slot(i)
+                column[slot] = self._strings.intern(old[column[slot]])
+
+    def _build(self, slot: int) -> UserAction:
+        return UserAction(
+            timestamp=datetime.fromtimestamp(self._timestamps[slot]),
+            action_type=self._strings[self._types[slot]],
+            window_title=self._strings[self._windows[slot]],
+            process_name=self._strings[self._processes[slot]],
+            extra_data=self._extra[slot]
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._build(self._slot(i)) for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("action history index out of range")
+        return self._build(self._slot(index))
+
+    def __iter__(self) -> Iterator[UserAction]:
+        for i in range(self._size):
+            yield self._build(self._slot(i))
+
+    def recent(self, limit: int = 5) -> List[UserAction]:
+        """The newest limit actions, oldest first"""
+        with self._lock:
+            return self[max(0, self._size - limit):]
+
+    def _logical_order(self, slots: np.ndarray) -> np.ndarray:
+        """Sort physical slots from oldest to newest"""
+        return slots[np.argsort((slots - self._start) % self.capacity, kind='stable')]
+
+    def _column(self, column: array) -> np.ndarray:
+        return np.frombuffer(column, dtype=np.int32 if column.typecode == 'i' else np.float64)
+
+    def _query(self, mask: np.ndarray) -> List[UserAction]:
+        slots = np.flatnonzero(mask)
+        if self._size < self.capacity:
+            # Only the first _size slots hold live actions before the buffer wraps
+            slots = slots[slots < self._size]
+        return [self._build(int(slot)) for slot in self._logical_order(slots)]
+
+    def between(self, start: datetime, end: datetime) -> List[UserAction]:
+        """Actions with start <= timestamp <= end"""
+        timestamps = self._column(self._timestamps)
+        with self._lock:
+            return self._query((timestamps >= start.timestamp()) & (timestamps <= end.timestamp()))
+
+    def for_window(self, window_title: str) -> List[UserAction]:
+        """Actions that happened in the window with this title"""
+        with self._lock:
+            index = self._strings.lookup(window_title)
+            if index is None:
+                return []
+            return self._query(self._column(self._windows) == index)
+
+    def for_process(self, process_name: str) -> List[UserAction]:
+        """Actions that happened in windows of this process"""
+        with self._lock:
+            index = self._strings.lookup(process_name)
+            if index is None:
+                return []
+            return self._query(self._column(self._processes) == index)
+
+    def clear(self):
+        with self._lock:
+            self._start = 0
+            self._size = 0
+            self._extra = [None] * self.capacity
+            self._strings = StringTable()
@@ -0,0 +1,329 @@
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+
+from capture import CaptureBackend, create_capture_backend
+from perf import perf
+from preprocessing import Preprocessor
+from region_store import text_lines
+
+
+class AnalysisCancelled(Exception):
+    """Raised inside a job when a newer analysis superseded it"""
+
+
+class AnalysisSignals(QObject):
+    """Signals a job emits from its worker thread"""
+    progress = Signal(int, str, float)  # job id, stage name, stage time in ms
+    finished = Signal(int, dict)
+    failed = Signal(int, str)
+
+
+class LLMSignals(QObject):
+    """Carry LLMService callbacks from its streaming thread to the GUI thread"""
+    token = Signal(int, str)  # request id, text chunk
+    done = Signal(int, bool)  # request id, answered from the cache
+    failed = Signal(int, str)
+
+
+class AnalysisJob(QRunnable):
+    """Grab, preprocess and OCR one window off the GUI thread
+
+    Given a full-screen frame from the frame history (with its capture
+    time and origin), the window is cut out of it instead of grabbed live.
+    By default the window is OCR'd as plain text. Passing a window_key opts
+    a live grab into the ContextManager's region tracker instead: text that
+    only scrolled since that window's last analysis is not OCR'd again, the
+    text is built from the detected regions and the result lists the lines
+    that are new.
+    """
+
+    def __init__(self, job_id: int, rect: Tuple[int, int, int, int], title: str,
+                 context_manager, signals: AnalysisSignals, capture: CaptureBackend,
+                 capture_lock: threading.Lock, preprocessors: threading.local,
+                 frame=None, captured_at: Optional[float] = None,
+                 frame_origin: Tuple[int, int] = (0, 0),
+                 window_key: Optional[Hashable] = None):
+        super().__init__()
+        self.frame = frame
+        self.frame_origin = frame_origin
+        self.window_key = window_key
+        self.captured_at = captured_at
+        self.job_id = job_id
+        self.capture = capture
+        self.capture_lock = capture_lock
+        self.preprocessors = preprocessors
+        self.rect = rect
+        self.title = title
+        self.context_manager = context_manager
+        self.signals = signals
+        self.cancelled = threading.Event()
+        self.timings: Dict[str, float] = {}
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _stage_done(self, stage: str, started: float):
+        """Record a stage's duration and stop if the job was cancelled meanwhile"""
+        elapsed = (time.perf_counter() - started) * 1000
+        self.timings[stage] = elapsed
+        perf.record(f"analysis.{stage}", elapsed)
+        if self.cancelled.is_set():
+            raise AnalysisCancelled()
+        self.signals.progress.emit(self.job_id, stage, elapsed)
+
+    def _preprocessor(self) -> Preprocessor:
+        # Preprocessor buffers are reused, so each pool thread keeps its own
+        preprocessor = getattr(self.preprocessors, "instance", None)
+        if preprocessor is None:
+            preprocessor = Preprocessor()
+            self.preprocessors.instance = preprocessor
+        return preprocessor
+
+    def run(self):
+        try:
+            if self.cancelled.is_set():
+                return
+
+            # Take screenshot of just the selected window; the capture buffer
+            # is shared, so preprocess it before releasing it
+            started = time.perf_counter()
+            tracking = self.frame is None and self.window_key is not None
+            if self.frame is not None:
+                # Window rects are in screen coordinates, the frame starts at its origin
+                x, y = self.frame_origin
+                left, top, right, bottom = self.rect
+                left, top, right, bottom = left - x, top - y, right - x, bottom - y
+                height, width = self.frame.shape[:2]
+                frame = self.frame[max(0, top):min(height, bottom), max(0, left):min(width, right)]
+                if not frame.size:
+                    raise RuntimeError("Window is outside the recorded frame")
+                size = (frame.shape[1], frame.shape[0])
+                self._stage_done("history", started)
+                started = time.perf_counter()
+                binary = self._preprocessor().run(frame).text_binary
+            elif tracking:
+                with self.capture_lock:
+                    frame = self.capture.grab(bbox=self.rect)
+                    if frame is None:
+                        raise RuntimeError("Window capture returned no frame")
+                    # The capture buffer is shared and tracking takes a while
+                    frame = frame.copy()
+                size = (frame.shape[1], frame.shape[0])
+                self._stage_done("grab", started)
+            else:
+                with self.capture_lock:
+                    frame = self.capture.grab(bbox=self.rect)
+                    if frame is None:
+                        raise RuntimeError("Window capture returned no frame")
+                    size = (frame.shape[1], frame.shape[0])
+                    self._stage_done("grab", started)
+
+                    # Grayscale, blur and Otsu in one pass into reused buffers
+                    started = time.perf_counter()
+                    binary = self._preprocessor().run(frame).text_binary
+
+            new_text = None
+            if tracking:
+                # Regions and OCR text of what only scrolled are carried over
+                started = time.perf_counter()
+                tracked = self.context_manager.track_screenshot(frame, self.window_key)
+                text = "\n".join(text_lines(tracked.regions))
+                # Everything is new on a window's first analysis or a full redraw
+                new_text = tracked.new_text if tracked.reused else None
+                self._stage_done("track", started)
+            else:
+                self._stage_done("preprocess", started)
+
+                # OCR through the shared result cache
+                started = time.perf_counter()
+                text = self.context_manager.ocr_text(binary)
+                self._stage_done("ocr", started)
+
+            # Make the text searchable later; historical text would be
+            # indexed as seen now, so it is left out
+            if self.captured_at is None:
+                started = time.perf_counter()
+                self.context_manager.index_text(self.title, text, self.rect)
+                self._stage_done("index", started)
+
+            self.signals.finished.emit(self.job_id, {
+                "title": self.title,
+                "rect": self.rect,
+                "text": text,
+                "size": size,
+                "captured_at": self.captured_at,
+                "new_text": new_text,
+                "timings": dict(self.timings),
+            })
+        except AnalysisCancelled:
+            pass
+        except Exception as e:
+            self.signals.failed.emit(self.job_id, str(e))
+
+
+class MultiAnalysisJob(QRunnable):
+    """Analyze several windows or monitors at once on the process pool
+
+    analyzer returns the MultiAnalyzer; it is called on the job's thread,
+    so starting the pool never blocks the GUI.
+    """
+
+    def __init__(self, job_id: int, targets: Sequence, analyzer: Callable,
+                 signals: AnalysisSignals, capture_lock: threading.Lock):
+        super().__init__()
+        self.job_id = job_id
+        self.targets = list(targets)
+        self.analyzer = analyzer
+        self.signals = signals
+        self.capture_lock = capture_lock
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _target_done(self, label: str, elapsed: float):
+        perf.record("analysis.multi_target", elapsed)
+        self.signals.progress.emit(self.job_id, label, elapsed)
+
+    def run(self):
+        try:
+            if self.cancelled.is_set():
+                return
+            result = self.analyzer().analyze(self.targets, capture_lock=self.capture_lock,
+                                             on_target_done=self._target_done,
+                                             cancelled=self.cancelled.is_set)
+            if result is None:
+                return
+            perf.record("analysis.multi_total", result["timings"]["total"])
+            self.signals.finished.emit(self.job_id, result)
+        except Exception as e:
+            self.signals.failed.emit(self.job_id, str(e))
+
+
+class AnalysisController(QObject):
+    """Run window analyses on a thread pool, keeping only the latest one alive
+
+    Requests arriving within coalesce_ms of each other are merged into one
+    job, and starting a job cancels whichever job is still in flight.
+    """
+    progress = Signal(str, float)
+    finished = Signal(dict)
+    failed = Signal(str)
+
+    def __init__(self, context_manager, coalesce_ms: int = 250,
+                 capture: Optional[CaptureBackend] = None, parent=None):
+        super().__init__(parent)
+        self.context_manager = context_manager
+        self.capture = capture or create_capture_backend()
+        self.capture_lock = threading.Lock()
+        self.preprocessors = threading.local()
+        self.pool = QThreadPool(self)
+        # Leave room for a cancelled job to wind down while the next one starts
+        self.pool.setMaxThreadCount(2)
+        self.signals = AnalysisSignals()
+        self.signals.progress.connect(self._on_progress)
+        self.signals.finished.connect(self._on_finished)
+        self.signals.failed.connect(self._on_failed)
+
+        self._coalesce_timer = QTimer(self)
+        self._coalesce_timer.setSingleShot(True)
+        self._coalesce_timer.setInterval(coalesce_ms)
+        self._coalesce_timer.timeout.connect(self._start_pending)
+
+        # Builds the next job from its id
+        self._pending: Optional[Callable[[int], QRunnable]] = None
+        self._current: Optional[QRunnable] = None
+        self._next_id = 0
+        self._multi_analyzer = None
+        self._multi_lock = threading.Lock()
+
+    def request(self, rect: Tuple[int, int, int, int], title: str, frame=None,
+                captured_at: Optional[float] = None, frame_origin: Tuple[int, int] = (0, 0),
+                window_key: Optional[Hashable] = None):
+        """Queue an analysis, restarting the coalescing window
+
+        Pass a full-screen frame (e.g. from FrameHistory) to analyze the
+        window as it was then instead of grabbing it now; frame_origin is
+        the screen position of its top-left pixel. Only pass a window_key
+        (such as the window handle) to track regions across analyses of
+        that window; see AnalysisJob.
+        """
+        perf.count("analysis.requests")
+        self._pending = lambda job_id: AnalysisJob(
+            job_id, rect, title, self.context_manager, self.signals,
+            self.capture, self.capture_lock, self.preprocessors,
+            frame=frame, captured_at=captured_at, frame_origin=frame_origin,
+            window_key=window_key)
+        self._coalesce_timer.start()
+
+    def request_multi(self, targets: Sequence):
+        """Queue an analysis of several multi_analysis.AnalysisTargets in parallel"""
+        perf.count("analysis.requests")
+        self._pending = lambda job_id: MultiAnalysisJob(
+            job_id, targets, self.multi_analyzer, self.signals, self.capture_lock)
+        self._coalesce_timer.start()
+
+    def multi_analyzer(self):
+        """The process pool for multi-target analyses, started on first use
+
+        Called from pool threads; it imports multi_analysis and starts the
+        worker processes, so keep it off the GUI thread.
+        """
+        with self._multi_lock:
+            if self._multi_analyzer is None:
+                from multi_analysis import MultiAnalyzer
+                self._multi_analyzer = MultiAnalyzer(self.capture,
+                                                     roi_ocr=self.context_manager.roi_ocr)
+            return self._multi_analyzer
+
+    def close(self):
+        self.cancel()
+        with self._multi_lock:
+            if self._multi_analyzer is not None:
+                self._multi_analyzer.close()
+                self._multi_analyzer = None
+
+    def cancel(self):
+        """Drop any pending request and cancel the running job"""
+        self._pending = None
+        self._coalesce_timer.stop()
+        if self._current is not None:
+            self._current.cancel()
+            self._current = None
+
+    def is_running(self) -> bool:
+        return self._current is not None
+
+    def _start_pending(self):
+        if self._pending is None:
+            return
+        make_job = self._pending
+        self._pending = None
+        if self._current is not None:
+            self._current.cancel()
+            perf.count("analysis.cancelled")
+
+        self._next_id += 1
+        job = make_job(self._next_id)
+        self._current = job
+        self.pool.start(job)
+
+    def _is_current(self, job_id: int) -> bool:
+        return self._current is not None and self._current.job_id == job_id
+
+    def _on_progress(self, job_id: int, stage: str, elapsed_ms: float):
+        if self._is_current(job_id):
+            self.progress.emit(stage, elapsed_ms)
+
+    def _on_finished(self, job_id: int, result: dict):
+        if self._is_current(job_id):
+            self._current = None
+            self.finished.emit(result)
+
+    def _on_failed(self, job_id: int, message: str):
+        if self._is_current(job_id):
+            self._current = None
+            self.failed.emit(message)
@@ -0,0 +1,798 @@
+import os
+import sys
+import time
+from datetime import datetime
+from PySide6.QtWidgets import (QApplication, QMainWindow, QSystemTrayIcon, 
+                              QMenu, QStyle, QVBoxLayout, QWidget, 
+                              QTextEdit, QPushButton, QLabel, QHBoxLayout,
+                              QComboBox, QToolButton, QPlainTextEdit, QSlider) 
+from PySide6.QtGui import QIcon, QPixmap, QPainter, QFontDatabase, QTextCursor
+from PySide6.QtCore import Qt, QTimer, QRectF, QEvent
+from capture_scheduler import CaptureScheduler
+from perf import StartupTimer, format_snapshot, perf
+
+# cv2, numpy, OCR, win32 and pynput are imported in finish_startup(), after
+# the tray icon is up, or on first use
+
+class ScreenAssistant(QMainWindow):
+    def __init__(self, startup: StartupTimer = None):
+        super().__init__()
+        self.startup = startup or StartupTimer()
+        # Filled in by finish_startup()
+        self.capture = None
+        self.change_detector = None
+        self.context_manager = None
+        self.capture_scheduler = None
+        self.analysis = None
+        self.llm = None
+        self.frame_history = None
+        # (capture time, frame, origin) shown instead of the live preview while scrubbing
+        self._scrub_frame = None
+        self._scrub_origin = time.time()
+        # SCREEN_ASSISTANT_TRACK_WINDOWS=1 analyzes windows through the region tracker
+        self._track_windows = os.environ.get("SCREEN_ASSISTANT_TRACK_WINDOWS", "") not in ("", "0")
+        self.active = True
+        self.last_dirty_rects = []
+        self._preview_pixmap = None
+        self._preview_size = None
+        with self.startup.phase("ui"):
+            self.initUI()
+            self.setupPerfPanel()
+        self.startup.mark("tray_visible")
+        self.status_label.setText("Screen Assistant Starting...")
+        QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """Load the capture/OCR pipeline once the event loop is running"""
+        startup = self.startup
+        with startup.phase("import_pipeline"):
+            from context_manager import ContextManager
+            from analysis_worker import AnalysisController
+            from change_detector import ChangeDetector
+            from capture import create_capture_backend
+            from frame_history import FrameHistory
+            from journal import default_journal_dir
+            from text_index import default_index_dir
+        with startup.phase("hotkeys"):
+            self.setupHotkeys()
+        with startup.phase("capture_backend"):
+            self.capture = create_capture_backend()
+            self.change_detector = ChangeDetector()
+            self.frame_history = FrameHistory()
+        with startup.phase("context_manager"):
+            # Input listeners start in start_tracking(), one event loop turn later
+            self.context_manager = ContextManager(start_tracking=False,
+                                                  journal_dir=default_journal_dir(),
+                                                  text_index_dir=default_index_dir())
+            self.context_manager.warm_up_ocr(on_ready=self._on_ocr_ready)
+        with startup.phase("scheduler"):
+            self.setupScreenCapture()
+        with startup.phase("analysis"):
+            self.analysis = AnalysisController(self.context_manager, parent=self)
+            self.setupAnalysis()
+        with startup.phase("window_list"):
+            # The combo box follows registry diffs; window events keep it
+            # current once tracking starts
+            registry = self.context_manager.window_registry
+            registry.exclude_titles.add('Screen Assistant')  # Skip our own window
+            registry.listeners.append(self.apply_window_diff)
+            registry.refresh()
+        startup.mark("pipeline_ready")
+        self.status_label.setText(
+            "Screen Assistant Active" if self.active else "Screen Assistant Paused")
+        QTimer.singleShot(0, self.start_tracking)
+
+    def start_tracking(self):
+        with self.startup.phase("input_listeners"):
+            self.context_manager.setup_tracking()
+        self.startup.mark("listeners_started")
+        print(self.startup.report())
+
+    def _on_ocr_ready(self, error):
+        # Called on the warm-up thread; only records and prints
+        elapsed = self.startup.mark("ocr_ready")
+        if error is None:
+            print(f"OCR engine ready {elapsed:.0f} ms after start")
+        
+    def initUI(self):
+        # Create main widget and layout
+        main_widget = QWidget()
+        self.setCentralWidget(main_widget)
+        layout = QVBoxLayout(main_widget)
+        
+        # Add UI elements
+        self.status_label = QLabel("Screen Assistant Active")
+        self.status_label.setStyleSheet("font-size: 14px; font-weight: bold;")
+        
+        selector_layout = QHBoxLayout()
+        self.window_selector = QComboBox()
+        self.window_selector.setMinimumWidth(200)
+        self.refresh_windows_button = QPushButton("Refresh Windows")
+        self.refresh_windows_button.clicked.connect(self.update_window_list)
+        selector_layout.addWidget(QLabel("Select Window:"))
+        selector_layout.addWidget(self.window_selector)
+        selector_layout.addWidget(self.refresh_windows_button)
+        selector_layout.addStretch()
+
+        # Create horizontal layout for preview and input
+        h_layout = QHBoxLayout()
+        
+        # Left side - Preview section
+        preview_layout = QVBoxLayout()
+        self.preview_label = QLabel("Screen Preview")
+        self.preview_label.setStyleSheet("font-weight: bold;")
+        self.image_label = QLabel()
+        self.image_label.setMinimumSize(400, 300)
+        self.image_label.setStyleSheet("border: 1px solid gray;")
+        self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        preview_layout.addWidget(self.preview_label)
+        preview_layout.addWidget(self.image_label)
+        
+        # Scrub back through the frame history; the right end is live
+        scrub_layout = QHBoxLayout()
+        self.scrub_slider = QSlider(Qt.Orientation.Horizontal)
+        self.scrub_slider.setEnabled(False)
+        self.scrub_slider.valueChanged.connect(self.scrub_history)
+        self.scrub_label = QLabel("Live")
+        self.live_button = QPushButton("Live")
+        self.live_button.clicked.connect(self.show_live_preview)
+        scrub_layout.addWidget(self.scrub_slider)
+        scrub_layout.addWidget(self.scrub_label)
+        scrub_layout.addWidget(self.live_button)
+        preview_layout.addLayout(scrub_layout)
+        
+        # Right side - Input/Output section
+        input_layout = QVBoxLayout()
+        self.input_box = QTextEdit()
+        self.input_box.setPlaceholderText("Type your question here...")
+        self.input_box.setMinimumHeight(100)
+        
+        self.analyze_button = QPushButton("Analyze (Mock Response)")
+        self.analyze_button.setStyleSheet("font-size: 12px; padding: 5px;")
+        
+        # Analyze several windows or every monitor at once on a process pool
+        self.analyze_multi_button = QPushButton("Analyze Several")
+        self.analyze_multi_button.setStyleSheet("font-size: 12px; padding: 5px;")
+        analyze_multi_menu = QMenu(self.analyze_multi_button)
+        analyze_multi_menu.addAction("Recently used windows").triggered.connect(
+            self.analyze_recent_windows)
+        analyze_multi_menu.addAction("All monitors").triggered.connect(self.analyze_monitors)
+        self.analyze_multi_button.setMenu(analyze_multi_menu)
+        
+        # Search everything OCR has seen, using the input box as the query
+        search_layout = QHBoxLayout()
+        self.search_button = QPushButton("Search History")
+        self.search_range = QComboBox()
+        self.search_range.addItem("Last hour", 3600)
+        self.search_range.addItem("Last 24 hours", 86400)
+        self.search_range.addItem("All time", None)
+        search_layout.addWidget(self.search_button)
+        search_layout.addWidget(self.search_range)
+        self.analysis_status_label = QLabel("")
+        
+        self.output_box = QTextEdit()
+        self.output_box.setReadOnly(True)
+        self.output_box.setMinimumHeight(200)
+        self.output_box.setPlaceholderText("Analysis results will appear here...")
+        
+        input_layout.addWidget(self.input_box)
+        analyze_layout = QHBoxLayout()
+        analyze_layout.addWidget(self.analyze_button)
+        analyze_layout.addWidget(self.analyze_multi_button)
+        input_layout.addLayout(analyze_layout)
+        input_layout.addLayout(search_layout)
+        input_layout.addWidget(self.analysis_status_label)
+        input_layout.addWidget(self.output_box)
+        
+        # Collapsible live stage timings, counters and memory gauges
+        self.perf_toggle = QToolButton()
+        self.perf_toggle.setText("Performance")
+        self.perf_toggle.setCheckable(True)
+        self.perf_toggle.setToolButtonStyle(Qt.ToolButtonStyle.ToolButtonTextBesideIcon)
+        self.perf_toggle.setArrowType(Qt.ArrowType.RightArrow)
+        self.perf_view = QPlainTextEdit()
+        self.perf_view.setReadOnly(True)
+        self.perf_view.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        self.perf_view.setMinimumHeight(180)
+        self.perf_view.setVisible(False)
+        input_layout.addWidget(self.perf_toggle)
+        input_layout.addWidget(self.perf_view)
+        
+
+        layout.addLayout(selector_layout)
+        layout.addLayout(h_layout)
+        # Add layouts to horizontal layout
+        h_layout.addLayout(preview_layout)
+        h_layout.addLayout(input_layout)
+        
+        # Add all to main layout
+        layout.addWidget(self.status_label)
+        layout.addLayout(h_layout)
+        
+        # Connect button
+        self.analyze_button.clicked.connect(self.mock_analysis)
+        self.search_button.clicked.connect(self.search_history)
+        
+        # Create system tray icon
+        self.tray_icon = QSystemTrayIcon(self)
+        icon = QIcon(self.style().standardPixmap(QStyle.StandardPixmap.SP_ComputerIcon))
+        self.tray_icon.setIcon(icon)
+        
+        # Create tray menu
+        tray_menu = QMenu()
+        show_action = tray_menu.addAction("Show Window")
+        show_action.triggered.connect(self.show_window)
+        self.toggle_action = tray_menu.addAction("Pause")
+        self.toggle_action.triggered.connect(self.toggleService)
+        quit_action = tray_menu.addAction("Quit")
+        quit_action.triggered.connect(QApplication.instance().quit)
+        QApplication.instance().aboutToQuit.connect(self.shutdown)
+        
+        self.tray_icon.setContextMenu(tray_menu)
+        self.tray_icon.activated.connect(self.tray_icon_clicked)
+        self.tray_icon.show()
+        
+        # Set window properties
+        self.setWindowTitle('Screen Assistant')
+        self.setGeometry(100, 100, 1200, 800)  # Made window larger for preview
+        self.setWindowFlags(Qt.WindowType.Window)
+        print("UI initialized successfully")
+
+        
+        
+    def update_preview(self):
+        """Update the preview image and return the captured BGRA frame
+        
+        The frame is a view over the capture backend's buffer and is only
+        valid until the next grab.
+        """
+        if self.capture is None:
+            return None
+        try:
+            with perf.stage("preview.total"):
+                return self._update_preview()
+        except Exception as e:
+            print(f"Error updating preview: {e}")
+            return None
+
+    def _update_preview(self):
+        from capture import frame_to_qimage
+        # Capture screen into the backend's reusable buffer
+        with perf.stage("preview.grab"):
+            frame = self.capture.grab()
+        if frame is None:
+            return None
+        
+        # Skip all conversion and scaling work when nothing changed
+        with perf.stage("preview.change_detect"):
+            self.last_dirty_rects = self.change_detector.detect(frame)
+        # Keep changed tiles for scrubbing back; unchanged frames cost nothing.
+        # Compression runs on the history's writer thread, on a copy
+        if self.last_dirty_rects:
+            with perf.stage("preview.history"):
+                self.frame_history.add_async(frame, dirty_rects=self.last_dirty_rects,
+                                             origin=self.capture.origin)
+            self._update_scrub_range()
+        if self._scrub_frame is not None:
+            # A historical frame is on show
+            return frame
+        target_size = self.image_label.size()
+        if (self._preview_pixmap is not None and
+                self._preview_size == target_size and
+                not self.last_dirty_rects):
+            perf.count("preview.frames_skipped")
+            return frame
+        perf.count("preview.frames_rendered")
+        
+        # Wrap the frame for Qt without copying; scale before converting
+        # to a pixmap so only the small preview is copied
+        height, width = frame.shape[:2]
+        image = frame_to_qimage(frame)
+        
+        if (self._preview_pixmap is None or self._preview_size != target_size or
+                self.change_detector.dirty_fraction() > 0.5):
+            # Scale to fit preview maintaining aspect ratio
+            with perf.stage("preview.scale"):
+                scaled = image.scaled(target_size,
+                                      Qt.AspectRatioMode.KeepAspectRatio,
+                                      Qt.TransformationMode.SmoothTransformation)
+                self._preview_pixmap = QPixmap.fromImage(scaled)
+            self._preview_size = target_size
+        else:
+            # Repaint only the tiles that changed onto the scaled preview
+            with perf.stage("preview.repaint"):
+                scale = self._preview_pixmap.width() / width
+                painter = QPainter(self._preview_pixmap)
+                painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+                for x, y, w, h in self.last_dirty_rects:
+                    painter.drawImage(QRectF(x * scale, y * scale, w * scale, h * scale),
+                                      image, QRectF(x, y, w, h))
+                painter.end()
+        
+        self.image_label.setPixmap(self._preview_pixmap)
+        return frame
+        
+    def _scrub_value(self, timestamp: float) -> int:
+        # Slider units are tenths of a second since startup, so values stay
+        # put when old frames are evicted
+        return int((timestamp - self._scrub_origin) * 10)
+
+    def _update_scrub_range(self):
+        time_range = self.frame_history.time_range()
+        if time_range is None:
+            return
+        self.scrub_slider.blockSignals(True)
+        self.scrub_slider.setRange(self._scrub_value(time_range[0]),
+                                   self._scrub_value(time_range[1]))
+        if self._scrub_frame is None:
+            self.scrub_slider.setValue(self.scrub_slider.maximum())
+        self.scrub_slider.blockSignals(False)
+        self.scrub_slider.setEnabled(self.scrub_slider.maximum() > self.scrub_slider.minimum())
+
+    def scrub_history(self, value):
+        """Show the frame that was on screen at the slider position"""
+        if value >= self.scrub_slider.maximum():
+            self.show_live_preview()
+            return
+        from capture import frame_to_qimage
+        with perf.stage("preview.scrub"):
+            result = self.frame_history.frame_at(self._scrub_origin + value / 10)
+            if result is None:
+                return
+            self._scrub_frame = result
+            captured_at, frame, _ = result
+            scaled = frame_to_qimage(frame).scaled(self.image_label.size(),
+                                                   Qt.AspectRatioMode.KeepAspectRatio,
+                                                   Qt.TransformationMode.SmoothTransformation)
+            self.image_label.setPixmap(QPixmap.fromImage(scaled))
+        seconds_ago = time.time() - captured_at
+        self.scrub_label.setText(
+            f"{datetime.fromtimestamp(captured_at).strftime('%H:%M:%S')} (-{seconds_ago:.0f} s)")
+
+    def show_live_preview(self):
+        """Leave the frame history and go back to the live preview"""
+        self._scrub_frame = None
+        self.scrub_label.setText("Live")
+        self.scrub_slider.blockSignals(True)
+        self.scrub_slider.setValue(self.scrub_slider.maximum())
+        self.scrub_slider.blockSignals(False)
+        # The cached preview is stale; render the next frame in full
+        self._preview_pixmap = None
+        self.update_preview()
+
+    def show_window(self):
+        self.show()
+        self.setWindowState(self.windowState() & ~Qt.WindowState.WindowMinimized | Qt.WindowState.WindowActive)
+        self.activateWindow()
+        self.update_preview()  # Update preview when window is shown
+        print("Showing main window")
+        
+    def tray_icon_clicked(self, reason):
+        if reason == QSystemTrayIcon.ActivationReason.DoubleClick:
+            self.show_window()
+            
+    def setupHotkeys(self):
+        try:
+            import keyboard
+            keyboard.add_hotkey('alt+shift+a', self.show_window)
+            keyboard.add_hotkey('ctrl+q', self.close)
+            self.active = True
+            print("Hotkeys registered (Alt+Shift+A for assistant, Ctrl+Q to quit)")
+        except Exception as e:
+            print(f"Error setting up hotkey: {e}")
+        
+    def setupScreenCapture(self):
+        # Capture rate follows input activity and stops while hidden or paused
+        self.capture_scheduler = CaptureScheduler(self.updateContext, parent=self)
+        self.context_manager.input_events.on_actions = (
+            lambda count: self.capture_scheduler.notify_activity())
+        self._update_capture_visibility()
+        self.capture_scheduler.start()
+        print("Screen capture scheduler started")
+        
+    def setupAnalysis(self):
+        from analysis_worker import LLMSignals
+        from llm_context import ContextBuilder, LLMService
+        self.analysis.progress.connect(self.on_analysis_progress)
+        self.analysis.finished.connect(self.on_analysis_finished)
+        self.analysis.failed.connect(self.on_analysis_failed)
+        self._analysis_stages = []
+        # Questions go to the model when an API key or endpoint is configured
+        LLMService.load_env_file()
+        self.llm = LLMService()
+        # Our own window's clicks say nothing about the question
+        self.context_builder = ContextBuilder(exclude_windows=[self.windowTitle()])
+        self.llm_signals = LLMSignals()
+        self.llm_signals.token.connect(self.on_llm_token)
+        self.llm_signals.done.connect(self.on_llm_done)
+        self.llm_signals.failed.connect(self.on_llm_failed)
+        self._llm_request = 0
+        self._llm_started = 0.0
+
+    def mock_analysis(self):
+        """Start analyzing the selected window in the background"""
+        with perf.stage("analysis.request"):
+            self._request_analysis()
+
+    def _request_analysis(self):
+        if self.analysis is None:
+            self.output_box.setText("Still starting up, try again in a moment")
+            return
+        try:
+            # Get selected window
+            hwnd = self.get_selected_window()
+            if not hwnd:
+                self.output_box.setText("Please select a window to analyze")
+                return
+                
+            # Get window rectangle from the registry cache
+            window = self.context_manager.window_registry.get(hwnd)
+            if window is None:
+                self.output_box.setText("The selected window no longer exists")
+                return
+            rect = window.rect
+            title = window.title
+            
+            # The click counts as activity: the scheduler refreshes the
+            # preview soon, within its budget, instead of a full grab here
+            self.capture_scheduler.notify_activity()
+            
+            # Grab, preprocessing and OCR run on the analysis pool; repeated
+            # clicks are coalesced and replace any analysis still running
+            self._analysis_stages = []
+            if self._scrub_frame is not None:
+                # Analyze the window as it was in the frame being shown
+                captured_at, frame, origin = self._scrub_frame
+                self.analysis_status_label.setText(
+                    f"Analyzing {title} as of {datetime.fromtimestamp(captured_at).strftime('%H:%M:%S')}...")
+                self.analysis.request(rect, title, frame=frame, captured_at=captured_at,
+                                      frame_origin=origin)
+                return
+            self.analysis_status_label.setText(f"Analyzing {title}...")
+            # Region tracking is opt-in; the default is plain OCR of the window
+            self.analysis.request(rect, title,
+                                  window_key=hwnd if self._track_windows else None)
+            
+        except Exception as e:
+            self.output_box.setText(f"Error during analysis: {str(e)}")
+            print(f"Error: {e}")
+
+    def analyze_recent_windows(self, limit: int = 4):
+        """Analyze the windows the user worked in most recently, in parallel"""
+        if self.analysis is None:
+            self.output_box.setText("Still starting up, try again in a moment")
+            return
+        from multi_analysis import AnalysisTarget
+        registry = self.context_manager.window_registry
+        by_title = {}
+        for info in registry.windows():
+            by_title.setdefault(info.title, info)
+        targets = []
+        for action in reversed(self.context_manager.recent_actions(200)):
+            info = by_title.pop(action.window_title, None)
+            if info is None:
+                continue
+            info = registry.get(info.hwnd)
+            if info is not None and info.rect is not None:
+                targets.append(AnalysisTarget(info.title, info.rect))
+                if len(targets) >= limit:
+                    break
+        if not targets:
+            # Nothing recent; fall back to the selected window
+            hwnd = self.get_selected_window()
+            info = registry.get(hwnd) if hwnd else None
+            if info is None or info.rect is None:
+                self.output_box.setText("No recently used windows to analyze")
+                return
+            targets.append(AnalysisTarget(info.title, info.rect))
+        self._request_multi_analysis(targets)
+
+    def analyze_monitors(self):
+        """Analyze every monitor, in parallel"""
+        if self.analysis is None:
+            self.output_box.setText("Still starting up, try again in a moment")
+            return
+        from multi_analysis import AnalysisTarget
+        targets = [AnalysisTarget(f"Monitor {index + 1}", rect) for index, rect in
+                   enumerate(self.context_manager.backend.monitor_rects())]
+        self._request_multi_analysis(targets)
+
+    def _request_multi_analysis(self, targets):
+        with perf.stage("analysis.request"):
+            self._analysis_stages = []
+            # The worker pool starts on the analysis thread the first time
+            self.analysis_status_label.setText(f"Analyzing {len(targets)} targets in parallel...")
+            self.analysis.request_multi(targets)
+
+    def on_analysis_progress(self, stage, elapsed_ms):
+        """Show how long each finished analysis stage took"""
+        self._analysis_stages.append(f"{stage} {elapsed_ms:.0f} ms")
+        self.analysis_status_label.setText("Analyzing: " + ", ".join(self._analysis_stages))
+
+    def on_analysis_failed(self, message):
+        self.analysis_status_label.setText("Analysis failed")
+        self.output_box.setText(f"Error during analysis: {message}")
+        print(f"Error: {message}")
+
+    def on_analysis_finished(self, result):
+        """Format a completed analysis into the output box"""
+        if "windows" in result:
+            self.on_multi_analysis_finished(result)
+            return
+        captured_at = result.get("captured_at")
+        if captured_at is None:
+            self.context_manager.record_snapshot(result["title"], result["text"], result["rect"])
+        # Create analysis output
+        output = "Context Analysis:\n\n"
+        output += f"Active Window: {result['title']}\n\n"
+        output += "Detected Text:\n"
+        output += result["text"].strip() or "No text detected"
+        if result.get("new_text"):
+            output += "\n\nNew Since Last Analysis:\n" + "\n".join(result["new_text"])
+        
+        # Add recent actions
+        output += "\n\nRecent Actions:\n"
+        context = self.context_manager.get_recent_context(limit=5)
+        for action in context["recent_actions"]:
+            output += f"- {action.timestamp.strftime('%H:%M:%S')}: {action.action_type} in {action.window_title}\n"
+        
+        # Debug info
+        output += "\n\nDebug Info:\n"
+        output += f"Window Rectangle: {result['rect']}\n"
+        output += f"Screenshot Size: {result['size']}\n"
+        if captured_at is not None:
+            output += f"Captured At: {datetime.fromtimestamp(captured_at).strftime('%H:%M:%S')} (frame history)\n"
+        output += "Stage Timings: " + ", ".join(
+            f"{stage} {ms:.0f} ms" for stage, ms in result["timings"].items()) + "\n"
+        cache_stats = self.context_manager.ocr_cache.stats()
+        output += (f"OCR Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                   f"{cache_stats['bytes'] // 1024} KB\n")
+        
+        self.output_box.setText(output)
+        total_ms = sum(result['timings'].values())
+        perf.record("analysis.total", total_ms)
+        self.analysis_status_label.setText(f"Analysis done in {total_ms:.0f} ms")
+        
+        question = self.input_box.toPlainText().strip()
+        if question and self.llm.configured():
+            self.ask_llm(question, result["title"], result["text"])
+        
+    def ask_llm(self, question, title, text):
+        """Stream the model's answer to question about the analyzed window into the output box"""
+        context = self.context_builder.build(question, title, text,
+                                             self.context_manager.recent_actions(50))
+        self._llm_request += 1
+        request_id = self._llm_request
+        self._llm_started = time.perf_counter()
+        self.output_box.append("\nAnswer:\n")
+        self.analysis_status_label.setText(
+            f"Asking the model ({context.tokens} tokens of context, "
+            f"{context.dropped_lines} lines left out)...")
+        signals = self.llm_signals
+        self.llm.ask(context,
+                     on_token=lambda chunk: signals.token.emit(request_id, chunk),
+                     on_done=lambda answer, cached: signals.done.emit(request_id, cached),
+                     on_error=lambda message: signals.failed.emit(request_id, message))
+
+    def on_llm_token(self, request_id, chunk):
+        # Chunks of an answer that was superseded are dropped
+        if request_id != self._llm_request:
+            return
+        cursor = self.output_box.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(chunk)
+        self.output_box.setTextCursor(cursor)
+
+    def on_llm_done(self, request_id, cached):
+        if request_id != self._llm_request:
+            return
+        elapsed_ms = (time.perf_counter() - self._llm_started) * 1000
+        self.analysis_status_label.setText(
+            "Answer from cache" if cached else f"Answer streamed in {elapsed_ms:.0f} ms")
+
+    def on_llm_failed(self, request_id, message):
+        if request_id != self._llm_request:
+            return
+        self.analysis_status_label.setText("The model request failed")
+        self.output_box.append(f"\nError from the model: {message}")
+        
+    def on_multi_analysis_finished(self, result):
+        """Format a merged multi-window analysis with per-window timings"""
+        output = f"Context Analysis ({len(result['windows'])} windows):\n"
+        for window in result["windows"]:
+            self.context_manager.record_snapshot(window["label"], window["text"], window["bbox"])
+            timings = window["timings"]
+            output += f"\n== {window['label']} ==\n"
+            output += window["text"].strip() or "No text detected"
+            output += (f"\n[{window['regions']} regions, queued {timings['queue']:.0f} ms, "
+                       f"processed {timings['process']:.0f} ms in pid {window['pid']}]\n")
+        
+        timings = result["timings"]
+        output += "\n\nDebug Info:\n"
+        output += f"Merged Regions: {len(result['regions'])}\n"
+        output += f"Grab: {timings['grab']:.0f} ms, Total: {timings['total']:.0f} ms\n"
+        output += f"Parallelism: {result['parallelism']:.2f}x\n"
+        
+        self.output_box.setText(output)
+        self.analysis_status_label.setText(
+            f"{len(result['windows'])} windows analyzed in {timings['total']:.0f} ms")
+        
+    def search_history(self):
+        """Search OCR'd text using the input box as the query (words, prefix*, "phrases")"""
+        query = self.input_box.toPlainText().strip()
+        if not query:
+            self.output_box.setText("Type words, prefix* or \"a phrase\" to search for")
+            return
+        if self.context_manager is None:
+            self.output_box.setText("Still starting up, try again in a moment")
+            return
+        window = self.search_range.currentData()
+        since = time.time() - window if window else None
+        
+        started = time.perf_counter()
+        hits = self.context_manager.search_text(query, since=since, limit=50)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        output = f"Search: {query}\n{len(hits)} matches in {elapsed_ms:.1f} ms\n\n"
+        for hit in hits:
+            seen = datetime.fromtimestamp(hit.timestamp).strftime('%Y-%m-%d %H:%M:%S')
+            output += f"- {seen}: {hit.window_title}"
+            if hit.process_name:
+                output += f" ({hit.process_name})"
+            output += f" at {hit.bbox}\n"
+        self.output_box.setText(output)
+
+    def setupPerfPanel(self):
+        # Recording follows the panel unless SCREEN_ASSISTANT_PERF forced it on
+        self._perf_always_on = perf.enabled
+        self.perf_timer = QTimer(self)
+        self.perf_timer.setInterval(1000)
+        self.perf_timer.timeout.connect(self.update_perf_panel)
+        self.perf_toggle.toggled.connect(self.toggle_perf_panel)
+        if perf.enabled:
+            self.perf_timer.start()
+
+    def toggle_perf_panel(self, expanded):
+        self.perf_toggle.setArrowType(Qt.ArrowType.DownArrow if expanded else Qt.ArrowType.RightArrow)
+        self.perf_view.setVisible(expanded)
+        perf.enabled = expanded or self._perf_always_on
+        if perf.enabled:
+            self.perf_timer.start()
+            self.update_perf_panel()
+        else:
+            self.perf_timer.stop()
+
+    def update_perf_panel(self):
+        """Refresh memory gauges, stream a snapshot and redraw the panel"""
+        if self.context_manager is None:
+            return
+        cache_stats = self.context_manager.ocr_cache.stats()
+        perf.gauge("ocr_cache_bytes", cache_stats["bytes"])
+        perf.gauge("ocr_cache_hit_rate", round(cache_stats["hit_rate"], 3))
+        perf.gauge("active_regions_bytes", self.context_manager.active_regions.nbytes)
+        perf.gauge("action_history_len", len(self.context_manager.action_history))
+        perf.gauge("input_events_dropped", self.context_manager.input_events.dropped)
+        perf.gauge("capture_interval_ms", self.capture_scheduler.interval_ms)
+        perf.gauge("capture_cost_ms", round(self.capture_scheduler.average_cost_ms, 2))
+        perf.gauge("frame_history_bytes", self.frame_history.nbytes)
+        snapshot = perf.write_snapshot()
+        if snapshot is not None and self.perf_view.isVisible():
+            self.perf_view.setPlainText(format_snapshot(snapshot))
+
+    def toggleService(self):
+        self.active = not self.active
+        self.toggle_action.setText("Resume" if not self.active else "Pause")
+        self.status_label.setText(
+            "Screen Assistant Paused" if not self.active else "Screen Assistant Active"
+        )
+        if self.capture_scheduler is not None:
+            self.capture_scheduler.set_paused(not self.active)
+        print(f"Service {'paused' if not self.active else 'resumed'}")
+        
+    def updateContext(self):
+        if not self.active:
+            return
+        if self.isVisible():
+            self.update_preview()  # Update preview only when window is visible
+
+
+    def _update_capture_visibility(self):
+        """Pause scheduled capture while the window is hidden or minimized"""
+        if self.capture_scheduler is not None:
+            self.capture_scheduler.set_visible(self.isVisible() and not self.isMinimized())
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._update_capture_visibility()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._update_capture_visibility()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.Type.WindowStateChange:
+            self._update_capture_visibility()
+
+    def closeEvent(self, event):
+        """Closing only hides the window; the tray can show it again"""
+        event.accept()
+
+    def shutdown(self):
+        """Clean up resources when the application quits"""
+        try:
+            # Stop any running analysis and the context manager listeners
+            if self.analysis is not None:
+                self.analysis.close()
+                self.capture_scheduler.stop()
+                self.frame_history.close()
+                self.context_manager.close()
+                self.capture.close()
+            self.perf_timer.stop()
+            perf.close_stream()
+        except Exception as e:
+            print(f"Error during cleanup: {e}")
+
+
+
+    def update_window_list(self):
+        """Rescan all windows; the registry reports only what changed"""
+        if self.context_manager is None:
+            return
+        self.context_manager.window_registry.refresh()
+
+    def apply_window_diff(self, diff):
+        """Update the window combo box in place, keeping it sorted by title"""
+        selector = self.window_selector
+        for hwnd in diff.removed:
+            index = selector.findData(hwnd)
+            if index >= 0:
+                selector.removeItem(index)
+        for info in diff.renamed:
+            index = selector.findData(info.hwnd)
+            if index >= 0:
+                selected = index == selector.currentIndex()
+                selector.removeItem(index)
+                self._insert_window_item(info, selected)
+        for info in diff.added:
+            self._insert_window_item(info)
+
+    def _insert_window_item(self, info, select: bool = False):
+        selector = self.window_selector
+        key = info.title.lower()
+        index = 0
+        while index < selector.count() and selector.itemText(index).lower() <= key:
+            index += 1
+        selector.insertItem(index, info.title, info.hwnd)
+        if select:
+            selector.setCurrentIndex(index)
+
+    def get_selected_window(self):
+        """Get the currently selected window handle"""
+        return self.window_selector.currentData()
+
+
+def run(process_start: float):
+    """Start the Qt application; process_start is when the interpreter began running main.py"""
+    try:
+        startup = StartupTimer(process_start)
+        startup.mark("imports_done")
+        with startup.phase("qt_app"):
+            app = QApplication(sys.argv)
+            app.setQuitOnLastWindowClosed(False)
+        screen_assistant = ScreenAssistant(startup)
+        
+        # Show initial message
+        if QSystemTrayIcon.isSystemTrayAvailable():
+            screen_assistant.tray_icon.showMessage(
+                "Screen Assistant",
+                "Application is running. Press Alt+Shift+A to show window.",
+                QSystemTrayIcon.MessageIcon.Information,
+                3000
+            )
+        
+        print("Application initialized successfully")
+        print("Press Ctrl+Q to quit or use the system tray menu")
+        sys.exit(app.exec())
+    except Exception as e:
+        print(f"Error starting application: {e}")
\ No newline at end of file
@@ -0,0 +1,270 @@
+"""Run the screenshot pipeline offline over screenshot archives and recordings
+
+Frames from an image file, a directory or glob of images, or a video are
+streamed through ContextManager.process_screenshot on a pool of worker
+processes. One JSON line per frame (regions and text) is appended to the
+output as soon as the frame and every frame before it are done, so an
+interrupted run picks up after the last line written. Needs neither Qt nor
+win32. With --track, the stream is cut into segments of consecutive frames
+and each worker tracks a whole segment in order, so regions that only
+scrolled keep their ids and OCR text and each record lists the new text.
+Tracking restarts at every segment boundary.
+
+    python src/batch.py recordings/session.mp4 --out session.jsonl --step 30
+    python src/batch.py "shots/*.png" --out shots.jsonl --workers 4 --ocr stub
+"""
+import argparse
+import functools
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from capture import ReplayBackend
+from multi_analysis import init_worker, worker_context
+from region_store import CONTENT_TYPES, RegionArray, text_lines
+from region_tracker import RegionTracker
+
+# (frame index, source name, seconds into a video or None, image path or BGRA frame)
+FrameItem = Tuple[int, str, Optional[float], Union[str, np.ndarray]]
+
+
+def iter_frames(source: str, start: int = 0, step: int = 1) -> Iterator[FrameItem]:
+    """Yield every step-th frame of source from frame `start` on
+
+    Image files are yielded as paths and decoded by the workers. Video
+    frames are decoded here, one at a time, and copied out of the
+    replay buffer.
+    """
+    images = ReplayBackend.list_images(source)
+    if images:
+        for index in range(start, len(images), step):
+            yield index, os.path.basename(images[index]), None, images[index]
+        return
+
+    replay = ReplayBackend(source, realtime=False, loop=False)
+    try:
+        index = start
+        while True:
+            replay.seek(index)
+            frame = replay.grab()
+            if frame is None:
+                return
+            seconds = index / replay.source_fps if replay.source_fps else None
+            yield index, os.path.basename(source), seconds, frame.copy()
+            index += step
+    finally:
+        replay.close()
+
+
+def region_records(regions: RegionArray, ids: Optional[np.ndarray] = None) -> List[Dict]:
+    records = [{
+        "x": int(row["x"]), "y": int(row["y"]),
+        "width": int(row["width"]), "height": int(row["height"]),
+        "type": CONTENT_TYPES[row["content_type"]],
+        "confidence": round(float(row["confidence"]), 2),
+        "text": regions.contents[row["content"]] if row["content"] >= 0 else None,
+    } for row in regions.data]
+    if ids is not None:
+        for record, region_id in zip(records, ids):
+            record["id"] = int(region_id)
+    return records
+
+
+def _process_frame(index: int, name: str, seconds: Optional[float],
+                   image: Union[str, np.ndarray],
+                   tracker: Optional[RegionTracker] = None) -> Dict:
+    """Worker side: decode if needed, detect regions and build the output record
+
+    A frame that fails yields an error record instead of ending the run.
+    """
+    try:
+        return _frame_record(index, name, seconds, image, tracker)
+    except Exception as e:
+        print(f"Error processing frame {index} of {name}: {e}", file=sys.stderr)
+        return {"frame": index, "source": name, "error": f"{type(e).__name__}: {e}"}
+
+
+def _frame_record(index: int, name: str, seconds: Optional[float],
+                  image: Union[str, np.ndarray], tracker: Optional[RegionTracker]) -> Dict:
+    started = time.perf_counter()
+    if isinstance(image, str):
+        decoded = cv2.imread(image, cv2.IMREAD_COLOR)
+        if decoded is None:
+            return {"frame": index, "source": name, "error": "unreadable image"}
+        image = cv2.cvtColor(decoded, cv2.COLOR_BGR2BGRA)
+    record = {"frame": index, "source": name, "time": seconds,
+              "size": [image.shape[1], image.shape[0]]}
+    if tracker is not None:
+        tracked = tracker.update(image)
+        regions = tracked.regions
+        record["offset"] = list(tracked.offset)
+        record["new_text"] = tracked.new_text
+        record["regions"] = region_records(regions, tracked.ids)
+    else:
+        regions = worker_context().process_screenshot(image)
+        record["regions"] = region_records(regions)
+    record["text"] = "\n".join(text_lines(regions))
+    record["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return record
+
+
+def process_stream(items: Iterator[FrameItem], pool: ProcessPoolExecutor,
+                   max_in_flight: int) -> Iterator[Dict]:
+    """Results in frame order, with at most max_in_flight frames submitted at once"""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(_process_frame, *item))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _track_segment(source: str, start: int, count: int, step: int) -> List[Dict]:
+    """Worker side: track up to count frames from frame start in order, with a fresh tracker"""
+    tracker = RegionTracker(worker_context())
+    return [_process_frame(*item, tracker=tracker)
+            for item in itertools.islice(iter_frames(source, start, step), count)]
+
+
+def track_stream(source: str, start: int, step: int, pool: ProcessPoolExecutor,
+                 max_in_flight: int, segment_frames: int) -> Iterator[Dict]:
+    """Tracked results in frame order, one segment of consecutive frames per task
+
+    The frame count is not known up front for every video, so segments are
+    submitted until one comes back short. Region ids are renumbered to stay
+    unique across segments.
+    """
+    pending = deque()
+    segments = itertools.count(start, segment_frames * step)
+    next_id = 0
+    ended = False
+    while True:
+        while not ended and len(pending) < max_in_flight:
+            pending.append(pool.submit(_track_segment, source, next(segments),
+                                       segment_frames, step))
+        if not pending:
+            return
+        records = pending.popleft().result()
+        if len(records) < segment_frames:
+            # Past the end of the source; later segments come back empty
+            ended = True
+        offset, top = next_id, -1
+        for record in records:
+            for region in record.get("regions", ()):
+                region["id"] += offset
+                top = max(top, region["id"])
+            yield record
+        next_id = max(next_id, top + 1)
+
+
+def resume_point(path: str) -> Optional[int]:
+    """Index of the last complete record in path, dropping a torn final line"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            # The previous run stopped in the middle of a line
+            f.truncate(end)
+    last = data[:end].rstrip(b"\n").rsplit(b"\n", 1)[-1]
+    if not last:
+        return None
+    return json.loads(last)["frame"]
+
+
+def engine_factory(kind: Optional[str]) -> Optional[Callable]:
+    """Picklable OCR engine factory for the workers; None uses create_engine's default"""
+    if kind == "stub":
+        from benchmark import make_stub_engine
+        return make_stub_engine
+    if kind is None:
+        return None
+    from ocr_engine import create_engine
+    return functools.partial(create_engine, kind, 1)
+
+
+def run_batch(source: str, out: str, workers: Optional[int] = None,
+              max_in_flight: Optional[int] = None, step: int = 1, ocr: Optional[str] = None,
+              resume: bool = True, roi_ocr: bool = True, track: bool = False,
+              segment_frames: int = 200) -> Dict:
+    """Process source into the JSONL file out; returns run statistics
+
+    With track, max_in_flight counts segments of segment_frames frames.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or (workers + 1 if track else 2 * workers)
+    last = resume_point(out) if resume else None
+    start = last + step if last is not None else 0
+    if last is not None:
+        print(f"Resuming after frame {last}", file=sys.stderr)
+
+    frames = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(roi_ocr, engine_factory(ocr))) as pool, \
+            open(out, "a" if resume else "w", encoding="utf-8") as f:
+        try:
+            if track:
+                records = track_stream(source, start, step, pool, max_in_flight,
+                                       segment_frames)
+            else:
+                records = process_stream(iter_frames(source, start, step), pool, max_in_flight)
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                frames += 1
+                if frames % 50 == 0:
+                    elapsed = time.perf_counter() - started
+                    print(f"{frames} frames, {frames / elapsed:.1f} frames/s", file=sys.stderr)
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    elapsed = time.perf_counter() - started
+    return {"frames": frames, "first_frame": start, "seconds": elapsed,
+            "frames_per_second": frames / elapsed if elapsed else 0.0}
+
+
+def main(argv: List[str] = None) -> Dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="Image file, directory or glob of images, or video file")
+    parser.add_argument("--out", required=True, help="JSONL file to append results to")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--in-flight", type=int,
+                        help="Frames queued at once (default: 2 per worker), or segments with --track")
+    parser.add_argument("--step", type=int, default=1, help="Process every n-th frame")
+    parser.add_argument("--ocr", choices=["tesserocr", "pytesseract", "stub"])
+    parser.add_argument("--full-ocr", action="store_true",
+                        help="OCR whole frames instead of detected text candidates")
+    parser.add_argument("--track", action="store_true",
+                        help="Track regions across frames, adding ids and new text")
+    parser.add_argument("--segment", type=int, default=200,
+                        help="Frames per tracked segment; tracking restarts at each (default: 200)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Overwrite the output instead of resuming it")
+    args = parser.parse_args(argv)
+
+    try:
+        stats = run_batch(args.source, args.out, workers=args.workers,
+                          max_in_flight=args.in_flight, step=max(1, args.step), ocr=args.ocr,
+                          resume=not args.restart, roi_ocr=not args.full_ocr,
+                          track=args.track, segment_frames=max(1, args.segment))
+    except KeyboardInterrupt:
+        print("Interrupted; run again to resume", file=sys.stderr)
+        sys.exit(130)
+    print(f"{stats['frames']} frames in {stats['seconds']:.1f} s "
+          f"({stats['frames_per_second']:.1f} frames/s)", file=sys.stderr)
+    return stats
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+"""Headless benchmarks for the capture/OCR/context pipeline
+
+Renders synthetic screenshots with PIL and times the ContextManager stages
+on them, printing (or writing) one JSON document so results can be diffed
+between commits. Runs on Linux: pynput is replaced by a stub when it is not
+importable and window queries go through the FakeBackend.
+
+    python src/benchmark.py --out bench.json
+    python src/benchmark.py --resolutions 1920x1080 --densities dense --ocr stub
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "4k": (3840, 2160)}
+# Share of text rows filled per density
+DENSITIES = {"sparse": 0.15, "medium": 0.5, "dense": 0.95}
+
+WORDS = ("def return import class self value error warning context region screen "
+         "window process capture frame result index query status build test").split()
+
+
+def install_platform_stubs():
+    """Stand in for pynput when the real module cannot be imported"""
+    try:
+        import pynput  # noqa: F401
+        return False
+    except Exception:
+        pass
+
+    class Listener:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def start(self):
+            pass
+
+        def stop(self):
+            pass
+
+    pynput = types.ModuleType("pynput")
+    pynput.keyboard = types.ModuleType("pynput.keyboard")
+    pynput.mouse = types.ModuleType("pynput.mouse")
+    pynput.keyboard.Listener = Listener
+    pynput.mouse.Listener = Listener
+    sys.modules.update({"pynput": pynput, "pynput.keyboard": pynput.keyboard,
+                        "pynput.mouse": pynput.mouse})
+    return True
+
+
+def render_screenshot(width: int, height: int, density: float, seed: int = 0) -> np.ndarray:
+    """Draw a desktop-like RGB screenshot: panels, buttons and lines of text"""
+    rng = np.random.default_rng(seed)
+    image = Image.new("RGB", (width, height), (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=14)
+
+    # Window chrome: title bar, side panel and a few buttons
+    draw.rectangle((0, 0, width, 32), fill=(45, 45, 48))
+    draw.text((12, 8), "Synthetic Window - benchmark", fill=(230, 230, 230), font=font)
+    panel = width // 5
+    draw.rectangle((0, 32, panel, height), fill=(235, 235, 240))
+    for i in range(6):
+        top = 60 + i * 48
+        draw.rectangle((16, top, panel - 16, top + 32), outline=(90, 90, 90), width=2)
+        draw.text((28, top + 8), WORDS[i % len(WORDS)].title(), fill=(20, 20, 20), font=font)
+
+    # Body text; density controls how many rows hold text
+    line_height = 20
+    for top in range(48, height - line_height, line_height):
+        if rng.random() > density:
+            continue
+        words = rng.choice(WORDS, size=rng.integers(3, 16))
+        indent = panel + 24 + int(rng.integers(0, 4)) * 24
+        draw.text((indent, top), " ".join(words), fill=(30, 30, 30), font=font)
+    return np.asarray(image)
+
+
+def make_stub_engine():
+    """OCR engine that returns plausible word boxes without running Tesseract"""
+    from ocr_engine import OCREngine
+
+    class StubEngine(OCREngine):
+        name = "stub"
+
+        def _data(self, image):
+            height, width = image.shape[:2]
+            data = {"left": [], "top": [], "width": [], "height": [], "conf": [], "text": []}
+            for i, left in enumerate(range(0, max(width - 40, 1), 48)):
+                data["left"].append(left)
+                data["top"].append(0)
+                data["width"].append(40)
+                data["height"].append(min(height, 14))
+                data["conf"].append(90.0)
+                data["text"].append(WORDS[i % len(WORDS)])
+            return data
+
+        def batch_image_to_data(self, images, psm=11):
+            return [self._data(image) for image in images]
+
+        def batch_image_to_string(self, images, psm=6):
+            return [" ".join(self._data(image)["text"]) for image in images]
+
+    return StubEngine()
+
+
+def make_engine(kind: str):
+    if kind == "stub":
+        return make_stub_engine()
+    from ocr_engine import create_engine
+    try:
+        engine = create_engine()
+        engine.warm_up()
+        engine.image_to_string(np.full((32, 32), 255, dtype=np.uint8))
+        return engine
+    except Exception as e:
+        if kind == "real":
+            raise
+        print(f"OCR engine unavailable, using stub: {e}", file=sys.stderr)
+        return make_stub_engine()
+
+
+def measure(function: Callable, repeat: int, setup: Callable = None) -> Dict:
+    """Time repeat calls, then trace one extra call for its allocation peak
+
+    Tracing is kept out of the timed runs since tracemalloc slows
+    allocation-heavy code considerably.
+    """
+    times = []
+    for _ in range(repeat + 1):
+        if setup is not None:
+            setup()
+        if len(times) == repeat:
+            tracemalloc.start()
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            break
+        started = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - started) * 1000)
+    return {
+        "repeat": repeat,
+        "min_ms": min(times),
+        "median_ms": statistics.median(times),
+        "mean_ms": statistics.fmean(times),
+        "peak_alloc_bytes": peak,
+    }
+
+
+def bench_frame(context_manager, frame: np.ndarray, repeat: int) -> Dict:
+    cache = context_manager.ocr_cache
+    results = {}
+    results["process_screenshot"] = measure(
+        lambda: context_manager.process_screenshot(frame), repeat, setup=cache.clear)
+    results["process_screenshot_cached"] = measure(
+        lambda: context_manager.process_screenshot(frame), repeat)
+
+    preprocessed = context_manager.preprocessor.run(frame)
+    results["preprocess"] = measure(lambda: context_manager.preprocessor.run(frame), repeat)
+    results["detect_text_regions"] = measure(
+        lambda: context_manager._detect_text_regions(preprocessed), repeat, setup=cache.clear)
+    results["detect_ui_regions"] = measure(
+        lambda: context_manager._detect_ui_regions(preprocessed), repeat)
+
+    regions = context_manager.process_screenshot(frame)
+    results["filter_and_organize_text"] = measure(
+        lambda: context_manager._filter_and_organize_text(regions), repeat)
+    results["region_count"] = len(regions)
+    return results
+
+
+def bench_roi_agreement(managers: Dict[str, object], frame: np.ndarray) -> Dict:
+    """verify_roi_ocr per engine: word recall of ROI OCR against full-frame OCR"""
+    results = {}
+    for name, context_manager in managers.items():
+        context_manager.ocr_cache.clear()
+        results[name] = context_manager.verify_roi_ocr(frame)
+    return results
+
+
+def bench_action_history(events: int, repeat: int) -> Dict:
+    """Push input events at full speed and enrich them through the pipeline"""
+    from action_history import ActionHistory
+    from input_events import InputEventPipeline
+    from platform_backend import FakeBackend
+
+    backend = FakeBackend()
+    for hwnd in range(1, 9):
+        backend.add_window(hwnd, f"Window {hwnd}", 1000 + hwnd, f"app{hwnd}.exe")
+    history = ActionHistory()
+    pipeline = InputEventPipeline(backend, history)
+
+    def run():
+        for i in range(events):
+            pipeline.push("keyboard", {"key": "a"})
+            if i % 512 == 0:
+                backend.set_foreground(1 + (i // 512) % 8)
+                pipeline.process_pending()
+        pipeline.process_pending()
+
+    push_only = measure(lambda: [pipeline.push("keyboard", None) for _ in range(events)], repeat,
+                        setup=pipeline.process_pending)
+    ingest = measure(run, repeat)
+    ingest["events"] = events
+    ingest["events_per_second"] = events / (ingest["median_ms"] / 1000)
+    push_only["events"] = events
+    push_only["events_per_second"] = events / (push_only["median_ms"] / 1000)
+    return {"push": push_only, "ingest": ingest, "backend_calls": backend.calls}
+
+
+def bench_multi_analysis(frame: np.ndarray, worker_counts: List[int], repeat: int,
+                         ocr: str) -> Dict:
+    """Analyze the four quadrants of frame on process pools of increasing size"""
+    from capture import CaptureBackend, _crop
+    from multi_analysis import AnalysisTarget, MultiAnalyzer
+
+    class FrameCapture(CaptureBackend):
+        name = "bench"
+
+        def grab(self, bbox=None):
+            return _crop(frame, bbox)
+
+    height, width = frame.shape[:2]
+    half_w, half_h = width // 2, height // 2
+    targets = [AnalysisTarget(f"Quadrant {i + 1}", (left, top, left + half_w, top + half_h))
+               for i, (left, top) in enumerate([(0, 0), (half_w, 0), (0, half_h),
+                                                (half_w, half_h)])]
+    results = {"cpu_count": os.cpu_count(), "targets": len(targets), "size": [width, height]}
+    baseline = None
+    for workers in worker_counts:
+        analyzer = MultiAnalyzer(FrameCapture(), workers=workers,
+                                 engine_factory=make_stub_engine if ocr == "stub" else None)
+        try:
+            analyzer.warm_up()
+            result = measure(lambda: analyzer.analyze(targets), repeat)
+        finally:
+            analyzer.close()
+        baseline = baseline or result["median_ms"]
+        result["speedup"] = baseline / result["median_ms"]
+        results[f"workers_{workers}"] = result
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def parse_resolution(value: str) -> Tuple[str, Tuple[int, int]]:
+    if value in RESOLUTIONS:
+        return value, RESOLUTIONS[value]
+    width, height = value.lower().split("x")
+    return value, (int(width), int(height))
+
+
+def main(argv: List[str] = None) -> Dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS))
+    parser.add_argument("--densities", nargs="+", default=list(DENSITIES), choices=list(DENSITIES))
+    parser.add_argument("--repeat", type=positive_int, default=3)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--ocr", choices=["auto", "real", "stub"], default="auto")
+    parser.add_argument("--multi-workers", nargs="*", type=int, default=[1, 2, 4],
+                        help="Process pool sizes for the multi-window case; none to skip it")
+    parser.add_argument("--out", help="Write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    # Pipeline debug prints go to stderr so stdout stays valid JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        stubbed = install_platform_stubs()
+        from context_manager import ContextManager
+        from platform_backend import FakeBackend
+
+        backend = FakeBackend()
+        engine = make_engine(args.ocr)
+        context_manager = ContextManager(ocr_engine=engine, backend=backend)
+
+        report = {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "ocr_engine": engine.name,
+            "stubbed_pynput": stubbed,
+            "frames": [],
+        }
+        run_benchmarks(args, context_manager, backend, report)
+        context_manager.stop_tracking()
+        engine.close()
+
+    output = json.dumps(report, indent=2, default=float)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return report
+
+
+def run_benchmarks(args, context_manager, backend, report: Dict):
+    from context_manager import ContextManager
+
+    # ROI agreement always with the stub, and with Tesseract when it is the engine in use
+    managers = {"stub": context_manager}
+    if context_manager.ocr_engine.name != "stub":
+        managers = {"stub": ContextManager(ocr_engine=make_stub_engine(), backend=backend),
+                    "tesseract": context_manager}
+    for name in args.resolutions:
+        label, (width, height) = parse_resolution(name)
+        backend.add_window(len(backend.windows) + 1, "Synthetic Window", 1, "bench.exe",
+                           client_area=(0, 0, width, height))
+        backend.set_foreground(len(backend.windows))
+        for density in args.densities:
+            frame = render_screenshot(width, height, DENSITIES[density])
+            print(f"Benchmarking {label} {density}...", file=sys.stderr)
+            result = bench_frame(context_manager, frame, args.repeat)
+            result["roi_agreement"] = bench_roi_agreement(managers, frame)
+            print("ROI OCR recall: " + ", ".join(
+                f"{engine} {agreement['recall']:.1%} of {agreement['full_words']} words "
+                f"from {agreement['pixel_ratio']:.0%} of the pixels"
+                for engine, agreement in result["roi_agreement"].items()), file=sys.stderr)
+            report["frames"].append({"resolution": label, "size": [width, height],
+                                     "density": density, **result})
+
+    if args.multi_workers:
+        label, (width, height) = parse_resolution(args.resolutions[-1])
+        print(f"Benchmarking multi-window analysis at {label}...", file=sys.stderr)
+        report["multi_analysis"] = bench_multi_analysis(
+            render_screenshot(width, height, DENSITIES["medium"]), args.multi_workers,
+            args.repeat, "stub" if report["ocr_engine"] == "stub" else "real")
+
+    report["action_history"] = bench_action_history(args.events, args.repeat)
+    report["ocr_cache"] = context_manager.ocr_cache.stats()
+    try:
+        import resource
+        report["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+import glob
+import os
+import sys
+import time
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Capture bounding boxes are (left, top, right, bottom) like ImageGrab.grab
+BBox = Tuple[int, int, int, int]
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+# Seeking a replayed video further ahead than this repositions the decoder
+SEEK_DISTANCE = 64
+
+
+class CaptureBackend:
+    """Source of screen frames
+
+    grab() returns a (height, width, 4) uint8 BGRA array that is a view over
+    a buffer owned by the backend and reused by the next grab(). Copy it if
+    it has to outlive that. BGRA is what GDI produces natively, and it is
+    what QImage.Format_RGB32 and OpenCV's BGRA conversions read directly.
+    """
+
+    name = "base"
+    # Screen position of the top-left pixel of the last grabbed frame
+    origin: Tuple[int, int] = (0, 0)
+
+    def grab(self, bbox: Optional[BBox] = None) -> Optional[np.ndarray]:
+        raise NotImplementedError
+
+    def close(self):
+        """Release native resources"""
+
+
+def _crop(frame: np.ndarray, bbox: Optional[BBox]) -> np.ndarray:
+    if bbox is None:
+        return frame
+    left, top, right, bottom = bbox
+    return frame[max(0, top):bottom, max(0, left):right]
+
+
+class PILCaptureBackend(CaptureBackend):
+    """Portable fallback using PIL.ImageGrab; costs one conversion per grab"""
+
+    name = "pil"
+
+    def __init__(self):
+        self._buffer: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _virtual_screen_origin() -> Tuple[int, int]:
+        """Top-left of the desktop spanning every monitor; negative left of or above the primary"""
+        if sys.platform != "win32":
+            return 0, 0
+        import ctypes
+        user32 = ctypes.windll.user32
+        return user32.GetSystemMetrics(76), user32.GetSystemMetrics(77)  # SM_[XY]VIRTUALSCREEN
+
+    def grab(self, bbox: Optional[BBox] = None) -> Optional[np.ndarray]:
+        from PIL import ImageGrab
+        # Without all_screens, Windows grabs the primary monitor only and
+        # boxes on the other monitors come back black
+        screenshot = ImageGrab.grab(bbox=bbox, all_screens=True)
+        self.origin = (bbox[0], bbox[1]) if bbox is not None else self._virtual_screen_origin()
+        if screenshot.mode != 'RGB':
+            screenshot = screenshot.convert('RGB')
+        rgb = np.asarray(screenshot)
+        shape = rgb.shape[:2] + (4,)
+        if self._buffer is None or self._buffer.shape != shape:
+            self._buffer = np.empty(shape, dtype=np.uint8)
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGRA, dst=self._buffer)
+
+
+class GdiCaptureBackend(CaptureBackend):
+    """BitBlt the screen into a persistent DIB section and expose its pixels
+
+    The DIB's memory is wrapped as a NumPy array once, so a grab is a single
+    GPU/driver blit with no Python-side copies.
+    """
+
+    name = "gdi"
+
+    SRCCOPY = 0x00CC0020
+    CAPTUREBLT = 0x40000000
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class BITMAPINFOHEADER(ctypes.Structure):
+            _fields_ = [
+                ("biSize", wintypes.DWORD), ("biWidth", wintypes.LONG),
+                ("biHeight", wintypes.LONG), ("biPlanes", wintypes.WORD),
+                ("biBitCount", wintypes.WORD), ("biCompression", wintypes.DWORD),
+                ("biSizeImage", wintypes.DWORD), ("biXPelsPerMeter", wintypes.LONG),
+                ("biYPelsPerMeter", wintypes.LONG), ("biClrUsed", wintypes.DWORD),
+                ("biClrImportant", wintypes.DWORD),
+            ]
+
+        self._ctypes = ctypes
+        self._header_type = BITMAPINFOHEADER
+        self._user32 = ctypes.windll.user32
+        self._gdi32 = ctypes.windll.gdi32
+        handle = ctypes.c_void_p
+        self._user32.GetDC.restype = handle
+        self._user32.GetDC.argtypes = [handle]
+        self._user32.ReleaseDC.argtypes = [handle, handle]
+        self._gdi32.CreateCompatibleDC.restype = handle
+        self._gdi32.CreateCompatibleDC.argtypes = [handle]
+        self._gdi32.CreateDIBSection.restype = handle
+        self._gdi32.CreateDIBSection.argtypes = [handle, ctypes.c_void_p, wintypes.UINT,
+                                                 ctypes.POINTER(ctypes.c_void_p), handle,
+                                                 wintypes.DWORD]
+        self._gdi32.SelectObject.restype = handle
+        self._gdi32.SelectObject.argtypes = [handle, handle]
+        self._gdi32.DeleteObject.argtypes = [handle]
+        self._gdi32.DeleteDC.argtypes = [handle]
+        self._gdi32.BitBlt.argtypes = [handle, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                       ctypes.c_int, handle, ctypes.c_int, ctypes.c_int,
+                                       wintypes.DWORD]
+
+        self._screen_dc = self._user32.GetDC(None)
+        self._memory_dc = self._gdi32.CreateCompatibleDC(self._screen_dc)
+        self._bitmap = None
+        self._previous_bitmap = None
+        self._pixels: Optional[np.ndarray] = None
+
+    def _ensure_bitmap(self, width: int, height: int):
+        if self._pixels is not None and self._pixels.shape[:2] == (height, width):
+            return
+        self._release_bitmap()
+        ctypes = self._ctypes
+        header = self._header_type()
+        header.biSize = ctypes.sizeof(header)
+        header.biWidth = width
+        header.biHeight = -height  # top-down rows
+        header.biPlanes = 1
+        header.biBitCount = 32
+        bits = ctypes.c_void_p()
+        self._bitmap = self._gdi32.CreateDIBSection(self._memory_dc, ctypes.byref(header), 0,
+                                                    ctypes.byref(bits), None, 0)
+        if not self._bitmap:
+            raise OSError("CreateDIBSection failed")
+        self._previous_bitmap = self._gdi32.SelectObject(self._memory_dc, self._bitmap)
+        pointer = ctypes.cast(bits, ctypes.POINTER(ctypes.c_uint8))
+        self._pixels = np.ctypeslib.as_array(pointer, shape=(height, width, 4))
+
+    def _release_bitmap(self):
+        if self._bitmap:
+            self._gdi32.SelectObject(self._memory_dc, self._previous_bitmap)
+            self._gdi32.DeleteObject(self._bitmap)
+        self._bitmap = None
+        self._pixels = None
+
+    def grab(self, bbox: Optional[BBox] = None) -> Optional[np.ndarray]:
+        if bbox is None:
+            # The whole virtual screen; left/top are negative when a monitor
+            # sits left of or above the primary one
+            metrics = self._user32.GetSystemMetrics
+            left, top = metrics(76), metrics(77)  # SM_[XY]VIRTUALSCREEN
+            bbox = (left, top, left + metrics(78), top + metrics(79))  # SM_C[XY]VIRTUALSCREEN
+        left, top, right, bottom = bbox
+        width, height = right - left, bottom - top
+        if width <= 0 or height <= 0:
+            return None
+        self._ensure_bitmap(width, height)
+        if not self._gdi32.BitBlt(self._memory_dc, 0, 0, width, height, self._screen_dc,
+                                  left, top, self.SRCCOPY | self.CAPTUREBLT):
+            raise OSError("BitBlt failed")
+        self._gdi32.GdiFlush()
+        self.origin = (left, top)
+        return self._pixels
+
+    def close(self):
+        self._release_bitmap()
+        if self._memory_dc:
+            self._gdi32.DeleteDC(self._memory_dc)
+            self._memory_dc = None
+        if self._screen_dc:
+            self._user32.ReleaseDC(None, self._screen_dc)
+            self._screen_dc = None
+
+
+class ReplayBackend(CaptureBackend):
+    """Replay frames from an image file, a directory/glob of images or a video
+
+    With realtime=True the frame shown depends on wall-clock time at `fps`,
+    so several backends opened on the same source stay in step. Otherwise
+    every grab() advances one frame. grab() returns None at the end unless
+    loop is set.
+    """
+
+    name = "replay"
+
+    def __init__(self, source: str, fps: float = 1.0, realtime: bool = True, loop: bool = True):
+        self.source = source
+        self.fps = fps
+        self.realtime = realtime
+        self.loop = loop
+        self.images: List[str] = self.list_images(source)
+        self._video = None
+        self._video_index = -1
+        self.source_fps: Optional[float] = None  # frame rate of a video source
+        self._decoded: Optional[np.ndarray] = None
+        self._buffer: Optional[np.ndarray] = None
+        self._started = time.monotonic()
+        self._position = 0
+        self.frame_count = len(self.images) if self.images else self._open_video()
+        if not self.frame_count:
+            raise ValueError(f"No frames found in {source}")
+
+    @staticmethod
+    def list_images(source: str) -> List[str]:
+        """Sorted image files of a file, directory or glob; empty for a video"""
+        if os.path.isdir(source):
+            paths = [os.path.join(source, name) for name in os.listdir(source)]
+        elif any(char in source for char in "*?["):
+            paths = glob.glob(source)
+        elif source.lower().endswith(IMAGE_EXTENSIONS):
+            paths = [source]
+        else:
+            return []
+        return sorted(path for path in paths if path.lower().endswith(IMAGE_EXTENSIONS))
+
+    def _open_video(self) -> int:
+        if self._video is not None:
+            self._video.release()
+        self._video = cv2.VideoCapture(self.source)
+        self._video_index = -1
+        if not self._video.isOpened():
+            return 0
+        self.source_fps = self._video.get(cv2.CAP_PROP_FPS) or None
+        return int(self._video.get(cv2.CAP_PROP_FRAME_COUNT)) or sys.maxsize
+
+    def _next_index(self) -> Optional[int]:
+        if self.realtime:
+            index = int((time.monotonic() - self._started) * self.fps)
+        else:
+            index = self._position
+            self._position += 1
+        if index >= self.frame_count:
+            if not self.loop or self.frame_count == sys.maxsize:
+                return None
+            index %= self.frame_count
+        return index
+
+    def seek(self, index: int):
+        """Make the next non-realtime grab() return frame `index`"""
+        self._position = index
+        if self._video is not None and index > self._video_index + SEEK_DISTANCE:
+            # Jump close to the frame instead of decoding everything before it
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, index)
+            self._video_index = index - 1
+
+    def _read_video(self, index: int) -> Optional[np.ndarray]:
+        if index < self._video_index:
+            self._open_video()
+        # Decode forward into the same BGR buffer until we reach the frame
+        while self._video_index < index:
+            ok, frame = self._video.read(self._decoded)
+            if not ok:
+                if self.loop and self._video_index >= 0:
+                    self.frame_count = self._video_index + 1
+                    self._open_video()
+                    index %= self.frame_count
+                    continue
+                return None
+            self._decoded = frame
+            self._video_index += 1
+        return self._decoded
+
+    def grab(self, bbox: Optional[BBox] = None) -> Optional[np.ndarray]:
+        index = self._next_index()
+        if index is None:
+            return None
+        if self.images:
+            decoded = cv2.imread(self.images[index], cv2.IMREAD_COLOR)
+        else:
+            decoded = self._read_video(index)
+        if decoded is None:
+            return None
+        shape = decoded.shape[:2] + (4,)
+        if self._buffer is None or self._buffer.shape != shape:
+            self._buffer = np.empty(shape, dtype=np.uint8)
+        cv2.cvtColor(decoded, cv2.COLOR_BGR2BGRA, dst=self._buffer)
+        return _crop(self._buffer, bbox)
+
+    def close(self):
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+
+
+def create_capture_backend(spec: Optional[str] = None) -> CaptureBackend:
+    """Create a capture backend from a spec such as "gdi", "pil" or "replay:<path>"
+
+    The default comes from the SCREEN_ASSISTANT_CAPTURE environment variable,
+    then GDI on Windows and PIL elsewhere.
+    """
+    spec = spec or os.environ.get("SCREEN_ASSISTANT_CAPTURE") or (
+        "gdi" if sys.platform == "win32" else "pil")
+    if spec.startswith("replay:"):
+        return ReplayBackend(spec[len("replay:"):])
+    if spec == "gdi":
+        try:
+            return GdiCaptureBackend()
+        except Exception as e:
+            print(f"GDI capture unavailable, falling back to PIL: {e}")
+    return PILCaptureBackend()
+
+
+def frame_to_qimage(frame: np.ndarray):
+    """Wrap a BGRA frame in a QImage without copying
+
+    The QImage reads the frame's memory directly, so it must not be used
+    after the frame's buffer is reused by the next grab().
+    """
+    from PySide6.QtGui import QImage
+    if not frame.flags.c_contiguous:
+        frame = np.ascontiguousarray(frame)
+    height, width = frame.shape[:2]
+    return QImage(frame.data, width, height, frame.strides[0], QImage.Format.Format_RGB32)
+
+
+def frame_to_bgr(frame: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+
+
+def frame_to_gray(frame: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
+    return cv2.cvtColor(frame, cv2.COLOR_BGRA2GRAY, dst=dst)
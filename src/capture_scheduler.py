@@ -0,0 +1,100 @@
+import time
+from typing import Callable
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+
+class CaptureScheduler(QObject):
+    """Run a capture callback at an interval that follows user activity
+
+    The interval drops to min_interval_ms while input events arrive and
+    doubles on every idle tick up to max_interval_ms. The timer stops
+    entirely while paused or hidden. The callback's own run time is kept
+    within budget_ms_per_second by stretching the interval when needed.
+    """
+
+    # May be emitted from any thread; delivered on the scheduler's thread
+    activity = Signal()
+
+    def __init__(self, callback: Callable[[], None], min_interval_ms: int = 250,
+                 max_interval_ms: int = 8000, idle_after_ms: int = 2000,
+                 budget_ms_per_second: float = 100.0, parent=None):
+        super().__init__(parent)
+        self.callback = callback
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max_interval_ms
+        self.idle_after_ms = idle_after_ms
+        self.budget_ms_per_second = budget_ms_per_second
+        self.interval_ms = min_interval_ms
+        self.average_cost_ms = 0.0
+
+        self._paused = False
+        self._visible = True
+        self._last_activity = 0.0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._tick)
+        self.activity.connect(self._on_activity)
+
+    def start(self):
+        self._update_running()
+
+    def stop(self):
+        self._timer.stop()
+
+    def is_running(self) -> bool:
+        return self._timer.isActive()
+
+    def notify_activity(self):
+        """Report user input; safe to call from listener threads"""
+        self.activity.emit()
+
+    def set_paused(self, paused: bool):
+        self._paused = paused
+        self._update_running()
+
+    def set_visible(self, visible: bool):
+        self._visible = visible
+        self._update_running()
+
+    def _update_running(self):
+        if self._paused or not self._visible:
+            self._timer.stop()
+        elif not self._timer.isActive():
+            # Capture promptly when becoming visible or resumed
+            self.interval_ms = self.min_interval_ms
+            self._timer.start(0)
+
+    def _on_activity(self):
+        self._last_activity = time.monotonic()
+        if not self._timer.isActive():
+            return
+        # Wake up early from a long idle interval
+        if self._timer.remainingTime() > self._budgeted(self.min_interval_ms):
+            self.interval_ms = self.min_interval_ms
+            self._timer.start(self._budgeted(self.min_interval_ms))
+
+    def _budgeted(self, interval_ms: float) -> int:
+        """Stretch an interval so the callback stays within its time budget"""
+        if self.budget_ms_per_second > 0:
+            interval_ms = max(interval_ms, self.average_cost_ms * 1000 / self.budget_ms_per_second)
+        return int(min(max(interval_ms, self.min_interval_ms), self.max_interval_ms))
+
+    def _tick(self):
+        started = time.perf_counter()
+        try:
+            self.callback()
+        except Exception as e:
+            print(f"Error during scheduled capture: {e}")
+        cost_ms = (time.perf_counter() - started) * 1000
+        self.average_cost_ms = 0.8 * self.average_cost_ms + 0.2 * cost_ms if self.average_cost_ms else cost_ms
+
+        idle_ms = (time.monotonic() - self._last_activity) * 1000
+        if idle_ms < self.idle_after_ms:
+            self.interval_ms = self.min_interval_ms
+        else:
+            # Back off exponentially while nothing is happening
+            self.interval_ms = min(self.interval_ms * 2, self.max_interval_ms)
+
+        if not self._paused and self._visible:
+            self._timer.start(self._budgeted(self.interval_ms))
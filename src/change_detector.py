@@ -0,0 +1,102 @@
+import numpy as np
+from typing import List, Optional, Tuple
+
+# Dirty rectangles are (x, y, width, height) in frame pixels
+Rect = Tuple[int, int, int, int]
+
+
+def rects_overlap(a: Rect, b: Rect) -> bool:
+    """Check whether two (x, y, width, height) rectangles intersect"""
+    return (a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and
+            a[1] < b[1] + b[3] and b[1] < a[1] + a[3])
+
+
+class ChangeDetector:
+    """Split frames into tiles and report which tiles changed since the last frame"""
+
+    def __init__(self, tile_size: int = 64, sample_step: int = 1):
+        # sample_step > 1 fingerprints a subsampled view: cheaper, but may miss
+        # changes that fall entirely between sampled pixels
+        self.tile_size = tile_size
+        self.sample_step = sample_step
+        self.last_mask: Optional[np.ndarray] = None
+        self._fingerprints: Optional[np.ndarray] = None
+        self._frame_shape = None
+        self._weights = None
+
+    def reset(self):
+        """Forget the previous frame so the next one is reported fully dirty"""
+        self._fingerprints = None
+        self._frame_shape = None
+        self.last_mask = None
+
+    def _get_weights(self, rows: int, cols: int) -> np.ndarray:
+        if self._weights is None or self._weights.shape != (rows, 1, cols):
+            # Fixed seed keeps fingerprints comparable across frames
+            rng = np.random.default_rng(0x5C4EE)
+            weights = rng.integers(1, 2**32, size=(rows, 1, cols), dtype=np.uint32)
+            self._weights = weights | np.uint32(1)
+        return self._weights
+
+    def fingerprint(self, frame) -> np.ndarray:
+        """Compute one 64-bit checksum per tile, returned as a (rows, cols) array"""
+        frame = np.asarray(frame)
+        if frame.ndim == 2:
+            frame = frame[:, :, np.newaxis]
+        step = self.sample_step
+        if step > 1:
+            frame = frame[::step, ::step]
+        tile = max(1, self.tile_size // step)
+        height, width, channels = frame.shape
+        rows = -(-height // tile)
+        cols = -(-width // tile)
+        weights = self._get_weights(tile, tile * channels)
+
+        fingerprints = np.empty((rows, cols), dtype=np.uint64)
+        # Hash one strip of tiles at a time so the uint32 scratch stays small
+        for row in range(rows):
+            strip = frame[row * tile:(row + 1) * tile]
+            if strip.shape[0] != tile or width != cols * tile:
+                strip = np.pad(strip, ((0, tile - strip.shape[0]),
+                                       (0, cols * tile - width), (0, 0)))
+            tiles = strip.reshape(tile, cols, tile * channels)
+            products = np.multiply(tiles, weights, dtype=np.uint32)
+            fingerprints[row] = products.sum(axis=(0, 2), dtype=np.uint64)
+        return fingerprints
+
+    def detect(self, frame) -> List[Rect]:
+        """Return the dirty rectangles of frame, merging adjacent dirty tiles per row"""
+        frame = np.asarray(frame)
+        fingerprints = self.fingerprint(frame)
+        height, width = frame.shape[:2]
+
+        if self._fingerprints is None or self._frame_shape != frame.shape:
+            mask = np.ones(fingerprints.shape, dtype=bool)
+        else:
+            mask = fingerprints != self._fingerprints
+        self._fingerprints = fingerprints
+        self._frame_shape = frame.shape
+        self.last_mask = mask
+        return self.mask_to_rects(mask, height, width)
+
+    def mask_to_rects(self, mask: np.ndarray, height: int, width: int) -> List[Rect]:
+        """Turn a (rows, cols) dirty tile mask into rectangles, one per run of tiles in a row"""
+        tile = max(1, self.tile_size // self.sample_step) * self.sample_step
+        rects = []
+        for row in np.flatnonzero(mask.any(axis=1)):
+            # Find runs of consecutive dirty tiles in this row
+            padded = np.concatenate(([False], mask[row], [False]))
+            edges = np.flatnonzero(padded[1:] != padded[:-1])
+            y = int(row) * tile
+            h = min(tile, height - y)
+            for start, end in zip(edges[::2], edges[1::2]):
+                x = int(start) * tile
+                w = min(int(end) * tile, width) - x
+                rects.append((x, y, w, h))
+        return rects
+
+    def dirty_fraction(self) -> float:
+        """Fraction of tiles that changed in the last detected frame"""
+        if self.last_mask is None or not self.last_mask.size:
+            return 0.0
+        return float(self.last_mask.mean())
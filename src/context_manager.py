@@ -1,182 +1,340 @@
-from datetime import datetime
-import pytesseract
+import threading
 import cv2
 import numpy as np
-from pynput import mouse, keyboard
-from dataclasses import dataclass
-from typing import List, Dict, Set, Optional
-import win32gui
-import win32process
-import psutil
-
-# Add this if Tesseract isn't in your PATH
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-
-@dataclass
-class Region:
-    x: int
-    y: int
-    width: int
-    height: int
-    content_type: str
-    confidence: float
-    content: Optional[str] = None
-
-@dataclass
-class UserAction:
-    timestamp: datetime
-    action_type: str
-    window_title: str
-    process_name: str
-    extra_data: Dict = None
+from typing import List, Dict, Set, Optional, Union
+from change_detector import Rect
+from ocr_cache import OCRCache, split_text_bands
+from ocr_engine import OCREngine, get_engine
+from action_history import ActionHistory, UserAction
+from preprocessing import PreprocessedFrame, Preprocessor
+from text_candidates import compare_with_full_frame, find_text_candidates
+from input_events import InputEventPipeline
+from journal import ActionJournal
+from text_index import SearchHit, TextIndex
+from window_registry import WindowRegistry
+from platform_backend import PlatformBackend, get_backend
+from region_store import GridIndex, Region, RegionArray
+from region_tracker import RegionTracker, TrackedFrame
+from perf import perf
+
+# Menu labels skipped when organizing window text
+COMMON_UI_TEXT = ["File", "Edit", "View", "Help"]
 
 class ContextManager:
-    def __init__(self):
-        self.action_history: List[UserAction] = []
-        self.active_regions: List[Region] = []
+    def __init__(self, ocr_cache_bytes: int = 32 * 1024 * 1024, ocr_band_height: int = 128,
+                 ocr_engine: Optional[OCREngine] = None, history_capacity: int = 10000,
+                 backend: Optional[PlatformBackend] = None, roi_ocr: bool = True,
+                 start_tracking: bool = True, journal_dir: Optional[str] = None,
+                 text_index_dir: Optional[str] = None):
+        self.action_history = ActionHistory(capacity=history_capacity)
+        self.backend = backend or get_backend()
+        # Durable copy of actions and OCR snapshots; older history is paged from it
+        self.journal = None
+        if journal_dir is not None:
+            self.journal = ActionJournal(journal_dir)
+            self.journal.start()
+        # Window metadata cache, event-driven once tracking starts
+        self.window_registry = WindowRegistry(self.backend)
+        self.input_events = InputEventPipeline(self.backend, self.action_history,
+                                               journal=self.journal,
+                                               window_cache=self.window_registry)
+        # Searchable record of all OCR'd text
+        self.text_index = TextIndex(text_index_dir) if text_index_dir is not None else None
+        self.active_regions = RegionArray()
         self.current_window = None
-        self.setup_tracking()
+        # Created on first use (or by warm_up_ocr) so construction stays cheap
+        self._ocr_engine = ocr_engine
+        self.ocr_cache = OCRCache(max_bytes=ocr_cache_bytes)
+        self.ocr_band_height = ocr_band_height
+        # OCR only candidate text crops instead of whole-frame bands
+        self.roi_ocr = roi_ocr
+        self.preprocessor = Preprocessor(pyramid_levels=1)
+        # Carries regions and OCR text across scrolled frames of a window
+        self.region_tracker = RegionTracker(self)
+        self.keyboard_listener = None
+        self.mouse_listener = None
+        if start_tracking:
+            self.setup_tracking()
+
+    @property
+    def active_regions(self) -> RegionArray:
+        return self._active_regions
+
+    @active_regions.setter
+    def active_regions(self, regions: RegionArray):
+        self._active_regions = regions
+        # Built by the first large query_regions() on these regions
+        self._region_index: Optional[GridIndex] = None
+
+    @property
+    def ocr_engine(self) -> OCREngine:
+        if self._ocr_engine is None:
+            self._ocr_engine = get_engine()
+        return self._ocr_engine
+
+    def warm_up_ocr(self, on_ready=None) -> threading.Thread:
+        """Create the OCR engine and load its models on a background thread
+        
+        on_ready(error_or_None) is called from that thread when done.
+        """
+        def warm_up():
+            error = None
+            try:
+                self.ocr_engine.warm_up()
+            except Exception as e:
+                error = e
+                print(f"OCR warm-up failed: {e}")
+            if on_ready is not None:
+                on_ready(error)
+        
+        thread = threading.Thread(target=warm_up, name="ocr-warm-up", daemon=True)
+        thread.start()
+        return thread
         
     def setup_tracking(self):
         """Initialize input tracking"""
+        if self.keyboard_listener is not None:
+            return
+        # pynput is only imported once tracking actually starts
+        from pynput import mouse, keyboard
+        # Window event hooks are delivered on this thread's message loop
+        self.window_registry.start()
+        self.input_events.start()
         self.keyboard_listener = keyboard.Listener(on_press=self._on_key_press)
         self.mouse_listener = mouse.Listener(on_click=self._on_mouse_click)
         self.keyboard_listener.start()
         self.mouse_listener.start()
 
+    def stop_tracking(self):
+        """Stop input listeners and flush queued events"""
+        if self.keyboard_listener is not None:
+            self.keyboard_listener.stop()
+            self.mouse_listener.stop()
+            self.keyboard_listener = None
+            self.mouse_listener = None
+        self.window_registry.stop()
+        self.input_events.stop()
+
+    def close(self):
+        """Stop tracking and flush the journal and text index to disk"""
+        self.stop_tracking()
+        if self.journal is not None:
+            self.journal.close()
+        if self.text_index is not None:
+            self.text_index.close()
+
     def _on_key_press(self, key):
         """Track keyboard events"""
-        try:
-            window = win32gui.GetForegroundWindow()
-            window_title = win32gui.GetWindowText(window)
-            pid = win32process.GetWindowThreadProcessId(window)[1]
-            process_name = psutil.Process(pid).name()
-            
-            action = UserAction(
-                timestamp=datetime.now(),
-                action_type="keyboard",
-                window_title=window_title,
-                process_name=process_name,
-                extra_data={"key": str(key)}
-            )
-            self.action_history.append(action)
-            
-            # Keep only last 100 actions
-            if len(self.action_history) > 100:
-                self.action_history.pop(0)
-        except Exception as e:
-            print(f"Error tracking keyboard event: {e}")
+        # Window lookups happen on the input_events thread, not in the hook
+        with perf.stage("input.key_hook"):
+            self.input_events.push("keyboard", {"key": str(key)})
 
     def _on_mouse_click(self, x, y, button, pressed):
         """Track mouse events"""
         if pressed:
-            try:
-                window = win32gui.GetForegroundWindow()
-                window_title = win32gui.GetWindowText(window)
-                pid = win32process.GetWindowThreadProcessId(window)[1]
-                process_name = psutil.Process(pid).name()
-                
-                action = UserAction(
-                    timestamp=datetime.now(),
-                    action_type="mouse",
-                    window_title=window_title,
-                    process_name=process_name,
-                    extra_data={"position": (x, y), "button": str(button)}
-                )
-                self.action_history.append(action)
-            except Exception as e:
-                print(f"Error tracking mouse event: {e}")
+            with perf.stage("input.mouse_hook"):
+                self.input_events.push("mouse", {"position": (x, y), "button": str(button)})
 
-    def process_screenshot(self, image) -> List[Region]:
-        """Process screenshot to detect regions of interest"""
-        # Convert PIL image to OpenCV format
-        cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        
-        regions = []
-        
-        # Get text regions
-        text_regions = self._detect_text_regions(cv_image)
-        regions.extend(text_regions)
-        
-        # Get UI element regions
-        ui_regions = self._detect_ui_regions(cv_image)
-        regions.extend(ui_regions)
+    def process_screenshot(self, image, dirty_rects: Optional[List[Rect]] = None) -> RegionArray:
+        """Process screenshot to detect regions of interest
         
+        When dirty_rects is given, only those areas are re-analyzed and regions
+        outside them are carried over from the previous call. Iterate the
+        result or call to_regions() for Region dataclasses.
+        """
+        if dirty_rects is not None and not dirty_rects:
+            perf.count("context.frames_skipped")
+            return self.active_regions
+
+        regions = self.detect_regions(image, dirty_rects, self.active_regions)
         self.active_regions = regions
+        perf.gauge("context.active_regions", len(regions))
+        self._index_regions(regions)
         return regions
 
-    def _detect_text_regions(self, image) -> List[Region]:
-        """Detect regions containing text"""
-        regions = []
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    def detect_regions(self, image, dirty_rects: Optional[List[Rect]] = None,
+                       previous: Optional[RegionArray] = None,
+                       preprocessor: Optional[Preprocessor] = None) -> RegionArray:
+        """Detect regions without touching active_regions or the text index
+
+        With dirty_rects, regions of previous outside them are kept and only
+        the rectangles are re-analyzed. Callers on other threads pass their
+        own preprocessor, since its buffers are reused between calls.
+        """
+        preprocessor = preprocessor or self.preprocessor
+        with perf.stage("context.process_screenshot"):
+            # Grayscale and both binaries are computed once and shared
+            with perf.stage("context.preprocess"):
+                frame = preprocessor.run(image)
+            if dirty_rects is not None:
+                previous = RegionArray() if previous is None else previous
+                return self._process_dirty_rects(frame, dirty_rects, previous)
+
+            # Get text regions and UI element regions
+            with perf.stage("context.text_regions"):
+                text_regions = self._detect_text_regions(frame)
+            with perf.stage("context.ui_regions"):
+                ui_regions = self._detect_ui_regions(frame)
+            return RegionArray.concatenate([text_regions, ui_regions])
+
+    def track_screenshot(self, image, window_key=None) -> TrackedFrame:
+        """Process a frame of one window, reusing regions that only scrolled
+
+        The result adds stable region ids and the text that is new since the
+        window's previous frame. active_regions is left alone.
+        """
+        return self.region_tracker.update(image, window_key)
+
+    def _process_dirty_rects(self, frame: PreprocessedFrame, dirty_rects: List[Rect],
+                             previous: RegionArray) -> RegionArray:
+        """Re-detect regions inside the changed rectangles only"""
+        # Keep previous regions that no changed tile touches
+        parts = [previous[~previous.overlapping_any(dirty_rects)]]
         
-        # Improve image quality for OCR
-        gray = cv2.medianBlur(gray, 3)
-        gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        for x, y, w, h in dirty_rects:
+            crop = frame.crop(x, y, w, h)
+            # Map crop coordinates back to the full frame
+            parts.append(self._detect_text_regions(crop).offset(x, y))
+            parts.append(self._detect_ui_regions(crop).offset(x, y))
         
-        # Get OCR data with bounding boxes
-        custom_config = r'--oem 3 --psm 11'
-        ocr_data = pytesseract.image_to_data(gray, output_type=pytesseract.Output.DICT, config=custom_config)
+        return RegionArray.concatenate(parts)
+
+    def _detect_text_regions(self, frame: PreprocessedFrame) -> RegionArray:
+        """Detect regions containing text"""
+        if self.roi_ocr:
+            return self._detect_text_regions_roi(frame)
+        return self._detect_text_regions_full(frame)
+
+    def _detect_text_regions_full(self, frame: PreprocessedFrame) -> RegionArray:
+        """OCR the whole frame in horizontal bands"""
+        binary = frame.text_binary
         
-        n_boxes = len(ocr_data['text'])
-        for i in range(n_boxes):
-            # Filter empty results and low confidence
-            if float(ocr_data['conf'][i]) > 60 and ocr_data['text'][i].strip():
-                region = Region(
-                    x=ocr_data['left'][i],
-                    y=ocr_data['top'][i],
-                    width=ocr_data['width'][i],
-                    height=ocr_data['height'][i],
-                    content_type="text",
-                    confidence=float(ocr_data['conf'][i]),
-                    content=ocr_data['text'][i]
-                )
-                regions.append(region)
+        # OCR each horizontal band separately so unchanged bands hit the cache
+        bands = split_text_bands(binary, self.ocr_band_height)
+        band_results = self._cached_ocr([binary[top:bottom] for top, bottom in bands], psm=11)
+        return RegionArray.concatenate([
+            band_regions.offset(0, top) for (top, _), band_regions in zip(bands, band_results)
+        ])
+
+    def _text_candidates(self, frame: PreprocessedFrame) -> List[Rect]:
+        # Detect candidates at half resolution when the pyramid is available
+        if frame.pyramid:
+            return find_text_candidates(frame.pyramid[0], scale=2)
+        return find_text_candidates(frame.gray)
+
+    def _detect_text_regions_roi(self, frame: PreprocessedFrame) -> RegionArray:
+        """OCR only the line/block crops that look like text"""
+        binary = frame.text_binary
         
-        return regions
-    def _detect_ui_regions(self, image) -> List[Region]:
+        # All crops go to the engine as one parallel batch
+        candidates = self._text_candidates(frame)
+        crops = [binary[y:y + h, x:x + w] for x, y, w, h in candidates]
+        # Map crop coordinates back to the frame
+        return RegionArray.concatenate([
+            crop_regions.offset(x, y)
+            for (x, y, _, _), crop_regions in zip(candidates, self._cached_ocr(crops, psm=6))
+        ])
+
+    def verify_roi_ocr(self, image) -> Dict:
+        """Compare ROI OCR with full-frame OCR on one image (recall and pixels sent)"""
+        frame = self.preprocessor.run(image)
+        roi_regions = self._detect_text_regions_roi(frame)
+        full_regions = self._detect_text_regions_full(frame)
+        return compare_with_full_frame(roi_regions, full_regions,
+                                       self._text_candidates(frame), frame.gray.shape)
+
+    def _cached_ocr(self, images: List[np.ndarray], psm: int, as_text: bool = False) -> list:
+        """OCR many crops in one engine batch, serving repeated crops from the cache"""
+        config = f"psm={psm}|{'text' if as_text else 'data'}"
+        keys = [OCRCache.make_key(image, config) for image in images]
+        results = [self.ocr_cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        perf.count("ocr.cache_hits", len(images) - len(missing))
+        if not missing:
+            return results
+
+        batch = [images[i] for i in missing]
+        perf.count("ocr.calls", len(batch))
+        with perf.stage("ocr.batch"):
+            if as_text:
+                outputs = [text.strip() for text in self.ocr_engine.batch_image_to_string(batch, psm)]
+            else:
+                outputs = [RegionArray.from_ocr_data(data, min_confidence=60)
+                           for data in self.ocr_engine.batch_image_to_data(batch, psm)]
+        for i, output in zip(missing, outputs):
+            results[i] = output
+            self.ocr_cache.put(keys[i], output)
+        return results
+
+    def ocr_text(self, binary, psm: int = 6) -> str:
+        """Extract plain text from a binarized image, band by band through the OCR cache"""
+        bands = split_text_bands(binary, self.ocr_band_height)
+        texts = self._cached_ocr([binary[top:bottom] for top, bottom in bands], psm=psm, as_text=True)
+        return "\n".join(text for text in texts if text)
+
+    def _detect_ui_regions(self, frame: PreprocessedFrame) -> RegionArray:
         """Detect UI elements like buttons, input boxes, etc."""
-        regions = []
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Apply threshold to get binary image
-        _, binary = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
+        # Find contours in the shared inverted binary image
+        contours, _ = cv2.findContours(frame.ui_binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return RegionArray()
         
-        # Find contours
-        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # Get bounding rectangles and filter small regions
+        boxes = np.array([cv2.boundingRect(contour) for contour in contours])
+        boxes = boxes[(boxes[:, 2] > 20) & (boxes[:, 3] > 20)]
         
-        for contour in contours:
-            # Get bounding rectangle
-            x, y, w, h = cv2.boundingRect(contour)
-            
-            # Filter small regions
-            if w > 20 and h > 20:
-                region = Region(
-                    x=x,
-                    y=y,
-                    width=w,
-                    height=h,
-                    content_type="ui_element",
-                    confidence=0.8  # Default confidence for UI elements
-                )
-                regions.append(region)
-        
-        return regions
+        # Default confidence for UI elements
+        return RegionArray.from_boxes(boxes, "ui_element", 0.8)
+
+    def record_snapshot(self, window_title: str, text: str, rect=None):
+        """Journal an analysis result, if a journal is configured"""
+        if self.journal is not None:
+            self.journal.record_snapshot(window_title, text, rect)
+
+    def _index_regions(self, regions: RegionArray):
+        """Add a processed screen's words to the text index"""
+        if self.text_index is None:
+            return
+        with perf.stage("context.index_text"):
+            title, process = self.window_registry.foreground_info()
+            self.text_index.add_regions(regions, title, process)
+
+    def index_text(self, window_title: str, text: str, rect=None, process_name: str = ""):
+        """Add analysis text to the text index; rect is the analyzed window's screen rectangle"""
+        if self.text_index is None:
+            return
+        bbox = (0, 0, 0, 0)
+        if rect is not None:
+            left, top, right, bottom = rect
+            bbox = (left, top, right - left, bottom - top)
+        self.text_index.add_text(text, bbox, window_title, process_name)
+
+    def search_text(self, query: str, since: Optional[float] = None,
+                    limit: int = 50) -> List[SearchHit]:
+        """Search everything OCR has seen; see TextIndex.search for the syntax"""
+        if self.text_index is None:
+            return []
+        with perf.stage("context.search_text"):
+            return self.text_index.search(query, since=since, limit=limit)
+
+    def recent_actions(self, limit: int = 5) -> List[UserAction]:
+        """Newest actions, oldest first, paging from the journal past the in-memory history"""
+        actions = self.action_history.recent(limit)
+        if self.journal is None or len(actions) >= limit:
+            return actions
+        before = actions[0].timestamp.timestamp() if actions else float("inf")
+        return self.journal.actions_before(before, limit - len(actions)) + actions
 
     def get_recent_context(self, limit: int = 5) -> Dict:
         """Get recent context information"""
         return {
-            "recent_actions": self.action_history[-limit:],
+            "recent_actions": self.recent_actions(limit),
             "active_regions": self.active_regions,
             "current_window": self.current_window
         }
     
 
-    def _filter_and_organize_text(self, regions: List[Region]) -> dict:
+    def _filter_and_organize_text(self, regions: Union[RegionArray, List[Region]]) -> dict:
         """Organize detected text by active windows and content types"""
         organized = {
             "active_window": [],
@@ -185,68 +343,39 @@ class ContextManager:
         }
         
         try:
-            # Get active window info
-            window = win32gui.GetForegroundWindow()
-            rect = win32gui.GetWindowRect(window)
-            title = win32gui.GetWindowText(window)
+            # Get active window info from the registry cache
+            window = self.window_registry.foreground_window()
+            if window is None or window.client_rect is None:
+                return organized
+            title = window.title
             organized["window_title"] = title
             
-            # Get window client area (excludes title bar and borders)
-            client_rect = win32gui.GetClientRect(window)
-            left, top, right, bottom = client_rect
-            
-            # Convert client coordinates to screen coordinates
-            pt_left_top = win32gui.ClientToScreen(window, (left, top))
-            pt_right_bottom = win32gui.ClientToScreen(window, (right, bottom))
-            
-            client_area = (
-                pt_left_top[0],     # left
-                pt_left_top[1],     # top
-                pt_right_bottom[0], # right
-                pt_right_bottom[1]  # bottom
-            )
+            # Client area in screen coordinates (excludes title bar and borders)
+            client_area = window.client_rect
             
             print(f"Window: {title}")
             print(f"Client area: {client_area}")
             
             # Collect all text within the active window
-            window_text = []
-            for region in regions:
-                if region.content_type == "text" and region.content:
-                    # Skip common UI text and low confidence results
-                    if (region.confidence < 70 or 
-                        "confidence:" in region.content.lower() or
-                        region.content in ["File", "Edit", "View", "Help"]):
-                        continue
-                        
-                    # Check if text is within client area
-                    if (client_area[0] <= region.x <= client_area[2] and 
-                        client_area[1] <= region.y <= client_area[3]):
-                        window_text.append({
-                            "text": region.content.strip(),
-                            "confidence": region.confidence,
-                            "y": region.y
-                        })
-            
-            # Sort text by vertical position
-            window_text.sort(key=lambda x: x["y"])
+            regions = RegionArray.from_regions(regions)
+            text_regions = regions[regions.of_type("text") & (regions.data["content"] >= 0)]
+            contents = np.array(text_regions.texts(), dtype=str)
+            if not len(contents):
+                return organized
             
-            # Remove duplicates and merge nearby text
-            merged_text = []
-            prev_y = None
-            current_line = []
+            # Skip empty text, common UI text and low confidence results, and
+            # keep text whose origin is within the client area
+            keep = ((np.char.str_len(contents) > 0) &
+                    (text_regions.data["confidence"] >= 70) &
+                    (np.char.find(np.char.lower(contents), "confidence:") < 0) &
+                    ~np.isin(contents, COMMON_UI_TEXT) &
+                    text_regions.origins_within(*client_area))
+            window_text = text_regions[keep]
+            lines_text = np.char.strip(contents[keep])
             
-            for text in window_text:
-                if prev_y is None or abs(text["y"] - prev_y) > 10:
-                    if current_line:
-                        merged_text.append(" ".join(current_line))
-                    current_line = [text["text"]]
-                else:
-                    current_line.append(text["text"])
-                prev_y = text["y"]
-                
-            if current_line:
-                merged_text.append(" ".join(current_line))
+            # Sort text by vertical position and merge nearby text into lines
+            order, line_starts = window_text.group_lines(tolerance=10)
+            merged_text = [" ".join(line) for line in np.split(lines_text[order], line_starts[1:])]
                 
             organized["active_window"] = merged_text
                 
@@ -254,4 +383,16 @@ class ContextManager:
             
         except Exception as e:
             print(f"Error organizing text: {e}")
-            return organized
\ No newline at end of file
+            return organized
+
+    def query_regions(self, rect: Rect, regions: Optional[RegionArray] = None) -> RegionArray:
+        """Regions intersecting rect, using a grid index for large region sets"""
+        regions = self.active_regions if regions is None else regions
+        if len(regions) < 1000:
+            return regions[regions.overlapping(rect)]
+        if regions is not self._active_regions:
+            return regions[GridIndex(regions).query(rect)]
+        # The index lives until active_regions is assigned again
+        if self._region_index is None:
+            self._region_index = GridIndex(regions)
+        return regions[self._region_index.query(rect)]
@@ -0,0 +1,210 @@
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from change_detector import ChangeDetector, Rect
+
+
+def _codec(name: Optional[str]) -> Tuple[str, Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    """(name, compress, decompress); lz4 when installed, zlib at its fastest level otherwise"""
+    if name in (None, "lz4"):
+        try:
+            import lz4.frame
+            return "lz4", lz4.frame.compress, lz4.frame.decompress
+        except ImportError:
+            if name == "lz4":
+                raise
+    return "zlib", lambda data: zlib.compress(data, 1), zlib.decompress
+
+
+@dataclass(slots=True)
+class _Gop:
+    """A keyframe and the deltas recorded after it"""
+    shape: Tuple[int, ...]
+    keyframe: bytes
+    timestamps: List[float]  # keyframe first, then one per delta
+    deltas: List[List[Tuple[Rect, bytes]]] = field(default_factory=list)
+    nbytes: int = 0
+    origin: Tuple[int, int] = (0, 0)  # screen position of the frames' top-left pixel
+
+
+class FrameHistory:
+    """Rolling, compressed history of captured frames
+
+    Each group of pictures (GOP) starts with a compressed keyframe,
+    followed by deltas holding only the tiles that changed, each tile
+    compressed separately. A new GOP starts every keyframe_interval
+    seconds, on a size or capture origin change, or when most of the frame
+    changed. Once the history exceeds max_bytes the oldest whole GOPs are
+    dropped, but never the one still being written. frame_at() rebuilds a
+    frame from its keyframe and the deltas up to it, continuing from the
+    last rebuilt frame when scrubbing forward.
+
+    add_async() hands a copy of the frame to a writer thread so the
+    caller never waits for compression. Frames arriving faster than they
+    compress are merged into the newest one, dirty rects included.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, keyframe_interval: float = 30.0,
+                 tile_size: int = 64, full_fraction: float = 0.5, codec: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.keyframe_interval = keyframe_interval
+        self.full_fraction = full_fraction
+        self.codec, self._compress, self._decompress = _codec(codec)
+        self.detector = ChangeDetector(tile_size)
+        self.nbytes = 0
+        self._gops: "deque[_Gop]" = deque()
+        self._lock = threading.Lock()
+        # Last rebuilt frame: (gop, entry index, pixels)
+        self._cursor: Optional[Tuple[_Gop, int, np.ndarray]] = None
+        # Newest (frame, timestamp, dirty rects, origin) waiting for the writer thread
+        self._pending: Optional[Tuple[np.ndarray, float, Optional[List[Rect]],
+                                      Tuple[int, int]]] = None
+        self._pending_ready = threading.Condition()
+        self._writer: Optional[threading.Thread] = None
+        self._closing = False
+        self.merged = 0
+
+    def __len__(self):
+        return sum(len(gop.timestamps) for gop in self._gops)
+
+    def time_range(self) -> Optional[Tuple[float, float]]:
+        """Timestamps of the oldest and newest stored frames"""
+        with self._lock:
+            if not self._gops:
+                return None
+            return self._gops[0].timestamps[0], self._gops[-1].timestamps[-1]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"frames": len(self), "gops": len(self._gops), "bytes": self.nbytes,
+                    "codec": self.codec}
+
+    def add(self, frame: np.ndarray, timestamp: Optional[float] = None,
+            dirty_rects: Optional[List[Rect]] = None, origin: Tuple[int, int] = (0, 0)):
+        """Store a frame; dirty_rects from a ChangeDetector that saw every frame skips our own pass
+
+        origin is the capture backend's origin for the frame. Unchanged
+        frames are not stored: frame_at() returns the last changed frame
+        before the requested time.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            current = self._gops[-1] if self._gops else None
+            if dirty_rects is None:
+                dirty_rects = self.detector.detect(frame)
+                dirty_fraction = self.detector.dirty_fraction()
+            else:
+                height, width = frame.shape[:2]
+                dirty_fraction = sum(w * h for _, _, w, h in dirty_rects) / max(1, height * width)
+            same_screen = (current is not None and current.shape == frame.shape and
+                           current.origin == origin)
+            if same_screen and not dirty_rects:
+                return
+            if (not same_screen or
+                    dirty_fraction > self.full_fraction or
+                    timestamp - current.timestamps[0] >= self.keyframe_interval or
+                    current.nbytes > 2 * len(current.keyframe)):
+                keyframe = self._compress(np.ascontiguousarray(frame).tobytes())
+                self._gops.append(_Gop(frame.shape, keyframe, [timestamp], nbytes=len(keyframe),
+                                       origin=tuple(origin)))
+                self.nbytes += len(keyframe)
+            else:
+                tiles = [((x, y, w, h), self._compress(frame[y:y + h, x:x + w].tobytes()))
+                         for x, y, w, h in dirty_rects]
+                size = sum(len(data) for _, data in tiles)
+                current.deltas.append(tiles)
+                current.timestamps.append(timestamp)
+                current.nbytes += size
+                self.nbytes += size
+            self._evict()
+
+    def add_async(self, frame: np.ndarray, timestamp: Optional[float] = None,
+                  dirty_rects: Optional[List[Rect]] = None, origin: Tuple[int, int] = (0, 0)):
+        """Queue a copy of frame for add() on the writer thread"""
+        timestamp = time.time() if timestamp is None else timestamp
+        frame = frame.copy()
+        with self._pending_ready:
+            if self._closing:
+                return
+            if self._pending is not None:
+                # Not written yet: keep its changes so no tile is lost
+                previous = self._pending[2]
+                dirty_rects = (None if previous is None or dirty_rects is None
+                               else previous + list(dirty_rects))
+                self.merged += 1
+            self._pending = (frame, timestamp, dirty_rects, origin)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="frame-history",
+                                                daemon=True)
+                self._writer.start()
+            self._pending_ready.notify()
+
+    def _write_loop(self):
+        while True:
+            with self._pending_ready:
+                while self._pending is None and not self._closing:
+                    self._pending_ready.wait()
+                if self._pending is None:
+                    return
+                frame, timestamp, dirty_rects, origin = self._pending
+                self._pending = None
+            try:
+                self.add(frame, timestamp, dirty_rects, origin)
+            except Exception as e:
+                print(f"Error storing frame history: {e}")
+
+    def close(self):
+        """Write the queued frame and stop the writer thread"""
+        with self._pending_ready:
+            self._closing = True
+            self._pending_ready.notify()
+        if self._writer is not None:
+            self._writer.join(timeout=5)
+            self._writer = None
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and len(self._gops) > 1:
+            gop = self._gops.popleft()
+            self.nbytes -= gop.nbytes
+            if self._cursor is not None and self._cursor[0] is gop:
+                self._cursor = None
+
+    def frame_at(self, timestamp: float) -> Optional[Tuple[float, np.ndarray, Tuple[int, int]]]:
+        """(capture time, BGRA copy, origin) of the frame shown at timestamp; None if evicted"""
+        with self._lock:
+            starts = [gop.timestamps[0] for gop in self._gops]
+            index = bisect_right(starts, timestamp) - 1
+            if index < 0:
+                return None
+            gop = self._gops[index]
+            entry = bisect_right(gop.timestamps, timestamp) - 1
+
+            cursor = self._cursor
+            if cursor is not None and cursor[0] is gop and cursor[1] <= entry:
+                position, frame = cursor[1], cursor[2]
+            else:
+                position = 0
+                frame = np.frombuffer(self._decompress(gop.keyframe),
+                                      dtype=np.uint8).reshape(gop.shape).copy()
+            for delta in gop.deltas[position:entry]:
+                for (x, y, w, h), data in delta:
+                    frame[y:y + h, x:x + w] = np.frombuffer(
+                        self._decompress(data), dtype=np.uint8).reshape((h, w) + gop.shape[2:])
+            self._cursor = (gop, entry, frame)
+            return gop.timestamps[entry], frame.copy(), gop.origin
+
+    def clear(self):
+        with self._pending_ready:
+            self._pending = None
+        with self._lock:
+            self._gops.clear()
+            self._cursor = None
+            self.nbytes = 0
+            self.detector.reset()
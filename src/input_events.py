@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from action_history import ActionHistory
+from platform_backend import PlatformBackend
+
+# (timestamp, action_type, extra_data) as pushed by the input hooks
+RawEvent = Tuple[float, str, Optional[Dict]]
+
+
+class WindowInfoCache:
+    """hwnd -> (title, pid, process name) cache for the enrichment thread
+
+    An entry is refetched when the foreground window changes, when the
+    window's pid no longer matches (the pid was reused) or, for the title
+    only, after title_ttl seconds.
+    """
+
+    def __init__(self, backend: PlatformBackend, title_ttl: float = 0.5):
+        self.backend = backend
+        self.title_ttl = title_ttl
+        self._entries: Dict[int, Tuple[str, int, str, float]] = {}
+        self._foreground: Optional[int] = None
+
+    def foreground_info(self) -> Tuple[str, str]:
+        """Title and process name of the current foreground window"""
+        backend = self.backend
+        hwnd = backend.foreground_window()
+        if hwnd != self._foreground:
+            self._foreground = hwnd
+            self._entries.pop(hwnd, None)
+
+        now = time.monotonic()
+        pid = backend.window_pid(hwnd)
+        entry = self._entries.get(hwnd)
+        if entry is None or entry[1] != pid:
+            entry = (backend.window_title(hwnd), pid, backend.process_name(pid), now)
+        elif now - entry[3] > self.title_ttl:
+            entry = (backend.window_title(hwnd), pid, entry[2], now)
+        self._entries[hwnd] = entry
+        return entry[0], entry[2]
+
+    def foreground_infos(self, timestamps: Sequence[float]) -> List[Tuple[str, str]]:
+        """Per-timestamp foreground names; without window events only the current one is known"""
+        return [self.foreground_info()] * len(timestamps)
+
+    def invalidate(self, hwnd: Optional[int] = None):
+        if hwnd is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(hwnd, None)
+
+
+class InputEventPipeline:
+    """Decouple input hooks from window/process lookups
+
+    Hook callbacks only call push(), which appends to a deque (atomic under
+    the GIL, no lock taken). A background thread drains the queue every
+    batch_interval seconds, attributes each event to the window that was in
+    the foreground at its timestamp and appends the enriched actions to the
+    history. Per-event attribution needs a window cache fed by foreground
+    events (a started WindowRegistry); a plain WindowInfoCache can only
+    credit the whole batch to the window in front at drain time.
+    """
+
+    def __init__(self, backend: PlatformBackend, history: ActionHistory,
+                 batch_interval: float = 0.05,
+                 on_actions: Optional[Callable[[int], None]] = None,
+                 journal=None, window_cache=None):
+        self.backend = backend
+        self.history = history
+        # Optional ActionJournal; enriched batches are queued to it as well
+        self.journal = journal
+        self.batch_interval = batch_interval
+        self.on_actions = on_actions
+        # Anything with foreground_infos()/invalidate(), e.g. a WindowRegistry
+        self.window_cache = window_cache or WindowInfoCache(backend)
+        self.dropped = 0
+        self._queue: "deque[RawEvent]" = deque()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def push(self, action_type: str, extra_data: Optional[Dict] = None):
+        """Record a raw event; safe to call from any hook thread"""
+        self._queue.append((time.time(), action_type, extra_data))
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="input-events", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+        self.process_pending()
+
+    def _run(self):
+        while not self._stop.wait(self.batch_interval):
+            self.process_pending()
+
+    def _drain(self) -> List[RawEvent]:
+        events = []
+        queue = self._queue
+        while queue:
+            events.append(queue.popleft())
+        return events
+
+    def process_pending(self) -> int:
+        """Enrich and store every queued event; returns how many were stored"""
+        events = self._drain()
+        if not events:
+            return 0
+        try:
+            names = self.window_cache.foreground_infos([event[0] for event in events])
+        except Exception as e:
+            print(f"Error tracking input events: {e}")
+            self.window_cache.invalidate()
+            self.dropped += len(events)
+            return 0
+
+        actions = [(timestamp, action_type, window_title, process_name, extra_data)
+                   for (timestamp, action_type, extra_data), (window_title, process_name)
+                   in zip(events, names)]
+        for action in actions:
+            self.history.append_values(*action)
+        if self.journal is not None:
+            self.journal.record_actions(actions)
+        if self.on_actions is not None:
+            self.on_actions(len(events))
+        return len(events)
@@ -0,0 +1,314 @@
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from action_history import UserAction
+
+# (timestamp, action_type, window_title, process_name, extra_data)
+ActionRow = Tuple[float, str, str, str, Optional[dict]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS actions (
+    ts REAL NOT NULL,
+    type TEXT NOT NULL,
+    window TEXT NOT NULL,
+    process TEXT NOT NULL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS actions_ts ON actions (ts);
+CREATE TABLE IF NOT EXISTS snapshots (
+    ts REAL NOT NULL,
+    window TEXT NOT NULL,
+    rect TEXT,
+    text TEXT NOT NULL,
+    digest BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_ts ON snapshots (ts);
+"""
+
+# Compacted segments are marked with this PRAGMA user_version
+COMPACTED_VERSION = 1
+
+
+@dataclass(slots=True)
+class Snapshot:
+    timestamp: datetime
+    window_title: str
+    rect: Optional[Tuple[int, int, int, int]]
+    text: str
+
+
+def default_journal_dir() -> str:
+    """Journal location: SCREEN_ASSISTANT_JOURNAL or a folder in the user's home"""
+    return os.environ.get("SCREEN_ASSISTANT_JOURNAL") or os.path.join(
+        os.path.expanduser("~"), ".screen_assistant", "journal")
+
+
+class ActionJournal:
+    """Append-only on-disk journal of user actions and OCR snapshots
+
+    Data goes to a directory of SQLite segments in WAL mode. Callers only
+    append to in-memory queues; a background thread writes everything
+    queued in one transaction every flush_interval seconds, with
+    synchronous=FULL so each batch is fsynced. When the active segment
+    grows past segment_bytes a new one is started and the old one is
+    compacted (duplicate snapshots dropped, VACUUM). Oldest segments are
+    deleted once the journal exceeds max_bytes. Reads open read-only,
+    memory-mapped connections and scan segments newest first.
+
+    Which key was pressed is not written unless record_keys is set (or
+    SCREEN_ASSISTANT_JOURNAL_KEYS=1); keyboard actions keep only their type,
+    window and process on disk.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 1.0,
+                 segment_bytes: int = 16 * 1024 * 1024, max_bytes: int = 256 * 1024 * 1024,
+                 mmap_bytes: int = 256 * 1024 * 1024, record_keys: Optional[bool] = None):
+        self.directory = directory
+        if record_keys is None:
+            record_keys = os.environ.get("SCREEN_ASSISTANT_JOURNAL_KEYS", "") not in ("", "0")
+        self.record_keys = record_keys
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.mmap_bytes = mmap_bytes
+        self.written = 0
+        self._actions: "deque[ActionRow]" = deque()
+        self._snapshots: deque = deque()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+        segments = self.segments()
+        # Never append to an older segment: it may already be compacted
+        self._previous = segments[-1] if segments else None
+        self._sequence = self._segment_number(segments[-1]) + 1 if segments else 1
+        self._connection = self._open_writer(self._segment_path(self._sequence))
+
+    def _segment_path(self, sequence: int) -> str:
+        return os.path.join(self.directory, f"journal-{sequence:06d}.db")
+
+    @staticmethod
+    def _segment_number(path: str) -> int:
+        return int(os.path.basename(path)[len("journal-"):-len(".db")])
+
+    def segments(self) -> List[str]:
+        """Segment files, oldest first"""
+        return sorted(glob.glob(os.path.join(self.directory, "journal-*.db")))
+
+    def _open_writer(self, path: str) -> sqlite3.Connection:
+        connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=FULL")
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _open_reader(self, path: str) -> sqlite3.Connection:
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        connection.execute(f"PRAGMA mmap_size={self.mmap_bytes}")
+        return connection
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop the writer, flushing whatever is still queued"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+        with self._write_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def record_actions(self, rows: List[ActionRow]):
+        """Queue enriched actions; never touches the disk"""
+        if not self.record_keys:
+            rows = [(ts, action_type, window, process,
+                     {k: v for k, v in extra.items() if k != "key"} or None
+                     if extra is not None and "key" in extra else extra)
+                    for ts, action_type, window, process, extra in rows]
+        self._actions.extend(rows)
+
+    def record_snapshot(self, window_title: str, text: str,
+                        rect: Optional[Tuple[int, int, int, int]] = None,
+                        timestamp: Optional[float] = None):
+        """Queue an OCR result for a window"""
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+        self._snapshots.append((timestamp or time.time(), window_title,
+                                json.dumps(rect) if rect is not None else None, text, digest))
+
+    def _run(self):
+        if self._previous is not None:
+            # The last run's active segment was never rotated, so compact it now
+            try:
+                self.compact(self._previous)
+                self._enforce_retention()
+            except Exception as e:
+                print(f"Error compacting journal segment {self._previous}: {e}")
+            self._previous = None
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error writing journal: {e}")
+
+    @staticmethod
+    def _drain(queue: deque) -> list:
+        rows = []
+        while queue:
+            rows.append(queue.popleft())
+        return rows
+
+    def flush(self) -> int:
+        """Write all queued rows in one transaction; returns the row count"""
+        with self._write_lock:
+            if self._connection is None:
+                return 0
+            actions = self._drain(self._actions)
+            snapshots = self._drain(self._snapshots)
+            if not actions and not snapshots:
+                return 0
+            connection = self._connection
+            connection.execute("BEGIN")
+            try:
+                connection.executemany(
+                    "INSERT INTO actions VALUES (?, ?, ?, ?, ?)",
+                    [(ts, action_type, window, process,
+                      json.dumps(extra) if extra is not None else None)
+                     for ts, action_type, window, process, extra in actions])
+                connection.executemany("INSERT INTO snapshots VALUES (?, ?, ?, ?, ?)", snapshots)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            self.written += len(actions) + len(snapshots)
+            if self._segment_size(self._segment_path(self._sequence)) > self.segment_bytes:
+                self._rotate()
+            return len(actions) + len(snapshots)
+
+    @staticmethod
+    def _segment_size(path: str) -> int:
+        return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+    def _rotate(self):
+        """Start a new segment, compact the old one and enforce max_bytes"""
+        old_path = self._segment_path(self._sequence)
+        self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._connection.close()
+        self._sequence += 1
+        self._connection = self._open_writer(self._segment_path(self._sequence))
+        self.compact(old_path)
+        self._enforce_retention()
+
+    def compact(self, path: str):
+        """Drop consecutive duplicate snapshots per window and VACUUM a closed segment"""
+        with closing(sqlite3.connect(path, isolation_level=None)) as connection:
+            if connection.execute("PRAGMA user_version").fetchone()[0] >= COMPACTED_VERSION:
+                return
+            connection.execute("""
+                DELETE FROM snapshots WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, digest,
+                               LAG(digest) OVER (PARTITION BY window ORDER BY ts) AS previous
+                        FROM snapshots)
+                    WHERE digest = previous)""")
+            connection.execute("PRAGMA journal_mode=DELETE")
+            connection.execute("VACUUM")
+            connection.execute(f"PRAGMA user_version={COMPACTED_VERSION}")
+
+    def _enforce_retention(self):
+        segments = self.segments()
+        sizes = [self._segment_size(path) for path in segments]
+        total = sum(sizes)
+        # Never delete the active segment
+        for path, size in zip(segments[:-1], sizes):
+            if total <= self.max_bytes:
+                break
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            total -= size
+
+    def size_bytes(self) -> int:
+        return sum(self._segment_size(path) for path in self.segments())
+
+    def _query_segments(self, sql: str, params: tuple, limit: Optional[int] = None,
+                        newest_first: bool = True) -> Iterator[tuple]:
+        """Run sql on each segment in turn, stopping once limit rows were yielded"""
+        segments = self.segments()
+        if newest_first:
+            segments.reverse()
+        produced = 0
+        for path in segments:
+            try:
+                with closing(self._open_reader(path)) as connection:
+                    for row in connection.execute(sql, params):
+                        yield row
+                        produced += 1
+                        if limit is not None and produced >= limit:
+                            return
+            except sqlite3.Error as e:
+                # A segment may be removed by retention while it is being read
+                print(f"Error reading journal segment {path}: {e}")
+
+    @staticmethod
+    def _action(row) -> UserAction:
+        ts, action_type, window, process, extra = row
+        return UserAction(
+            timestamp=datetime.fromtimestamp(ts),
+            action_type=action_type,
+            window_title=window,
+            process_name=process,
+            extra_data=json.loads(extra) if extra is not None else None
+        )
+
+    def actions_before(self, before: float, limit: int) -> List[UserAction]:
+        """The newest limit actions strictly older than `before`, oldest first"""
+        rows = list(self._query_segments(
+            "SELECT ts, type, window, process, extra FROM actions WHERE ts < ? "
+            "ORDER BY ts DESC LIMIT ?", (before, limit), limit=limit))
+        return [self._action(row) for row in reversed(rows)]
+
+    def actions_between(self, start: datetime, end: datetime) -> List[UserAction]:
+        """Actions with start <= timestamp <= end, oldest first"""
+        return list(self.replay(start, end))
+
+    def replay(self, start: Optional[datetime] = None,
+               end: Optional[datetime] = None) -> Iterator[UserAction]:
+        """Stream actions in time order, segment by segment"""
+        start_ts = start.timestamp() if start is not None else float("-inf")
+        end_ts = end.timestamp() if end is not None else float("inf")
+        rows = self._query_segments(
+            "SELECT ts, type, window, process, extra FROM actions WHERE ts >= ? AND ts <= ? "
+            "ORDER BY ts", (start_ts, end_ts), newest_first=False)
+        for row in rows:
+            yield self._action(row)
+
+    def recent_snapshots(self, limit: int = 5,
+                         window_title: Optional[str] = None) -> List[Snapshot]:
+        """Newest OCR snapshots, optionally for one window, oldest first"""
+        if window_title is None:
+            sql, params = "SELECT ts, window, rect, text FROM snapshots ORDER BY ts DESC LIMIT ?", (limit,)
+        else:
+            sql = "SELECT ts, window, rect, text FROM snapshots WHERE window = ? ORDER BY ts DESC LIMIT ?"
+            params = (window_title, limit)
+        rows = list(self._query_segments(sql, params, limit=limit))
+        return [Snapshot(datetime.fromtimestamp(ts), window,
+                         tuple(json.loads(rect)) if rect else None, text)
+                for ts, window, rect, text in reversed(rows)]
@@ -0,0 +1,312 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from action_history import UserAction
+from perf import perf
+
+SYSTEM_PROMPT = ("You are a desktop assistant. Answer the user's question using the text "
+                 "read from their screen and their recent actions. Screen text comes from "
+                 "OCR and may contain recognition errors.")
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+_WORD = re.compile(r"\w+")
+_encoder = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count with tiktoken when installed, else about four characters per token"""
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text))
+    return (len(text) + 3) // 4
+
+
+def normalize_line(line: str) -> str:
+    return " ".join(line.split())
+
+
+@dataclass(slots=True)
+class LLMContext:
+    messages: List[Dict[str, str]]
+    tokens: int
+    key: str  # response cache key: model, screen text, question and action runs
+    dropped_lines: int = 0
+    dropped_actions: int = 0
+
+
+class ContextBuilder:
+    """Turn a window's OCR text and recent actions into a prompt within a token budget
+
+    Lines are whitespace-normalized and deduplicated, lines with hardly any
+    letters or digits are dropped, and the rest are ranked by length and by
+    words shared with the question. The best fitting lines are kept in
+    reading order. Runs of actions in the same window collapse into one
+    line with a count and the newest runs are kept; actions in
+    exclude_windows (the assistant's own window) are left out. The cache
+    key covers the screen text, the question and which runs were kept but
+    not their counts, so a few more clicks in the same window still hit
+    the cache.
+    """
+
+    def __init__(self, token_budget: int = 2000, action_share: float = 0.2,
+                 model: Optional[str] = None, system_prompt: str = SYSTEM_PROMPT,
+                 exclude_windows: Sequence[str] = ()):
+        self.token_budget = token_budget
+        self.action_share = action_share
+        self.model = model or os.environ.get("SCREEN_ASSISTANT_LLM_MODEL", DEFAULT_MODEL)
+        self.system_prompt = system_prompt
+        self.exclude_windows = set(exclude_windows)
+
+    def _rank_lines(self, text: str, question: str) -> List[Tuple[float, int, str]]:
+        question_words = {word.lower() for word in _WORD.findall(question) if len(word) > 2}
+        seen = set()
+        ranked = []
+        for position, line in enumerate(text.splitlines()):
+            line = normalize_line(line)
+            folded = line.lower()
+            if folded in seen:
+                continue
+            seen.add(folded)
+            words = _WORD.findall(folded)
+            letters = sum(len(word) for word in words)
+            if letters < 2 or letters < len(line) / 3:
+                continue  # OCR noise: mostly punctuation or stray glyphs
+            score = min(len(words), 12) + 5 * len(question_words.intersection(words))
+            ranked.append((score, position, line))
+        return ranked
+
+    def _collapse_actions(self, actions: Sequence[UserAction]) -> List[List]:
+        """[type, window, count] per run of same-type actions in one window, oldest first"""
+        runs: List[List] = []
+        for action in actions:
+            if action.window_title in self.exclude_windows:
+                continue
+            if runs and runs[-1][0] == action.action_type and runs[-1][1] == action.window_title:
+                runs[-1][2] += 1
+            else:
+                runs.append([action.action_type, action.window_title, 1])
+        return runs
+
+    @staticmethod
+    def _run_line(action_type: str, window: str, count: int) -> str:
+        return f"{action_type}{f' x{count}' if count > 1 else ''} in {window or 'unknown window'}"
+
+    def build(self, question: str, window_title: str, text: str,
+              actions: Sequence[UserAction] = ()) -> LLMContext:
+        question = normalize_line(question)
+        header = f"Active window: {normalize_line(window_title)}"
+        footer = f"Question: {question}"
+        used = (estimate_tokens(self.system_prompt) + estimate_tokens(header) +
+                estimate_tokens(footer) + 16)  # section titles and message overhead
+        remaining = max(0, self.token_budget - used)
+
+        # Newest action runs first, within their share of the budget
+        runs = self._collapse_actions(actions)
+        action_budget = int(remaining * self.action_share)
+        kept_runs: List[List] = []
+        kept_actions: List[str] = []
+        for run in reversed(runs):
+            line = self._run_line(*run)
+            cost = estimate_tokens(line) + 1
+            if cost > action_budget:
+                break
+            action_budget -= cost
+            kept_runs.append(run)
+            kept_actions.append(line)
+        kept_runs.reverse()
+        kept_actions.reverse()
+        remaining -= sum(estimate_tokens(line) + 1 for line in kept_actions)
+
+        # Best lines first until the budget is spent, then back in reading order
+        ranked = self._rank_lines(text, question)
+        kept_lines = []
+        for score, position, line in sorted(ranked, key=lambda item: (-item[0], item[1])):
+            cost = estimate_tokens(line) + 1
+            if cost <= remaining:
+                remaining -= cost
+                kept_lines.append((position, line))
+        kept_lines.sort()
+
+        parts = [header, "", "Screen text:"]
+        parts += [line for _, line in kept_lines] or ["(none)"]
+        if kept_actions:
+            parts += ["", "Recent actions, oldest first:"] + [f"- {line}" for line in kept_actions]
+        parts += ["", footer]
+        messages = [{"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": "\n".join(parts)}]
+        # Screen text and question hashed apart from the actions, which count only by run
+        key_parts = [self.model, self.system_prompt, header, [line for _, line in kept_lines],
+                     question, [run[:2] for run in kept_runs]]
+        key = hashlib.blake2b(json.dumps(key_parts).encode("utf-8"), digest_size=16).hexdigest()
+        tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        return LLMContext(messages, tokens, key,
+                          dropped_lines=len(ranked) - len(kept_lines),
+                          dropped_actions=len(runs) - len(kept_runs))
+
+
+# on_token(text), on_done(full_text, cached), on_error(message)
+TokenCallback = Callable[[str], None]
+DoneCallback = Callable[[str, bool], None]
+ErrorCallback = Callable[[str], None]
+
+
+@dataclass
+class _Subscriber:
+    on_token: TokenCallback
+    on_done: DoneCallback
+    on_error: Optional[ErrorCallback]
+
+
+@dataclass
+class _InFlight:
+    chunks: List[str] = field(default_factory=list)
+    subscribers: List[_Subscriber] = field(default_factory=list)
+
+
+class LLMService:
+    """Stream chat completions, caching answers and sharing identical requests
+
+    Answers are cached in an LRU keyed by LLMContext.key for ttl seconds. A
+    request whose key is already streaming joins it instead of calling the
+    API again: it gets the chunks received so far, then the rest. Callbacks
+    run on the streaming thread (or the caller's, for cache hits).
+
+    The OpenAI client honours base_url (or SCREEN_ASSISTANT_LLM_URL), so a
+    local server such as llm_stub_server.py can stand in for the API.
+    """
+
+    def __init__(self, model: Optional[str] = None, base_url: Optional[str] = None,
+                 api_key: Optional[str] = None, cache_entries: int = 128,
+                 cache_ttl: float = 600.0,
+                 stream: Optional[Callable[[List[Dict[str, str]]], Iterator[str]]] = None):
+        self.model = model or os.environ.get("SCREEN_ASSISTANT_LLM_MODEL", DEFAULT_MODEL)
+        self.base_url = base_url or os.environ.get("SCREEN_ASSISTANT_LLM_URL")
+        self.api_key = api_key
+        self.cache_entries = cache_entries
+        self.cache_ttl = cache_ttl
+        self._stream = stream or self._openai_stream
+        self._client = None
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def load_env_file(path: Optional[str] = None) -> bool:
+        """Load API keys from env-file.txt next to src/ with python-dotenv, if installed"""
+        path = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "env-file.txt")
+        try:
+            from dotenv import load_dotenv
+        except ImportError:
+            return False
+        return load_dotenv(path)
+
+    def configured(self) -> bool:
+        """Whether there is an endpoint to talk to"""
+        return bool(self.base_url or self.api_key or os.environ.get("OPENAI_API_KEY"))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                    "cached": len(self._cache), "in_flight": len(self._in_flight)}
+
+    def _openai_stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        if self._client is None:
+            from openai import OpenAI
+            # A stub server accepts any key
+            api_key = self.api_key or os.environ.get("OPENAI_API_KEY") or "unused"
+            self._client = OpenAI(base_url=self.base_url, api_key=api_key)
+        response = self._client.chat.completions.create(model=self.model, messages=messages,
+                                                        stream=True)
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _cached(self, key: str) -> Optional[str]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        stored, answer = entry
+        if time.monotonic() - stored > self.cache_ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return answer
+
+    def ask(self, context: LLMContext, on_token: TokenCallback, on_done: DoneCallback,
+            on_error: Optional[ErrorCallback] = None):
+        """Answer context, from the cache, by joining an identical request or by streaming"""
+        subscriber = _Subscriber(on_token, on_done, on_error)
+        with self._lock:
+            answer = self._cached(context.key)
+            if answer is None:
+                request = self._in_flight.get(context.key)
+                if request is not None:
+                    self.coalesced += 1
+                    perf.count("llm.coalesced")
+                    # Replay under the lock so no chunk is missed or repeated
+                    for chunk in request.chunks:
+                        on_token(chunk)
+                    request.subscribers.append(subscriber)
+                    return
+                self.misses += 1
+                perf.count("llm.cache_misses")
+                request = _InFlight(subscribers=[subscriber])
+                self._in_flight[context.key] = request
+            else:
+                self.hits += 1
+                perf.count("llm.cache_hits")
+        if answer is not None:
+            on_token(answer)
+            on_done(answer, True)
+            return
+        threading.Thread(target=self._run, args=(context, request), name="llm-stream",
+                         daemon=True).start()
+
+    def _run(self, context: LLMContext, request: _InFlight):
+        started = time.perf_counter()
+        first_token = None
+        try:
+            for chunk in self._stream(context.messages):
+                if first_token is None:
+                    first_token = (time.perf_counter() - started) * 1000
+                    perf.record("llm.first_token", first_token)
+                with self._lock:
+                    request.chunks.append(chunk)
+                    subscribers = list(request.subscribers)
+                for subscriber in subscribers:
+                    subscriber.on_token(chunk)
+        except Exception as e:
+            with self._lock:
+                del self._in_flight[context.key]
+            print(f"Error streaming LLM response: {e}")
+            for subscriber in request.subscribers:
+                if subscriber.on_error is not None:
+                    subscriber.on_error(str(e))
+            return
+        answer = "".join(request.chunks)
+        with self._lock:
+            del self._in_flight[context.key]
+            self._cache[context.key] = (time.monotonic(), answer)
+            self._cache.move_to_end(context.key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        perf.record("llm.total", (time.perf_counter() - started) * 1000)
+        for subscriber in request.subscribers:
+            subscriber.on_done(answer, False)
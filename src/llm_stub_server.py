@@ -0,0 +1,117 @@
+"""Local stand-in for the OpenAI chat completions API
+
+Answers every /v1/chat/completions request with a canned reply that quotes
+the question, streamed word by word as server-sent events when asked to.
+GET /stats returns how many completions were served, to check caching and
+request coalescing.
+
+    python src/llm_stub_server.py --port 8765 --delay 0.05
+    SCREEN_ASSISTANT_LLM_URL=http://127.0.0.1:8765/v1 python src/main.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: "StubServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self._send_json(200, {"completions": self.server.completions})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        with self.server.lock:
+            self.server.completions += 1
+        words = self.server.reply_words(request.get("messages", []))
+        model = request.get("model", "stub")
+        created = int(time.time())
+        if not request.get("stream"):
+            self._send_json(200, {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": created,
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(words)}}],
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        deltas = [{"role": "assistant", "content": ""}] + [{"content": word} for word in words]
+        for delta in deltas + [{}]:
+            chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk",
+                     "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta,
+                                  "finish_reason": None if delta else "stop"}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.server.delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, delay: float = 0.02):
+        super().__init__(address, StubHandler)
+        self.delay = delay
+        self.completions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def reply_words(messages: List[dict]) -> List[str]:
+        content = messages[-1].get("content", "") if messages else ""
+        question = next((line[len("Question: "):] for line in reversed(content.splitlines())
+                         if line.startswith("Question: ")), content[:80])
+        reply = f"Stub answer to \"{question}\" from {len(content)} characters of context."
+        words = reply.split(" ")
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+
+def serve_in_thread(port: int = 0, delay: float = 0.02) -> StubServer:
+    """Start a stub server on a daemon thread; port 0 picks a free port"""
+    server = StubServer(("127.0.0.1", port), delay)
+    threading.Thread(target=server.serve_forever, name="llm-stub", daemon=True).start()
+    return server
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.02, help="Seconds between streamed words")
+    args = parser.parse_args(argv)
+    server = StubServer(("127.0.0.1", args.port), args.delay)
+    print(f"Stub LLM server on http://127.0.0.1:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from capture import BBox, CaptureBackend
+from region_store import RegionArray, text_lines
+
+# One ContextManager per worker process, created by init_worker
+_worker_context = None
+
+
+@dataclass(slots=True)
+class AnalysisTarget:
+    label: str  # window title or monitor name
+    bbox: BBox  # (left, top, right, bottom) in screen coordinates
+
+
+def init_worker(roi_ocr: bool = True, engine_factory: Optional[Callable] = None):
+    """Build the worker's pipeline once; no listeners, window hooks or Qt"""
+    global _worker_context
+    from context_manager import ContextManager
+    from ocr_engine import create_engine
+    from platform_backend import FakeBackend
+    # Parallelism comes from the processes, so each engine gets one thread
+    engine = engine_factory() if engine_factory is not None else create_engine(workers=1)
+    _worker_context = ContextManager(ocr_engine=engine, backend=FakeBackend(),
+                                     roi_ocr=roi_ocr, start_tracking=False)
+
+
+def worker_context():
+    """The calling worker process's ContextManager"""
+    return _worker_context
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _analyze_crop(memory_name: str, shape: Tuple[int, ...], crop: BBox,
+                  submitted: float) -> Dict:
+    """Run process_screenshot on one crop of a frame held in shared memory"""
+    started = time.perf_counter()
+    memory = shared_memory.SharedMemory(name=memory_name)
+    try:
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=memory.buf)
+        left, top, right, bottom = crop
+        regions = _worker_context.process_screenshot(frame[top:bottom, left:right])
+        del frame
+    finally:
+        memory.close()
+    finished = time.perf_counter()
+    return {
+        "regions": regions,
+        "pid": os.getpid(),
+        "timings": {
+            # perf_counter is system-wide on the platforms we run on
+            "queue": (started - submitted) * 1000,
+            "process": (finished - started) * 1000,
+        },
+    }
+
+
+def union_bbox(boxes: Sequence[BBox]) -> BBox:
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+class MultiAnalyzer:
+    """Analyze several windows or monitors at once on a process pool
+
+    All targets are captured in one grab of their union, copied once into
+    shared memory and handed to the workers as crop rectangles, so frames
+    are never pickled. Each worker process keeps its own ContextManager
+    (preprocessing buffers, OCR engine and cache) between calls. The pool
+    is sized to the cores and uses spawn so Qt and hook threads in the GUI
+    process are never forked.
+
+    engine_factory, if given, must be a picklable module-level function
+    returning the OCR engine each worker should use.
+    """
+
+    def __init__(self, capture: CaptureBackend, workers: Optional[int] = None,
+                 roi_ocr: bool = True, engine_factory: Optional[Callable] = None):
+        self.capture = capture
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                        mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=init_worker,
+                                        initargs=(roi_ocr, engine_factory))
+
+    def warm_up(self):
+        """Start every worker process now instead of on the first analysis"""
+        for future in [self.pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def analyze(self, targets: Sequence[AnalysisTarget], capture_lock=None,
+                on_target_done: Optional[Callable[[str, float], None]] = None,
+                cancelled: Optional[Callable[[], bool]] = None) -> Optional[Dict]:
+        """Capture and analyze targets; returns the merged context, or None if cancelled
+
+        Regions are merged into one RegionArray in screen coordinates, with
+        `sources` giving the target index of every region.
+        """
+        started = time.perf_counter()
+        union = union_bbox([target.bbox for target in targets])
+
+        # One grab for every target, copied once into shared memory
+        if capture_lock is not None:
+            capture_lock.acquire()
+        try:
+            frame = self.capture.grab(bbox=union)
+            if frame is None:
+                raise RuntimeError("Capture returned no frame")
+            memory = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+            shared = np.ndarray(frame.shape, dtype=np.uint8, buffer=memory.buf)
+            shared[:] = frame
+            shape = frame.shape
+        finally:
+            if capture_lock is not None:
+                capture_lock.release()
+        grab_ms = (time.perf_counter() - started) * 1000
+
+        try:
+            height, width = shape[:2]
+            futures = {}
+            for index, target in enumerate(targets):
+                left, top, right, bottom = target.bbox
+                crop = (max(0, left - union[0]), max(0, top - union[1]),
+                        min(width, right - union[0]), min(height, bottom - union[1]))
+                future = self.pool.submit(_analyze_crop, memory.name, shape, crop,
+                                          time.perf_counter())
+                futures[future] = (index, crop)
+
+            results: List[Optional[Dict]] = [None] * len(targets)
+            for future in as_completed(futures):
+                if cancelled is not None and cancelled():
+                    for pending in futures:
+                        pending.cancel()
+                    return None
+                index, crop = futures[future]
+                result = future.result()
+                result["crop"] = crop
+                results[index] = result
+                if on_target_done is not None:
+                    on_target_done(targets[index].label, result["timings"]["process"])
+        finally:
+            del shared
+            memory.close()
+            memory.unlink()
+
+        return self._merge(targets, results, union, grab_ms, started)
+
+    @staticmethod
+    def _merge(targets: Sequence[AnalysisTarget], results: List[Dict], union: BBox,
+               grab_ms: float, started: float) -> Dict:
+        parts, sources, windows = [], [], []
+        for index, (target, result) in enumerate(zip(targets, results)):
+            # Crop coordinates back to screen coordinates
+            regions = result["regions"].offset(union[0] + result["crop"][0],
+                                               union[1] + result["crop"][1])
+            parts.append(regions)
+            sources.append(np.full(len(regions), index, dtype=np.int32))
+            windows.append({
+                "label": target.label,
+                "bbox": target.bbox,
+                "regions": len(regions),
+                "text": "\n".join(text_lines(result["regions"])),
+                "pid": result["pid"],
+                "timings": result["timings"],
+            })
+        wall_ms = (time.perf_counter() - started) * 1000
+        busy_ms = sum(window["timings"]["process"] for window in windows)
+        return {
+            "windows": windows,
+            "regions": RegionArray.concatenate(parts),
+            "sources": np.concatenate(sources) if sources else np.empty(0, dtype=np.int32),
+            "timings": {"grab": grab_ms, "total": wall_ms},
+            # Sum of per-window processing time over wall time; approaches
+            # the worker count when the pool scales linearly
+            "parallelism": busy_ms / wall_ms if wall_ms else 0.0,
+        }
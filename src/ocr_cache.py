@@ -0,0 +1,127 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Rough per-object overhead used when sizing cached Region lists
+REGION_OVERHEAD_BYTES = 200
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate the memory held by a cached OCR result"""
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    if hasattr(value, "nbytes"):
+        return REGION_OVERHEAD_BYTES + value.nbytes
+    if isinstance(value, (list, tuple)):
+        size = sys.getsizeof(value)
+        for item in value:
+            content = getattr(item, "content", None)
+            size += REGION_OVERHEAD_BYTES + (len(content) if content else 0)
+        return size
+    return sys.getsizeof(value)
+
+
+def split_text_bands(binary: np.ndarray, band_height: int = 128) -> List[Tuple[int, int]]:
+    """Split a binarized image into horizontal (top, bottom) bands for OCR
+
+    Bands are cut on uniform rows where possible so text lines are not split
+    between two bands. Bands that contain no ink at all are dropped.
+    """
+    height = binary.shape[0]
+    if height == 0:
+        return []
+    uniform = binary.min(axis=1) == binary.max(axis=1)
+    if uniform.ndim > 1:
+        uniform = uniform.all(axis=1)
+    cut_rows = np.flatnonzero(uniform)
+
+    bands = []
+    top = 0
+    while top < height:
+        target = top + band_height
+        if target >= height:
+            bottom = height
+        else:
+            # Prefer the first blank row at or after the target height,
+            # falling back to a hard cut if the block is too tall
+            index = np.searchsorted(cut_rows, target)
+            if index < len(cut_rows) and cut_rows[index] < top + 2 * band_height:
+                bottom = int(cut_rows[index]) + 1
+            else:
+                bottom = min(top + 2 * band_height, height)
+        if not uniform[top:bottom].all():
+            bands.append((top, bottom))
+        top = bottom
+    return bands
+
+
+class OCRCache:
+    """Content-addressed LRU cache for OCR results with a byte budget"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[bytes, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(image: np.ndarray, config: str = "") -> bytes:
+        """Hash the pixels, shape and OCR config of an image"""
+        image = np.ascontiguousarray(image)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{image.shape}|{image.dtype}|{config}".encode())
+        digest.update(image.data)
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[Any]:
+        """Return a cached result and mark it recently used, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: bytes, value: Any):
+        """Store a result, evicting least recently used entries to fit the budget"""
+        size = estimate_size(value) + len(key)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and memory usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
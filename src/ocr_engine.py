@@ -0,0 +1,225 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Default Windows install location; elsewhere tesseract is expected on PATH
+TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+# Keys produced by image_to_data, matching pytesseract.Output.DICT
+DATA_KEYS = ("left", "top", "width", "height", "conf", "text")
+
+
+class OCREngine:
+    """Interface for OCR backends working on in-memory grayscale/binary images"""
+
+    name = "base"
+
+    def image_to_data(self, image: np.ndarray, psm: int = 11) -> Dict[str, list]:
+        """Word boxes as a dict of parallel lists (see DATA_KEYS)"""
+        return self.batch_image_to_data([image], psm)[0]
+
+    def image_to_string(self, image: np.ndarray, psm: int = 6) -> str:
+        """Plain text of the image"""
+        return self.batch_image_to_string([image], psm)[0]
+
+    def batch_image_to_data(self, images: List[np.ndarray], psm: int = 11) -> List[Dict[str, list]]:
+        """Run image_to_data on many crops, returning results in input order"""
+        raise NotImplementedError
+
+    def batch_image_to_string(self, images: List[np.ndarray], psm: int = 6) -> List[str]:
+        """Run image_to_string on many crops, returning results in input order"""
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Load models ahead of the first real request"""
+
+    def close(self):
+        """Release worker resources"""
+
+
+class PytesseractEngine(OCREngine):
+    """Fallback backend that runs the tesseract executable once per image"""
+
+    name = "pytesseract"
+
+    def __init__(self, workers: Optional[int] = None, oem: int = 3):
+        import pytesseract
+        self._pytesseract = pytesseract
+        if os.path.exists(TESSERACT_CMD):
+            pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+        self.oem = oem
+        # Each call is its own subprocess, so threads are enough to overlap them
+        self._executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                            thread_name_prefix="pytesseract")
+
+    def _config(self, psm: int) -> str:
+        return f'--oem {self.oem} --psm {psm}'
+
+    def warm_up(self):
+        # Runs the executable once, failing early if it is missing
+        print("Tesseract Version:", self._pytesseract.get_tesseract_version())
+        print("Tesseract Path:", self._pytesseract.pytesseract.tesseract_cmd)
+
+    def _data(self, image, psm):
+        data = self._pytesseract.image_to_data(image, output_type=self._pytesseract.Output.DICT,
+                                               config=self._config(psm))
+        return {key: data[key] for key in DATA_KEYS}
+
+    def _string(self, image, psm):
+        return self._pytesseract.image_to_string(image, config=self._config(psm))
+
+    def batch_image_to_data(self, images, psm=11):
+        return list(self._executor.map(lambda image: self._data(image, psm), images))
+
+    def batch_image_to_string(self, images, psm=6):
+        return list(self._executor.map(lambda image: self._string(image, psm), images))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class TesserocrEngine(OCREngine):
+    """Pool of long-lived libtesseract workers with models loaded once per worker
+
+    Images are handed to the workers as raw pixel buffers, so no temp files or
+    subprocesses are involved. tesserocr releases the GIL while recognizing,
+    which lets the threads run on separate cores.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, workers: Optional[int] = None, lang: str = "eng", oem: int = 3):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self.lang = lang
+        self.oem = oem
+        self.workers = workers or os.cpu_count() or 1
+        self._jobs: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._ready = [threading.Event() for _ in range(self.workers)]
+        self._errors: List[Exception] = []
+        self._threads = [
+            threading.Thread(target=self._worker, args=(ready,), name=f"tesserocr-{i}", daemon=True)
+            for i, ready in enumerate(self._ready)
+        ]
+        for thread in self._threads:
+            thread.start()
+        # Wait for the models to load so a broken install (missing tessdata,
+        # bad lang) raises here and create_engine can fall back
+        self.warm_up()
+        if len(self._errors) == self.workers:
+            raise self._errors[0]
+
+    def _worker(self, ready: threading.Event):
+        api = None
+        try:
+            api = self._tesserocr.PyTessBaseAPI(lang=self.lang, oem=self._tesserocr.OEM(self.oem))
+        except Exception as e:
+            # This worker takes no jobs; the others (if any) serve the queue
+            self._errors.append(e)
+            print(f"Error starting OCR worker: {e}")
+            return
+        finally:
+            ready.set()
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                future, function, image, psm = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    self._set_image(api, image, psm)
+                    future.set_result(function(api))
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            if api is not None:
+                api.End()
+
+    def _set_image(self, api, image, psm):
+        image = np.ascontiguousarray(image)
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        api.SetPageSegMode(psm)
+        api.SetImageBytes(image.tobytes(), width, height, channels, width * channels)
+
+    def _data(self, api) -> Dict[str, list]:
+        tesserocr = self._tesserocr
+        level = tesserocr.RIL.WORD
+        data = {key: [] for key in DATA_KEYS}
+        api.Recognize()
+        iterator = api.GetIterator()
+        if iterator is None:
+            return data
+        for word in tesserocr.iterate_level(iterator, level):
+            text = word.GetUTF8Text(level)
+            box = word.BoundingBox(level)
+            if text is None or box is None:
+                continue
+            x1, y1, x2, y2 = box
+            data["left"].append(x1)
+            data["top"].append(y1)
+            data["width"].append(x2 - x1)
+            data["height"].append(y2 - y1)
+            data["conf"].append(word.Confidence(level))
+            data["text"].append(text)
+        return data
+
+    def _string(self, api) -> str:
+        return api.GetUTF8Text()
+
+    def _submit(self, function, image, psm) -> Future:
+        future = Future()
+        self._jobs.put((future, function, image, psm))
+        return future
+
+    def batch_image_to_data(self, images, psm=11):
+        futures = [self._submit(self._data, image, psm) for image in images]
+        return [future.result() for future in futures]
+
+    def batch_image_to_string(self, images, psm=6):
+        futures = [self._submit(self._string, image, psm) for image in images]
+        return [future.result() for future in futures]
+
+    def warm_up(self):
+        # Returns once every worker has created its API and loaded the models
+        for ready in self._ready:
+            ready.wait()
+
+    def close(self):
+        for _ in self._threads:
+            self._jobs.put(None)
+
+
+_engine: Optional[OCREngine] = None
+_engine_lock = threading.Lock()
+
+
+def create_engine(backend: Optional[str] = None, workers: Optional[int] = None) -> OCREngine:
+    """Create an OCR engine, preferring the persistent tesserocr pool
+
+    backend may be "tesserocr" or "pytesseract"; by default it comes from the
+    SCREEN_ASSISTANT_OCR environment variable, falling back to pytesseract
+    when tesserocr is not installed.
+    """
+    backend = backend or os.environ.get("SCREEN_ASSISTANT_OCR", "tesserocr")
+    if backend == "tesserocr":
+        try:
+            return TesserocrEngine(workers=workers)
+        except Exception as e:
+            print(f"tesserocr unavailable, falling back to pytesseract: {e}")
+    return PytesseractEngine(workers=workers)
+
+
+def get_engine() -> OCREngine:
+    """Shared engine instance, created on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine()
+        return _engine
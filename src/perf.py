@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+
+class RollingHistogram:
+    """Last `size` samples of one metric in a ring buffer, for percentiles"""
+
+    def __init__(self, size: int = 1024):
+        self._samples = array("d", bytes(8 * size))
+        self._next = 0
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float):
+        self._samples[self._next] = value
+        self._next = (self._next + 1) % len(self._samples)
+        self.count += 1
+        self.total += value
+
+    def summary(self) -> Dict[str, float]:
+        window = sorted(self._samples[:min(self.count, len(self._samples))])
+        if not window:
+            return {"count": 0}
+        last = len(window) - 1
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "p50": window[round(last * 0.50)],
+            "p95": window[round(last * 0.95)],
+            "p99": window[round(last * 0.99)],
+            "max": window[-1],
+        }
+
+
+class _NullStage:
+    """Shared context manager returned by stage() while recording is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("recorder", "name", "started")
+
+    def __init__(self, recorder: "PerfRecorder", name: str):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.record(self.name, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+def process_memory_bytes() -> Optional[int]:
+    """Resident set size of this process, or None if it cannot be read"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in KB on Linux; good enough as a fallback
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return None
+
+
+class PerfRecorder:
+    """Stage timings, counters and gauges for the capture/analysis pipeline
+
+    Timings go to rolling histograms (milliseconds) keyed by stage name.
+    While disabled, stage() hands back a shared no-op context manager and
+    record()/count()/gauge() return after one attribute check, so hooks can
+    stay in hot paths. Safe to call from any thread.
+    """
+
+    def __init__(self, enabled: bool = False, histogram_size: int = 1024):
+        self.enabled = enabled
+        self.histogram_size = histogram_size
+        self._histograms: Dict[str, RollingHistogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stream = None
+        self._started = time.time()
+
+    def stage(self, name: str):
+        """Context manager timing the enclosed block as `name`"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name: str, elapsed_ms: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = RollingHistogram(self.histogram_size)
+            histogram.add(elapsed_ms)
+
+    def count(self, name: str, amount: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def gauge(self, name: str, value: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    def snapshot(self) -> Dict:
+        """Percentiles, counters and gauges as plain JSON-friendly dicts"""
+        with self._lock:
+            stages = {name: histogram.summary() for name, histogram in self._histograms.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        memory = process_memory_bytes()
+        if memory is not None:
+            gauges["process_rss_bytes"] = memory
+        return {
+            "time": time.time(),
+            "uptime_s": time.time() - self._started,
+            "stages": stages,
+            "counters": counters,
+            "gauges": gauges,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def open_stream(self, path: str):
+        """Append a snapshot line to a JSONL file on every write_snapshot()"""
+        self.close_stream()
+        self._stream = open(path, "a", encoding="utf-8")
+
+    def close_stream(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def write_snapshot(self) -> Optional[Dict]:
+        """Snapshot and, if a stream is open, append it as one JSON line"""
+        if not self.enabled:
+            return None
+        snapshot = self.snapshot()
+        if self._stream is not None:
+            self._stream.write(json.dumps(snapshot) + "\n")
+            self._stream.flush()
+        return snapshot
+
+
+class StartupTimer:
+    """Wall-clock breakdown of application startup into named phases
+
+    Times are measured from `origin`, normally a perf_counter() value taken
+    before the first heavy import.
+    """
+
+    def __init__(self, origin: Optional[float] = None):
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.marks: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.phases.append((name, elapsed))
+            perf.record(f"startup.{name}", elapsed)
+
+    def mark(self, name: str) -> float:
+        """Record a milestone (e.g. tray visible) in ms since origin"""
+        elapsed = (time.perf_counter() - self.origin) * 1000
+        self.marks.append((name, elapsed))
+        return elapsed
+
+    def report(self) -> str:
+        lines = ["Startup timing:"]
+        lines.extend(f"  {name:<24}{ms:>8.1f} ms" for name, ms in self.phases)
+        lines.extend(f"  @{name:<23}{ms:>8.1f} ms since start" for name, ms in self.marks)
+        return "\n".join(lines)
+
+
+def format_snapshot(snapshot: Dict) -> str:
+    """Fixed-width text table of a snapshot for the stats panel"""
+    lines = [f"{'stage':<28}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"]
+    for name, stats in sorted(snapshot["stages"].items()):
+        if not stats["count"]:
+            continue
+        lines.append(f"{name:<28}{stats['count']:>7}{stats['p50']:>9.2f}{stats['p95']:>9.2f}"
+                     f"{stats['p99']:>9.2f}{stats['max']:>9.2f}")
+    if snapshot["counters"]:
+        lines.append("")
+        lines.extend(f"{name:<28}{value:>7}" for name, value in sorted(snapshot["counters"].items()))
+    if snapshot["gauges"]:
+        lines.append("")
+        for name, value in sorted(snapshot["gauges"].items()):
+            if name.endswith("_bytes"):
+                lines.append(f"{name:<28}{value / (1024 * 1024):>9.1f} MB")
+            else:
+                lines.append(f"{name:<28}{value:>9g}")
+    return "\n".join(lines)
+
+
+# Process-wide recorder; SCREEN_ASSISTANT_PERF=1 turns it on at startup and
+# SCREEN_ASSISTANT_PERF_LOG=<path> streams snapshots to a JSONL file
+perf = PerfRecorder(enabled=os.environ.get("SCREEN_ASSISTANT_PERF", "") not in ("", "0"))
+if os.environ.get("SCREEN_ASSISTANT_PERF_LOG"):
+    perf.enabled = True
+    perf.open_stream(os.environ["SCREEN_ASSISTANT_PERF_LOG"])
+
@@ -0,0 +1,312 @@
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Window events delivered to subscribe() callbacks as (event, hwnd)
+WINDOW_EVENTS = ("foreground", "created", "destroyed", "shown", "hidden", "renamed", "moved")
+
+WindowEventCallback = Callable[[str, int], None]
+
+
+class PlatformBackend:
+    """Window and process queries, kept behind one interface so they can be faked"""
+
+    def foreground_window(self) -> int:
+        raise NotImplementedError
+
+    def window_title(self, hwnd: int) -> str:
+        raise NotImplementedError
+
+    def window_pid(self, hwnd: int) -> int:
+        raise NotImplementedError
+
+    def process_name(self, pid: int) -> str:
+        raise NotImplementedError
+
+    def process_create_time(self, pid: int) -> float:
+        """When the process was started; tells a reused pid from the process that had it"""
+        raise NotImplementedError
+
+    def client_area(self, hwnd: int) -> Tuple[int, int, int, int]:
+        """Client area of a window as screen coordinates (left, top, right, bottom)"""
+        raise NotImplementedError
+
+    def window_rect(self, hwnd: int) -> Tuple[int, int, int, int]:
+        """Outer window rectangle in screen coordinates (left, top, right, bottom)"""
+        raise NotImplementedError
+
+    def is_listed_window(self, hwnd: int) -> bool:
+        """Whether hwnd is a visible top-level window with a title"""
+        raise NotImplementedError
+
+    def list_windows(self) -> List[int]:
+        """Every window for which is_listed_window() holds"""
+        raise NotImplementedError
+
+    def monitor_rects(self) -> List[Tuple[int, int, int, int]]:
+        """Bounds of every monitor in virtual-screen coordinates (left, top, right, bottom)"""
+        raise NotImplementedError
+
+    def subscribe(self, callback: WindowEventCallback) -> bool:
+        """Deliver window events (see WINDOW_EVENTS) to callback
+
+        Returns False if the backend cannot report events, in which case
+        callers have to poll.
+        """
+        return False
+
+    def unsubscribe(self):
+        pass
+
+
+# WinEvent constants (winuser.h)
+WINEVENT_OUTOFCONTEXT = 0x0000
+OBJID_WINDOW = 0
+CHILDID_SELF = 0
+_WIN_EVENT_NAMES = {
+    0x0003: "foreground",  # EVENT_SYSTEM_FOREGROUND
+    0x8000: "created",  # EVENT_OBJECT_CREATE
+    0x8001: "destroyed",  # EVENT_OBJECT_DESTROY
+    0x8002: "shown",  # EVENT_OBJECT_SHOW
+    0x8003: "hidden",  # EVENT_OBJECT_HIDE
+    0x800B: "moved",  # EVENT_OBJECT_LOCATIONCHANGE
+    0x800C: "renamed",  # EVENT_OBJECT_NAMECHANGE
+}
+_WIN_EVENT_RANGES = ((0x0003, 0x0003), (0x8000, 0x8003), (0x800B, 0x800C))
+
+
+class Win32Backend(PlatformBackend):
+    """Backend using pywin32 and psutil"""
+
+    def __init__(self):
+        import psutil
+        import win32gui
+        import win32process
+        self._psutil = psutil
+        self._win32gui = win32gui
+        self._win32process = win32process
+
+    def foreground_window(self) -> int:
+        return self._win32gui.GetForegroundWindow()
+
+    def window_title(self, hwnd: int) -> str:
+        return self._win32gui.GetWindowText(hwnd)
+
+    def window_pid(self, hwnd: int) -> int:
+        return self._win32process.GetWindowThreadProcessId(hwnd)[1]
+
+    def process_name(self, pid: int) -> str:
+        return self._psutil.Process(pid).name()
+
+    def process_create_time(self, pid: int) -> float:
+        return self._psutil.Process(pid).create_time()
+
+    def client_area(self, hwnd: int) -> Tuple[int, int, int, int]:
+        # Get window client area (excludes title bar and borders)
+        left, top, right, bottom = self._win32gui.GetClientRect(hwnd)
+
+        # Convert client coordinates to screen coordinates
+        pt_left_top = self._win32gui.ClientToScreen(hwnd, (left, top))
+        pt_right_bottom = self._win32gui.ClientToScreen(hwnd, (right, bottom))
+        return (pt_left_top[0], pt_left_top[1], pt_right_bottom[0], pt_right_bottom[1])
+
+    def window_rect(self, hwnd: int) -> Tuple[int, int, int, int]:
+        return self._win32gui.GetWindowRect(hwnd)
+
+    def is_listed_window(self, hwnd: int) -> bool:
+        win32gui = self._win32gui
+        return (win32gui.IsWindow(hwnd) and win32gui.IsWindowVisible(hwnd) and
+                win32gui.GetParent(hwnd) == 0 and bool(win32gui.GetWindowText(hwnd)))
+
+    def list_windows(self) -> List[int]:
+        windows = []
+
+        def enum_windows_callback(hwnd, _):
+            if self._win32gui.IsWindowVisible(hwnd) and self._win32gui.GetWindowText(hwnd):
+                windows.append(hwnd)
+            return True
+
+        self._win32gui.EnumWindows(enum_windows_callback, None)
+        return windows
+
+    def monitor_rects(self) -> List[Tuple[int, int, int, int]]:
+        import win32api
+        return [tuple(rect) for _, _, rect in win32api.EnumDisplayMonitors()]
+
+    def subscribe(self, callback: WindowEventCallback) -> bool:
+        """Install out-of-context WinEvent hooks
+
+        The hooks deliver events through the message loop of the calling
+        thread, so call this from the Qt GUI thread.
+        """
+        import ctypes
+        from ctypes import wintypes
+
+        self.unsubscribe()
+        user32 = ctypes.windll.user32
+        proc_type = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                       wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.SetWinEventHook.argtypes = [wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE,
+                                           proc_type, wintypes.DWORD, wintypes.DWORD, wintypes.DWORD]
+        user32.UnhookWinEvent.argtypes = [wintypes.HANDLE]
+
+        def on_event(hook, event, hwnd, id_object, id_child, thread, time):
+            # Only whole-window events, not carets, cursors or child objects
+            if not hwnd or id_object != OBJID_WINDOW or id_child != CHILDID_SELF:
+                return
+            name = _WIN_EVENT_NAMES.get(event)
+            if name is not None:
+                try:
+                    callback(name, hwnd)
+                except Exception as e:
+                    print(f"Error handling window event: {e}")
+
+        # Keep the ctypes callback alive for as long as the hooks exist
+        self._event_proc = proc_type(on_event)
+        self._user32 = user32
+        self._hooks = [
+            user32.SetWinEventHook(low, high, None, self._event_proc, 0, 0, WINEVENT_OUTOFCONTEXT)
+            for low, high in _WIN_EVENT_RANGES
+        ]
+        if not all(self._hooks):
+            self.unsubscribe()
+            return False
+        return True
+
+    def unsubscribe(self):
+        for hook in getattr(self, "_hooks", []):
+            if hook:
+                self._user32.UnhookWinEvent(hook)
+        self._hooks = []
+        self._event_proc = None
+
+
+class FakeBackend(PlatformBackend):
+    """In-memory backend for tests and benchmarks on machines without win32
+
+    Counts every query in `calls` so caching behaviour can be checked.
+    """
+
+    def __init__(self):
+        self.windows: Dict[int, Dict] = {}
+        self.processes: Dict[int, str] = {}
+        # pid -> start "time"; bumped when add_window gives a pid to another process
+        self.process_started: Dict[int, float] = {}
+        self.foreground = 0
+        self.calls: Dict[str, int] = {}
+        self.monitors: List[Tuple[int, int, int, int]] = [(0, 0, 1920, 1080)]
+        self._callback: Optional[WindowEventCallback] = None
+
+    def _count(self, name: str):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def add_window(self, hwnd: int, title: str, pid: int, process_name: str,
+                   client_area: Tuple[int, int, int, int] = (0, 0, 800, 600),
+                   rect: Optional[Tuple[int, int, int, int]] = None, visible: bool = True):
+        self.windows[hwnd] = {"title": title, "pid": pid, "client_area": client_area,
+                              "rect": rect or client_area, "visible": visible}
+        if self.processes.get(pid) != process_name:
+            self.process_started[pid] = max(self.process_started.values(), default=0.0) + 1
+        self.processes[pid] = process_name
+        if not self.foreground:
+            self.foreground = hwnd
+        self.emit("created", hwnd)
+
+    def remove_window(self, hwnd: int):
+        self.windows.pop(hwnd, None)
+        if self.foreground == hwnd:
+            self.foreground = 0
+        self.emit("destroyed", hwnd)
+
+    def set_title(self, hwnd: int, title: str):
+        self.windows[hwnd]["title"] = title
+        self.emit("renamed", hwnd)
+
+    def move_window(self, hwnd: int, rect: Tuple[int, int, int, int],
+                    client_area: Optional[Tuple[int, int, int, int]] = None):
+        self.windows[hwnd]["rect"] = rect
+        self.windows[hwnd]["client_area"] = client_area or rect
+        self.emit("moved", hwnd)
+
+    def set_visible(self, hwnd: int, visible: bool):
+        self.windows[hwnd]["visible"] = visible
+        self.emit("shown" if visible else "hidden", hwnd)
+
+    def set_foreground(self, hwnd: int):
+        self.foreground = hwnd
+        self.emit("foreground", hwnd)
+
+    def emit(self, event: str, hwnd: int):
+        """Deliver an event to the subscriber, if any, on the calling thread"""
+        if self._callback is not None:
+            self._callback(event, hwnd)
+
+    def foreground_window(self) -> int:
+        self._count("foreground_window")
+        return self.foreground
+
+    def window_title(self, hwnd: int) -> str:
+        self._count("window_title")
+        window = self.windows.get(hwnd)
+        return window["title"] if window else ""
+
+    def window_pid(self, hwnd: int) -> int:
+        self._count("window_pid")
+        window = self.windows.get(hwnd)
+        return window["pid"] if window else 0
+
+    def process_name(self, pid: int) -> str:
+        self._count("process_name")
+        if pid not in self.processes:
+            raise LookupError(f"no such process: {pid}")
+        return self.processes[pid]
+
+    def process_create_time(self, pid: int) -> float:
+        self._count("process_create_time")
+        if pid not in self.process_started:
+            raise LookupError(f"no such process: {pid}")
+        return self.process_started[pid]
+
+    def client_area(self, hwnd: int) -> Tuple[int, int, int, int]:
+        self._count("client_area")
+        return self.windows[hwnd]["client_area"]
+
+    def window_rect(self, hwnd: int) -> Tuple[int, int, int, int]:
+        self._count("window_rect")
+        return self.windows[hwnd]["rect"]
+
+    def is_listed_window(self, hwnd: int) -> bool:
+        self._count("is_listed_window")
+        window = self.windows.get(hwnd)
+        return bool(window and window["visible"] and window["title"])
+
+    def list_windows(self) -> List[int]:
+        self._count("list_windows")
+        return [hwnd for hwnd, window in self.windows.items()
+                if window["visible"] and window["title"]]
+
+    def monitor_rects(self) -> List[Tuple[int, int, int, int]]:
+        self._count("monitor_rects")
+        return list(self.monitors)
+
+    def subscribe(self, callback: WindowEventCallback) -> bool:
+        self._callback = callback
+        return True
+
+    def unsubscribe(self):
+        self._callback = None
+
+
+_backend: Optional[PlatformBackend] = None
+
+
+def get_backend() -> PlatformBackend:
+    """Shared backend for this platform; a FakeBackend anywhere but Windows"""
+    global _backend
+    if _backend is None:
+        if sys.platform == "win32":
+            _backend = Win32Backend()
+        else:
+            print("Not running on Windows, using fake window backend")
+            _backend = FakeBackend()
+    return _backend
@@ -0,0 +1,102 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class PreprocessedFrame:
+    """Grayscale and binary images shared by the region detectors
+
+    The arrays belong to the Preprocessor that produced them and are
+    overwritten by its next run().
+    """
+    gray: np.ndarray
+    blurred: np.ndarray
+    text_binary: np.ndarray  # Otsu threshold of the blurred image, for OCR
+    ui_binary: np.ndarray  # Fixed inverted threshold, for UI contours
+    otsu_threshold: float
+    pyramid: List[np.ndarray] = field(default_factory=list)  # gray at 1/2, 1/4, ...
+
+    def crop(self, x: int, y: int, width: int, height: int) -> "PreprocessedFrame":
+        """Views of every full-resolution image restricted to a rectangle"""
+        window = (slice(y, y + height), slice(x, x + width))
+        return PreprocessedFrame(
+            gray=self.gray[window],
+            blurred=self.blurred[window],
+            text_binary=self.text_binary[window],
+            ui_binary=self.ui_binary[window],
+            otsu_threshold=self.otsu_threshold,
+        )
+
+
+class Preprocessor:
+    """Convert a captured frame to grayscale once and derive every binary from it
+
+    Output images are written into buffers allocated on the first frame and
+    reused while the frame size stays the same. Not thread-safe: use one
+    Preprocessor per thread.
+    """
+
+    def __init__(self, pyramid_levels: int = 0, ui_threshold: int = 127):
+        self.pyramid_levels = pyramid_levels
+        self.ui_threshold = ui_threshold
+        self._buffers: Dict[str, np.ndarray] = {}
+
+    def _buffer(self, name: str, shape: Tuple[int, ...]) -> np.ndarray:
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=np.uint8)
+            self._buffers[name] = buffer
+        return buffer
+
+    def _to_gray(self, image: np.ndarray) -> np.ndarray:
+        shape = image.shape[:2]
+        if image.ndim == 2:
+            return image
+        if image.shape[2] == 4:
+            # BGRA frames from the capture backends
+            return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY, dst=self._buffer("gray", shape))
+        # Three-channel arrays are RGB, as produced by PIL
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY, dst=self._buffer("gray", shape))
+
+    def gray(self, image) -> np.ndarray:
+        """Grayscale only, into the same buffer run() uses"""
+        return self._to_gray(np.asarray(image))
+
+    def run(self, image, pyramid_levels: int = None) -> PreprocessedFrame:
+        """Preprocess a BGRA frame, RGB array/PIL image or grayscale array"""
+        image = np.asarray(image)
+        gray = self._to_gray(image)
+        shape = gray.shape
+
+        blurred = cv2.medianBlur(gray, 3, dst=self._buffer("blurred", shape))
+        otsu_threshold, text_binary = cv2.threshold(
+            blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU,
+            dst=self._buffer("text_binary", shape))
+        _, ui_binary = cv2.threshold(gray, self.ui_threshold, 255, cv2.THRESH_BINARY_INV,
+                                     dst=self._buffer("ui_binary", shape))
+
+        levels = self.pyramid_levels if pyramid_levels is None else pyramid_levels
+        return PreprocessedFrame(
+            gray=gray,
+            blurred=blurred,
+            text_binary=text_binary,
+            ui_binary=ui_binary,
+            otsu_threshold=otsu_threshold,
+            pyramid=self.pyramid(gray, levels),
+        )
+
+    def pyramid(self, gray: np.ndarray, levels: int) -> List[np.ndarray]:
+        """Successively halved copies of gray, reusing buffers per level"""
+        images = []
+        current = gray
+        for level in range(1, levels + 1):
+            height, width = current.shape
+            if height < 2 or width < 2:
+                break
+            shape = ((height + 1) // 2, (width + 1) // 2)
+            current = cv2.pyrDown(current, dst=self._buffer(f"pyramid{level}", shape))
+            images.append(current)
+        return images
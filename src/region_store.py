@@ -0,0 +1,295 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from change_detector import Rect
+
+
+@dataclass
+class Region:
+    x: int
+    y: int
+    width: int
+    height: int
+    content_type: str
+    confidence: float
+    content: Optional[str] = None
+
+
+CONTENT_TYPES = ["text", "ui_element"]
+
+REGION_DTYPE = np.dtype([
+    ("x", np.int32),
+    ("y", np.int32),
+    ("width", np.int32),
+    ("height", np.int32),
+    ("content_type", np.uint8),  # index into CONTENT_TYPES
+    ("confidence", np.float32),
+    ("content", np.int32),  # index into RegionArray.contents, -1 for none
+])
+
+
+def content_type_id(content_type: str) -> int:
+    if content_type not in CONTENT_TYPES:
+        CONTENT_TYPES.append(content_type)
+    return CONTENT_TYPES.index(content_type)
+
+
+class RegionArray:
+    """Regions stored as one NumPy structured array plus a list of strings
+
+    Geometric queries return boolean masks or index arrays computed over
+    whole columns at once. Iterating or indexing with an int yields Region
+    dataclasses, built only when asked for.
+    """
+
+    def __init__(self, data: Optional[np.ndarray] = None, contents: Optional[List[str]] = None):
+        self.data = data if data is not None else np.empty(0, dtype=REGION_DTYPE)
+        self.contents: List[str] = contents if contents is not None else []
+
+    @classmethod
+    def from_regions(cls, regions: Iterable[Region]) -> "RegionArray":
+        if isinstance(regions, RegionArray):
+            return regions
+        regions = list(regions)
+        data = np.empty(len(regions), dtype=REGION_DTYPE)
+        contents = []
+        for i, region in enumerate(regions):
+            content = -1
+            if region.content is not None:
+                content = len(contents)
+                contents.append(region.content)
+            data[i] = (region.x, region.y, region.width, region.height,
+                       content_type_id(region.content_type), region.confidence, content)
+        return cls(data, contents)
+
+    @classmethod
+    def from_boxes(cls, boxes: np.ndarray, content_type: str, confidence: float,
+                   contents: Optional[Sequence[str]] = None) -> "RegionArray":
+        """Build from an (n, 4) array of x, y, width, height"""
+        boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        data = np.empty(len(boxes), dtype=REGION_DTYPE)
+        data["x"], data["y"] = boxes[:, 0], boxes[:, 1]
+        data["width"], data["height"] = boxes[:, 2], boxes[:, 3]
+        data["content_type"] = content_type_id(content_type)
+        data["confidence"] = confidence
+        if contents is None:
+            data["content"] = -1
+            return cls(data, [])
+        data["content"] = np.arange(len(boxes))
+        return cls(data, list(contents))
+
+    @classmethod
+    def from_ocr_data(cls, ocr_data: Dict[str, list], min_confidence: float = 60) -> "RegionArray":
+        """Build text regions from OCR word boxes, keeping confident non-empty words"""
+        texts = ocr_data["text"]
+        if not texts:
+            return cls()
+        confidence = np.asarray(ocr_data["conf"], dtype=np.float32)
+        non_empty = np.fromiter((bool(text.strip()) for text in texts), dtype=bool, count=len(texts))
+        keep = np.flatnonzero((confidence > min_confidence) & non_empty)
+        boxes = np.column_stack([np.asarray(ocr_data[key], dtype=np.int32)[keep]
+                                 for key in ("left", "top", "width", "height")])
+        array = cls.from_boxes(boxes, "text", 0.0, [texts[i] for i in keep])
+        array.data["confidence"] = confidence[keep]
+        return array
+
+    @classmethod
+    def concatenate(cls, arrays: Sequence["RegionArray"]) -> "RegionArray":
+        arrays = [array for array in arrays if len(array)]
+        if not arrays:
+            return cls()
+        contents: List[str] = []
+        parts = []
+        for array in arrays:
+            part = array.data.copy()
+            has_content = part["content"] >= 0
+            part["content"][has_content] += len(contents)
+            contents.extend(array.contents)
+            parts.append(part)
+        return cls(np.concatenate(parts), contents)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self) -> Iterator[Region]:
+        for i in range(len(self.data)):
+            yield self._region(i)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self._region(int(index))
+        # Slices, masks and index arrays keep the string table shared
+        return RegionArray(self.data[index], self.contents)
+
+    def _region(self, i: int) -> Region:
+        row = self.data[i]
+        content = int(row["content"])
+        return Region(
+            x=int(row["x"]),
+            y=int(row["y"]),
+            width=int(row["width"]),
+            height=int(row["height"]),
+            content_type=CONTENT_TYPES[row["content_type"]],
+            confidence=float(row["confidence"]),
+            content=self.contents[content] if content >= 0 else None
+        )
+
+    def to_regions(self) -> List[Region]:
+        """Dataclass view of every region"""
+        return list(self)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + sum(len(content) for content in self.contents)
+
+    @property
+    def right(self) -> np.ndarray:
+        return self.data["x"] + self.data["width"]
+
+    @property
+    def bottom(self) -> np.ndarray:
+        return self.data["y"] + self.data["height"]
+
+    def texts(self) -> List[Optional[str]]:
+        """Content string of every region, in order"""
+        return [self.contents[i] if i >= 0 else None for i in self.data["content"]]
+
+    def offset(self, dx: int, dy: int) -> "RegionArray":
+        data = self.data.copy()
+        data["x"] += dx
+        data["y"] += dy
+        return RegionArray(data, self.contents)
+
+    def of_type(self, content_type: str) -> np.ndarray:
+        if content_type not in CONTENT_TYPES:
+            return np.zeros(len(self), dtype=bool)
+        return self.data["content_type"] == CONTENT_TYPES.index(content_type)
+
+    def origins_within(self, left: int, top: int, right: int, bottom: int) -> np.ndarray:
+        """Mask of regions whose top-left corner lies inside the bounds (inclusive)"""
+        x, y = self.data["x"], self.data["y"]
+        return (x >= left) & (x <= right) & (y >= top) & (y <= bottom)
+
+    def contained_in(self, rect: Rect) -> np.ndarray:
+        """Mask of regions entirely inside rect"""
+        x, y, w, h = rect
+        return ((self.data["x"] >= x) & (self.data["y"] >= y) &
+                (self.right <= x + w) & (self.bottom <= y + h))
+
+    def overlapping(self, rect: Rect) -> np.ndarray:
+        """Mask of regions intersecting rect"""
+        x, y, w, h = rect
+        return ((self.data["x"] < x + w) & (x < self.right) &
+                (self.data["y"] < y + h) & (y < self.bottom))
+
+    def overlapping_any(self, rects: Sequence[Rect]) -> np.ndarray:
+        """Mask of regions intersecting at least one of rects"""
+        if not len(rects) or not len(self):
+            return np.zeros(len(self), dtype=bool)
+        rects = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+        x = self.data["x"][:, None]
+        y = self.data["y"][:, None]
+        return ((x < rects[:, 0] + rects[:, 2]) & (rects[:, 0] < self.right[:, None]) &
+                (y < rects[:, 1] + rects[:, 3]) & (rects[:, 1] < self.bottom[:, None])).any(axis=1)
+
+    def clip(self, rect: Rect) -> "RegionArray":
+        """Regions intersecting rect, with their boxes cut to it"""
+        x, y, w, h = rect
+        inside = self[self.overlapping(rect)]
+        data = inside.data.copy()
+        left = np.maximum(data["x"], x)
+        top = np.maximum(data["y"], y)
+        data["width"] = np.minimum(inside.right, x + w) - left
+        data["height"] = np.minimum(inside.bottom, y + h) - top
+        data["x"], data["y"] = left, top
+        return RegionArray(data, inside.contents)
+
+    def iou(self, other: "RegionArray") -> np.ndarray:
+        """Pairwise intersection-over-union matrix of shape (len(self), len(other))"""
+        ax, ay = self.data["x"][:, None], self.data["y"][:, None]
+        ar, ab = self.right[:, None], self.bottom[:, None]
+        bx, by = other.data["x"][None, :], other.data["y"][None, :]
+        br, bb = other.right[None, :], other.bottom[None, :]
+        inter = (np.clip(np.minimum(ar, br) - np.maximum(ax, bx), 0, None) *
+                 np.clip(np.minimum(ab, bb) - np.maximum(ay, by), 0, None)).astype(np.float64)
+        area_a = (self.data["width"] * self.data["height"])[:, None]
+        area_b = (other.data["width"] * other.data["height"])[None, :]
+        union = area_a + area_b - inter
+        return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+    def group_lines(self, tolerance: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Sort by y and split into lines wherever consecutive y values jump by more than tolerance
+
+        Returns (order, line_starts): region indices in reading order and the
+        positions in `order` where each line begins.
+        """
+        order = np.argsort(self.data["y"], kind="stable")
+        if not len(order):
+            return order, order
+        y = self.data["y"][order]
+        breaks = np.flatnonzero(np.abs(np.diff(y)) > tolerance) + 1
+        return order, np.concatenate(([0], breaks))
+
+
+def text_lines(regions: RegionArray, tolerance: int = 10) -> List[str]:
+    """Text regions joined into lines in reading order"""
+    text_regions = regions[regions.of_type("text") & (regions.data["content"] >= 0)]
+    if not len(text_regions):
+        return []
+    contents = np.array(text_regions.texts(), dtype=str)
+    order, line_starts = text_regions.group_lines(tolerance)
+    return [" ".join(line) for line in np.split(contents[order], line_starts[1:])]
+
+
+class GridIndex:
+    """Uniform-grid spatial index over a RegionArray for rectangle queries"""
+
+    def __init__(self, regions: RegionArray, cell_size: int = 128):
+        self.regions = regions
+        self.cell_size = cell_size
+        data = regions.data
+        if not len(data):
+            self._keys = np.empty(0, dtype=np.int64)
+            self._ids = np.empty(0, dtype=np.int64)
+            return
+
+        cx0 = data["x"] // cell_size
+        cy0 = data["y"] // cell_size
+        cx1 = (regions.right - 1).clip(min=data["x"]) // cell_size
+        cy1 = (regions.bottom - 1).clip(min=data["y"]) // cell_size
+        spans_x = cx1 - cx0 + 1
+        spans_y = cy1 - cy0 + 1
+
+        # One (cell, region) entry per covered cell, built without Python loops
+        counts = spans_x * spans_y
+        ids = np.repeat(np.arange(len(data)), counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells_x = cx0[ids] + within % spans_x[ids]
+        cells_y = cy0[ids] + within // spans_x[ids]
+        keys = self._key(cells_x, cells_y)
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._ids = ids[order]
+
+    @staticmethod
+    def _key(cells_x, cells_y):
+        return (np.asarray(cells_y, dtype=np.int64) << 32) + (np.asarray(cells_x, dtype=np.int64) & 0xFFFFFFFF)
+
+    def query(self, rect: Rect) -> np.ndarray:
+        """Indices of regions intersecting rect, in ascending order"""
+        if not len(self._keys):
+            return np.empty(0, dtype=np.int64)
+        x, y, w, h = rect
+        size = self.cell_size
+        xs = np.arange(x // size, (x + max(w, 1) - 1) // size + 1)
+        ys = np.arange(y // size, (y + max(h, 1) - 1) // size + 1)
+        keys = self._key(np.tile(xs, len(ys)), np.repeat(ys, len(xs)))
+        starts = np.searchsorted(self._keys, keys, side="left")
+        ends = np.searchsorted(self._keys, keys, side="right")
+        if not (ends > starts).any():
+            return np.empty(0, dtype=np.int64)
+        candidates = np.unique(np.concatenate([self._ids[s:e] for s, e in zip(starts, ends) if e > s]))
+        exact = self.regions[candidates].overlapping(rect)
+        return candidates[exact]
@@ -0,0 +1,199 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from change_detector import ChangeDetector, Rect
+from perf import perf
+from preprocessing import Preprocessor
+from region_store import RegionArray, text_lines
+
+
+@dataclass(slots=True)
+class TrackedFrame:
+    regions: RegionArray
+    ids: np.ndarray  # stable id of every region, carried across frames
+    offset: Tuple[int, int]  # (dx, dy) the content moved since the last frame
+    response: float  # phase correlation peak; low values mean no clear shift
+    new_text: List[str]  # lines of text that were not on screen in the last frame
+    reused: int  # regions carried forward without detection or OCR
+    dirty_rects: List[Rect]  # areas that were detected again
+
+
+@dataclass(slots=True)
+class _WindowState:
+    gray: np.ndarray
+    fingerprints: np.ndarray
+    regions: RegionArray
+    ids: np.ndarray
+
+
+class RegionTracker:
+    """Follow regions across frames of the same window through scrolling
+
+    The offset between consecutive frames is estimated by phase correlation
+    on downscaled grayscale. The previous frame is shifted by it and
+    compared tile by tile with the current one, so only the strips scrolled
+    into view, tiles whose content really changed and regions cut by the
+    frame edge go through ContextManager.detect_regions' dirty-rect path.
+    Everything else is carried forward, OCR text included. Regions are
+    matched to the shifted previous ones by IoU to keep their ids. The
+    tracker keeps its own regions per window; the ContextManager's
+    active_regions are never read or changed.
+    """
+
+    def __init__(self, context_manager, tile_size: int = 64, scale: int = 2,
+                 min_response: float = 0.2, iou_threshold: float = 0.5,
+                 full_fraction: float = 0.5, max_windows: int = 16):
+        self.context_manager = context_manager
+        self.detector = ChangeDetector(tile_size)
+        # Our own buffers: the tracker may run on a thread other than the ContextManager's
+        self.preprocessor = Preprocessor(pyramid_levels=1)
+        self.scale = scale
+        self.min_response = min_response
+        self.iou_threshold = iou_threshold
+        # Above this dirty fraction the whole frame is processed instead
+        self.full_fraction = full_fraction
+        self.max_windows = max_windows
+        self._states: "OrderedDict[Hashable, _WindowState]" = OrderedDict()
+        self._hanning: Optional[np.ndarray] = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def forget(self, key: Optional[Hashable] = None):
+        """Drop a window's state (or every window's) so its next frame is processed fully"""
+        with self._lock:
+            if key is None:
+                self._states.clear()
+            else:
+                self._states.pop(key, None)
+
+    def estimate_offset(self, previous: np.ndarray, current: np.ndarray) -> Tuple[int, int, float]:
+        """(dx, dy, response) by which current's content is shifted from previous"""
+        size = (max(1, previous.shape[1] // self.scale), max(1, previous.shape[0] // self.scale))
+        a = cv2.resize(previous, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+        b = cv2.resize(current, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+        if self._hanning is None or self._hanning.shape != a.shape:
+            self._hanning = cv2.createHanningWindow(size, cv2.CV_32F)
+        (dx, dy), response = cv2.phaseCorrelate(a, b, self._hanning)
+        return int(round(dx * self.scale)), int(round(dy * self.scale)), float(response)
+
+    def update(self, image, key: Optional[Hashable] = None) -> TrackedFrame:
+        """Detect regions in the next frame of window `key`, reusing what scrolled"""
+        with self._lock, perf.stage("tracker.update"):
+            return self._update(image, key)
+
+    def _update(self, image, key: Optional[Hashable]) -> TrackedFrame:
+        gray = self.preprocessor.gray(image).copy()
+        height, width = gray.shape
+        fingerprints = self.detector.fingerprint(gray)
+        state = self._states.get(key)
+
+        if state is None or state.gray.shape != gray.shape:
+            regions = self.context_manager.detect_regions(image, preprocessor=self.preprocessor)
+            ids, new = self._match(regions, RegionArray(), np.empty(0, dtype=np.int64))
+            return self._finish(key, gray, fingerprints, regions, ids, new, (0, 0), 0.0,
+                                0, [(0, 0, width, height)])
+
+        self._states.move_to_end(key)
+        if np.array_equal(fingerprints, state.fingerprints):
+            perf.count("tracker.unchanged")
+            return TrackedFrame(state.regions, state.ids, (0, 0), 1.0, [], len(state.regions), [])
+
+        with perf.stage("tracker.offset"):
+            dx, dy, response = self.estimate_offset(state.gray, gray)
+        if response < self.min_response or abs(dx) >= width or abs(dy) >= height:
+            dx = dy = 0
+
+        # The previous frame moved by the offset, with exposed strips taken
+        # from the current frame, differs from it only where content changed
+        overlap = (max(0, dx), max(0, dy), width - abs(dx), height - abs(dy))
+        x, y, w, h = overlap
+        warped = gray.copy()
+        warped[y:y + h, x:x + w] = state.gray[y - dy:y - dy + h, x - dx:x - dx + w]
+        mask = self.detector.fingerprint(warped) != fingerprints
+
+        shifted = state.regions.offset(dx, dy)
+        inside = shifted.contained_in(overlap)
+        # Strips scrolled into view and regions cut by the frame edge
+        exposed = [(0, 0, width, y), (0, y + h, width, height - y - h),
+                   (0, 0, x, height), (x + w, 0, width - x - w, height)]
+        partial = shifted[~inside].clip((0, 0, width, height))
+        exposed += [tuple(int(v) for v in row) for row in
+                    zip(partial.data["x"], partial.data["y"],
+                        partial.data["width"], partial.data["height"])]
+        for rect in exposed:
+            self._mark(mask, rect)
+
+        if mask.mean() > self.full_fraction:
+            dirty = [(0, 0, width, height)]
+            regions = self.context_manager.detect_regions(image, preprocessor=self.preprocessor)
+            reused = 0
+        else:
+            dirty = self._merge_rows(self.detector.mask_to_rects(mask, height, width))
+            carried = shifted[inside]
+            reused = int((~carried.overlapping_any(dirty)).sum())
+            regions = self.context_manager.detect_regions(image, dirty, carried,
+                                                          preprocessor=self.preprocessor)
+        perf.count("tracker.regions_reused", reused)
+
+        ids, new = self._match(regions, shifted, state.ids)
+        return self._finish(key, gray, fingerprints, regions, ids, new, (dx, dy), response,
+                            reused, dirty)
+
+    def _finish(self, key, gray, fingerprints, regions, ids, new, offset, response,
+                reused, dirty) -> TrackedFrame:
+        self._states[key] = _WindowState(gray, fingerprints, regions, ids)
+        self._states.move_to_end(key)
+        while len(self._states) > self.max_windows:
+            self._states.popitem(last=False)
+        new_text = text_lines(regions[new & (regions.data["content"] >= 0)])
+        return TrackedFrame(regions, ids, offset, response, new_text, reused, dirty)
+
+    def _mark(self, mask: np.ndarray, rect: Rect):
+        """Set the tiles of mask that rect touches"""
+        x, y, w, h = rect
+        if w <= 0 or h <= 0:
+            return
+        tile = self.detector.tile_size
+        mask[y // tile:(y + h - 1) // tile + 1, x // tile:(x + w - 1) // tile + 1] = True
+
+    @staticmethod
+    def _merge_rows(rects: List[Rect]) -> List[Rect]:
+        """Join vertically adjacent rectangles with the same horizontal extent"""
+        merged: List[Rect] = []
+        for rect in sorted(rects, key=lambda r: (r[0], r[2], r[1])):
+            if merged:
+                x, y, w, h = merged[-1]
+                if (x, w) == (rect[0], rect[2]) and y + h == rect[1]:
+                    merged[-1] = (x, y, w, h + rect[3])
+                    continue
+            merged.append(rect)
+        return sorted(merged, key=lambda r: (r[1], r[0]))
+
+    def _match(self, regions: RegionArray, previous: RegionArray,
+               previous_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids for regions by greedy IoU matching; also a mask of new or changed ones"""
+        ids = np.full(len(regions), -1, dtype=np.int64)
+        new = np.ones(len(regions), dtype=bool)
+        if len(regions) and len(previous):
+            iou = regions.iou(previous)
+            iou[regions.data["content_type"][:, None] != previous.data["content_type"][None, :]] = 0
+            rows, cols = np.nonzero(iou >= self.iou_threshold)
+            order = np.argsort(-iou[rows, cols], kind="stable")
+            texts, previous_texts = regions.texts(), previous.texts()
+            taken = set()
+            for row, col in zip(rows[order], cols[order]):
+                if ids[row] >= 0 or col in taken:
+                    continue
+                taken.add(col)
+                ids[row] = previous_ids[col]
+                new[row] = texts[row] != previous_texts[col]
+        unmatched = ids < 0
+        count = int(unmatched.sum())
+        ids[unmatched] = np.arange(self._next_id, self._next_id + count)
+        self._next_id += count
+        return ids, new
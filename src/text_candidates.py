@@ -0,0 +1,84 @@
+from collections import Counter
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from change_detector import Rect
+
+
+def find_text_candidates(gray: np.ndarray, scale: int = 1, min_height: int = 6,
+                         max_height: int = 160, min_edge_density: float = 0.1,
+                         padding: int = 4) -> List[Rect]:
+    """Find line/block rectangles likely to contain text
+
+    Glyph edges are picked up with a morphological gradient, joined into
+    lines by a horizontal closing and grouped with connected components.
+    gray may be a downscaled pyramid level, in which case `scale` maps the
+    rectangles back to full resolution. Sizes are in full-resolution pixels.
+    """
+    if gray.size == 0:
+        return []
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT,
+                                cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, edges = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+    # Bridge the gaps between characters and words on the same line
+    close_width = max(3, 15 // scale)
+    joined = cv2.morphologyEx(edges, cv2.MORPH_CLOSE,
+                              cv2.getStructuringElement(cv2.MORPH_RECT, (close_width, 3)))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(joined, connectivity=8)
+    if count <= 1:
+        return []
+
+    stats = stats[1:]
+    x, y = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+    w, h = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT]
+
+    # Share of edge pixels per box, from an integral image of the edge map
+    integral = cv2.integral(edges // 255)
+    edge_pixels = (integral[y + h, x + w] - integral[y, x + w]
+                   - integral[y + h, x] + integral[y, x])
+    density = edge_pixels / np.maximum(w * h, 1)
+
+    keep = ((h * scale >= min_height) & (h * scale <= max_height) &
+            (w * scale >= min_height // 2) & (density >= min_edge_density))
+
+    image_height, image_width = gray.shape[0] * scale, gray.shape[1] * scale
+    left = np.clip(x[keep] * scale - padding, 0, image_width)
+    top = np.clip(y[keep] * scale - padding, 0, image_height)
+    right = np.clip((x[keep] + w[keep]) * scale + padding, 0, image_width)
+    bottom = np.clip((y[keep] + h[keep]) * scale + padding, 0, image_height)
+
+    # Reading order keeps batches and cache keys stable between frames
+    order = np.lexsort((left, top))
+    return [(int(left[i]), int(top[i]), int(right[i] - left[i]), int(bottom[i] - top[i]))
+            for i in order]
+
+
+def compare_with_full_frame(roi_regions, full_regions, roi_rects: List[Rect],
+                            image_shape) -> Dict:
+    """Measure ROI OCR against full-frame OCR of the same image
+
+    Recall is the share of words found by full-frame OCR that ROI OCR also
+    found (as a multiset of strings). pixel_ratio is the share of the frame
+    that was sent to OCR.
+    """
+    full_words = Counter(r.content.strip() for r in full_regions if r.content and r.content.strip())
+    roi_words = Counter(r.content.strip() for r in roi_regions if r.content and r.content.strip())
+    matched = sum((full_words & roi_words).values())
+    total = sum(full_words.values())
+
+    # Count covered pixels once even where candidate rectangles overlap
+    covered = np.zeros(image_shape[:2], dtype=bool)
+    for x, y, w, h in roi_rects:
+        covered[y:y + h, x:x + w] = True
+    frame_pixels = covered.size
+    return {
+        "full_words": total,
+        "roi_words": sum(roi_words.values()),
+        "recall": matched / total if total else 1.0,
+        "roi_pixels": int(covered.sum()),
+        "frame_pixels": frame_pixels,
+        "pixel_ratio": covered.sum() / frame_pixels if frame_pixels else 0.0,
+    }
@@ -0,0 +1,528 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from change_detector import Rect
+
+# Tokens longer than this are truncated so terms fit a fixed-width array
+MAX_TERM_LENGTH = 32
+TERM_DTYPE = f"<U{MAX_TERM_LENGTH}"
+
+POSTING_DTYPE = np.dtype([
+    ("doc", np.int64),
+    ("pos", np.int32),
+    ("x", np.int32),
+    ("y", np.int32),
+    ("width", np.int32),
+    ("height", np.int32),
+])
+
+DOC_DTYPE = np.dtype([
+    ("doc", np.int64),
+    ("first_seen", np.float64),
+    ("last_seen", np.float64),
+    ("window", np.int32),  # index into the segment's strings
+    ("process", np.int32),
+])
+
+TOKEN_PATTERN = re.compile(r"\w+")
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def default_index_dir() -> str:
+    """Index location: SCREEN_ASSISTANT_INDEX or a folder in the user's home"""
+    return os.environ.get("SCREEN_ASSISTANT_INDEX") or os.path.join(
+        os.path.expanduser("~"), ".screen_assistant", "index")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+@dataclass(slots=True)
+class SearchHit:
+    timestamp: float  # last time the matching screen was seen
+    first_seen: float
+    window_title: str
+    process_name: str
+    bbox: Rect  # box of the first matched word, in screen or capture coordinates
+
+
+class _Segment:
+    """Immutable on-disk segment, memory-mapped
+
+    terms.npy holds the sorted distinct terms, offsets.npy the start of each
+    term's postings in postings.npy (plus a final end offset), docs.npy the
+    document table and strings.json the window/process names it refers to.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.terms = np.load(os.path.join(path, "terms.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.postings = np.load(os.path.join(path, "postings.npy"), mmap_mode="r")
+        self.docs = np.load(os.path.join(path, "docs.npy"))
+        with open(os.path.join(path, "strings.json"), encoding="utf-8") as f:
+            self.strings = json.load(f)
+
+    @staticmethod
+    def write(path: str, postings: np.ndarray, terms: np.ndarray, docs: np.ndarray,
+              strings: List[str]):
+        """Write postings (any order) with their per-posting terms as a new segment"""
+        # Sort on integer term codes; sorting the strings themselves is far slower
+        unique, codes = np.unique(terms, return_inverse=True)
+        order = np.lexsort((postings["pos"], postings["doc"], codes))
+        postings, codes = postings[order], codes[order]
+        starts = np.searchsorted(codes, np.arange(len(unique)))
+        tmp = path + ".tmp"
+        os.makedirs(tmp, exist_ok=True)
+        np.save(os.path.join(tmp, "terms.npy"), unique.astype(TERM_DTYPE))
+        np.save(os.path.join(tmp, "offsets.npy"),
+                np.append(starts, len(postings)).astype(np.int64))
+        np.save(os.path.join(tmp, "postings.npy"), postings)
+        np.save(os.path.join(tmp, "docs.npy"), docs)
+        with open(os.path.join(tmp, "strings.json"), "w", encoding="utf-8") as f:
+            json.dump(strings, f)
+        os.replace(tmp, path)
+
+    def term_range(self, term: str, prefix: bool) -> Tuple[int, int]:
+        """Index range of matching terms in self.terms"""
+        start = int(np.searchsorted(self.terms, term, side="left"))
+        if prefix:
+            # Every term with this prefix sorts before prefix + the highest code point
+            end = int(np.searchsorted(self.terms, term + "\U0010ffff", side="left"))
+        else:
+            end = start + int(start < len(self.terms) and self.terms[start] == term)
+        return start, end
+
+    def postings_for(self, term: str, prefix: bool) -> np.ndarray:
+        start, end = self.term_range(term, prefix)
+        if start >= end:
+            return np.empty(0, dtype=POSTING_DTYPE)
+        return np.asarray(self.postings[self.offsets[start]:self.offsets[end]])
+
+    def all_terms_and_postings(self) -> Tuple[np.ndarray, np.ndarray]:
+        counts = np.diff(self.offsets)
+        return np.repeat(np.asarray(self.terms), counts), np.asarray(self.postings)
+
+
+class TextIndex:
+    """Incremental positional inverted index over OCR'd screens
+
+    Each indexed screen is a document carrying window title, process name
+    and first/last seen time; each posting stores the word position and
+    bounding box. Identical screens of the same window (same token
+    sequence) are not re-indexed, their last-seen time is bumped instead.
+
+    New documents go to an in-memory segment of parallel arrays. Once it
+    holds max_memory_postings postings it is written out as an immutable,
+    memory-mapped segment; when more than max_segments exist they are
+    merged into one. So that a crash loses little, a background thread
+    also flushes once indexing has been idle for idle_seconds, or every
+    flush_interval seconds while it is busy. Queries are ANDed clauses of
+    words, `prefix*` and "quoted phrases".
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_memory_postings: int = 200000,
+                 max_segments: int = 8, dedup_entries: int = 4096,
+                 flush_interval: float = 60.0, idle_seconds: float = 5.0):
+        self.directory = directory
+        self.max_memory_postings = max_memory_postings
+        self.max_segments = max_segments
+        self.dedup_entries = dedup_entries
+        self.flush_interval = flush_interval
+        self.idle_seconds = idle_seconds
+        self._lock = threading.RLock()
+        self._segments: List[_Segment] = []
+        self._next_doc = 0
+        self._next_segment = 1
+        # digest -> doc id of recently indexed screens, for deduplication
+        self._recent: "OrderedDict[bytes, int]" = OrderedDict()
+        # Last-seen updates for documents already written to disk
+        self._last_seen: Dict[int, float] = {}
+        # Monotonic times of the first and last change not yet on disk
+        self._dirty_since: Optional[float] = None
+        self._last_change = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._reset_memory()
+        if directory is not None:
+            self._load()
+            if flush_interval > 0:
+                self._thread = threading.Thread(target=self._run, name="text-index-flush",
+                                                daemon=True)
+                self._thread.start()
+
+    def _reset_memory(self):
+        self._term_ids: Dict[str, int] = {}
+        self._terms: List[str] = []
+        self._mem = {name: array("q" if name == "doc" else "i") for name in POSTING_DTYPE.names}
+        self._mem_terms = array("i")
+        # doc id -> [doc, first_seen, last_seen, window, process]
+        self._mem_docs: Dict[int, list] = {}
+        self._mem_arrays = None
+
+    def _run(self):
+        while not self._stop.wait(min(self.flush_interval, self.idle_seconds)):
+            with self._lock:
+                if self._dirty_since is None:
+                    continue
+                now = time.monotonic()
+                due = (now - self._last_change >= self.idle_seconds or
+                       now - self._dirty_since >= self.flush_interval)
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Error flushing text index: {e}")
+
+    def _changed(self):
+        self._last_change = time.monotonic()
+        if self._dirty_since is None:
+            self._dirty_since = self._last_change
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, "manifest.json")
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if not os.path.exists(self._manifest_path()):
+            return
+        with open(self._manifest_path(), encoding="utf-8") as f:
+            manifest = json.load(f)
+        self._next_doc = manifest["next_doc"]
+        self._next_segment = manifest["next_segment"]
+        self._last_seen = {int(doc): seen for doc, seen in manifest.get("last_seen", {}).items()}
+        self._segments = [_Segment(os.path.join(self.directory, name))
+                          for name in manifest["segments"]]
+        # Segments left behind by an interrupted flush or merge
+        for name in os.listdir(self.directory):
+            if name.startswith("seg-") and name not in manifest["segments"]:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def _save_manifest(self):
+        manifest = {
+            "next_doc": self._next_doc,
+            "next_segment": self._next_segment,
+            "segments": [os.path.basename(segment.path) for segment in self._segments],
+            "last_seen": {str(doc): seen for doc, seen in self._last_seen.items()},
+        }
+        tmp = self._manifest_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._manifest_path())
+
+    def __len__(self):
+        """Number of indexed (deduplicated) screens"""
+        return self._next_doc
+
+    @property
+    def memory_postings(self) -> int:
+        return len(self._mem_terms)
+
+    def add_regions(self, regions, window_title: str = "", process_name: str = "",
+                    timestamp: Optional[float] = None) -> Optional[int]:
+        """Index the text regions of a RegionArray in reading order"""
+        text_regions = regions[regions.of_type("text") & (regions.data["content"] >= 0)]
+        order, _ = text_regions.group_lines()
+        data = text_regions.data[order]
+        contents = [text_regions.contents[i] for i in data["content"]]
+        boxes = np.column_stack([data["x"], data["y"], data["width"], data["height"]])
+        return self.add_words(contents, boxes, window_title, process_name, timestamp)
+
+    def add_text(self, text: str, bbox: Rect = (0, 0, 0, 0), window_title: str = "",
+                 process_name: str = "", timestamp: Optional[float] = None) -> Optional[int]:
+        """Index plain text whose words all share one bounding box"""
+        return self.add_words([text], np.asarray([bbox]), window_title, process_name, timestamp)
+
+    def add_words(self, words: Sequence[str], boxes: np.ndarray, window_title: str = "",
+                  process_name: str = "", timestamp: Optional[float] = None) -> Optional[int]:
+        """Index one screen given word strings and their (n, 4) x, y, w, h boxes
+
+        Returns the document id, or None if the screen had no tokens.
+        """
+        timestamp = timestamp if timestamp is not None else time.time()
+        tokens: List[str] = []
+        token_boxes: List[int] = []
+        for i, word in enumerate(words):
+            word_tokens = tokenize(word)
+            tokens.extend(word_tokens)
+            token_boxes.extend([i] * len(word_tokens))
+        if not tokens:
+            return None
+
+        digest = hashlib.blake2b("\x1f".join([window_title] + tokens).encode("utf-8"),
+                                 digest_size=16).digest()
+        with self._lock:
+            doc = self._recent.get(digest)
+            if doc is not None:
+                self._recent.move_to_end(digest)
+                self._touch(doc, timestamp)
+                self._changed()
+                return doc
+
+            doc = self._next_doc
+            self._next_doc += 1
+            self._recent[digest] = doc
+            if len(self._recent) > self.dedup_entries:
+                self._recent.popitem(last=False)
+
+            boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)[token_boxes]
+            term_ids = self._term_ids
+            for token in tokens:
+                if token not in term_ids:
+                    term_ids[token] = len(self._terms)
+                    self._terms.append(token)
+            self._mem_terms.extend(term_ids[token] for token in tokens)
+            self._mem["doc"].extend([doc] * len(tokens))
+            self._mem["pos"].extend(range(len(tokens)))
+            for column, name in enumerate(("x", "y", "width", "height")):
+                self._mem[name].extend(boxes[:, column].tolist())
+            self._mem_docs[doc] = [doc, timestamp, timestamp, window_title, process_name]
+            self._mem_arrays = None
+            self._changed()
+
+            if len(self._mem_terms) >= self.max_memory_postings and self.directory is not None:
+                self.flush()
+            return doc
+
+    def _touch(self, doc: int, timestamp: float):
+        entry = self._mem_docs.get(doc)
+        if entry is not None:
+            entry[2] = timestamp
+        else:
+            self._last_seen[doc] = timestamp
+
+    def _memory_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Term ids and postings of the in-memory segment, cached until the next add"""
+        if self._mem_arrays is None:
+            postings = np.empty(len(self._mem_terms), dtype=POSTING_DTYPE)
+            for name in POSTING_DTYPE.names:
+                postings[name] = np.frombuffer(self._mem[name], dtype=postings.dtype[name])
+            self._mem_arrays = (np.frombuffer(self._mem_terms, dtype=np.int32).copy(), postings)
+        return self._mem_arrays
+
+    def _memory_docs(self) -> Tuple[np.ndarray, List[str]]:
+        strings: Dict[str, int] = {}
+        docs = np.empty(len(self._mem_docs), dtype=DOC_DTYPE)
+        for i, (doc, first, last, window, process) in enumerate(self._mem_docs.values()):
+            docs[i] = (doc, first, last, strings.setdefault(window, len(strings)),
+                       strings.setdefault(process, len(strings)))
+        return docs, list(strings)
+
+    def flush(self):
+        """Write the in-memory segment to disk and merge segments if needed"""
+        if self.directory is None:
+            return
+        with self._lock:
+            if len(self._mem_terms):
+                term_ids, postings = self._memory_arrays()
+                terms = np.asarray(self._terms, dtype=TERM_DTYPE)[term_ids]
+                docs, strings = self._memory_docs()
+                self._write_segment(postings, terms, docs, strings)
+                self._reset_memory()
+            if len(self._segments) > self.max_segments:
+                self._merge(self._merge_candidates())
+            self._save_manifest()
+            self._dirty_since = None
+
+    def _write_segment(self, postings, terms, docs, strings):
+        path = os.path.join(self.directory, f"seg-{self._next_segment:06d}")
+        self._next_segment += 1
+        _Segment.write(path, postings, terms, docs, strings)
+        self._segments.append(_Segment(path))
+
+    def _merge_candidates(self) -> int:
+        """How many of the newest segments to merge, size-tiered
+
+        The run grows towards older segments while the next one is no larger
+        than the run so far, so big segments are rewritten only rarely.
+        """
+        sizes = [len(segment.postings) for segment in self._segments]
+        count, total = 1, sizes[-1]
+        while count < len(sizes) and sizes[-count - 1] <= total:
+            total += sizes[-count - 1]
+            count += 1
+        return max(count, 2)
+
+    def merge(self):
+        """Merge every on-disk segment into one"""
+        with self._lock:
+            self._merge(len(self._segments))
+
+    def _merge(self, count: int):
+        """Merge the newest count segments, folding in last-seen updates"""
+        with self._lock:
+            if count < 2 or len(self._segments) < 2:
+                return
+            old = self._segments[-count:]
+            all_terms, all_postings, all_docs, strings = [], [], [], {}
+            for segment in old:
+                terms, postings = segment.all_terms_and_postings()
+                all_terms.append(terms)
+                all_postings.append(postings)
+                docs = segment.docs.copy()
+                remap = np.asarray([strings.setdefault(s, len(strings)) for s in segment.strings],
+                                   dtype=np.int32)
+                if len(remap):
+                    docs["window"] = remap[docs["window"]]
+                    docs["process"] = remap[docs["process"]]
+                all_docs.append(docs)
+            docs = np.concatenate(all_docs)
+            for i, doc in enumerate(docs["doc"]):
+                seen = self._last_seen.pop(int(doc), None)
+                if seen is not None:
+                    docs["last_seen"][i] = max(docs["last_seen"][i], seen)
+            del self._segments[-count:]
+            self._write_segment(np.concatenate(all_postings), np.concatenate(all_terms),
+                                docs, list(strings))
+            self._save_manifest()
+            # Drop every reference to the memory maps before deleting (required on Windows)
+            paths = [segment.path for segment in old]
+            all_terms.clear()
+            all_postings.clear()
+            del old, segment, terms, postings
+            for path in paths:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def close(self):
+        """Stop the background flush and write out what is still in memory"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def _postings(self, term: str, prefix: bool) -> Tuple[np.ndarray, List[_Segment]]:
+        """Postings matching a term across memory and disk"""
+        parts = [segment.postings_for(term, prefix) for segment in self._segments]
+        if len(self._mem_terms):
+            if prefix:
+                ids = [i for t, i in self._term_ids.items() if t.startswith(term)]
+            else:
+                ids = [self._term_ids[term]] if term in self._term_ids else []
+            if ids:
+                term_ids, postings = self._memory_arrays()
+                parts.append(postings[np.isin(term_ids, ids)])
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return np.empty(0, dtype=POSTING_DTYPE)
+        return np.concatenate(parts)
+
+    def _clause(self, words: List[str], last_prefix: bool) -> np.ndarray:
+        """Postings of the first word of every occurrence of a phrase"""
+        first = self._postings(words[0], last_prefix and len(words) == 1)
+        if len(words) == 1 or not len(first):
+            return first
+        # Keys of doc/position pairs, shifted back to the phrase start
+        keys = (first["doc"] << 32) + first["pos"]
+        for offset, word in enumerate(words[1:], start=1):
+            postings = self._postings(word, last_prefix and offset == len(words) - 1)
+            keys = np.intersect1d(keys, (postings["doc"] << 32) + postings["pos"] - offset)
+            if not len(keys):
+                break
+        return first[np.isin((first["doc"] << 32) + first["pos"], keys)]
+
+    def _document(self, doc: int) -> Tuple[float, float, str, str]:
+        """(first_seen, last_seen, window, process) of a document"""
+        entry = self._mem_docs.get(doc)
+        if entry is not None:
+            return entry[1], entry[2], entry[3], entry[4]
+        for segment in self._segments:
+            # Document ids within a segment are ascending
+            ids = segment.docs["doc"]
+            i = int(np.searchsorted(ids, doc))
+            if i < len(ids) and ids[i] == doc:
+                row = segment.docs[i]
+                last = max(float(row["last_seen"]), self._last_seen.get(doc, 0.0))
+                return (float(row["first_seen"]), last,
+                        segment.strings[row["window"]], segment.strings[row["process"]])
+        raise KeyError(doc)
+
+    def _doc_filter(self, doc_ids: np.ndarray,
+                    window_title: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(last_seen, window matches) of doc_ids, looked up in the document tables at once"""
+        last_seen = np.full(len(doc_ids), -np.inf)
+        keep = np.full(len(doc_ids), window_title is None)
+        for segment in self._segments:
+            ids = segment.docs["doc"]
+            if not len(ids):
+                continue
+            rows = np.minimum(np.searchsorted(ids, doc_ids), len(ids) - 1)
+            found = ids[rows] == doc_ids
+            docs = segment.docs[rows[found]]
+            last_seen[found] = docs["last_seen"]
+            if window_title is not None:
+                titles = np.asarray([s == window_title for s in segment.strings], dtype=bool)
+                keep[found] = titles[docs["window"]]
+        if self._last_seen:
+            updated = np.fromiter(self._last_seen, dtype=np.int64, count=len(self._last_seen))
+            seen = np.fromiter(self._last_seen.values(), dtype=np.float64,
+                               count=len(self._last_seen))
+            order = np.argsort(updated)
+            updated, seen = updated[order], seen[order]
+            rows = np.minimum(np.searchsorted(updated, doc_ids), len(updated) - 1)
+            found = updated[rows] == doc_ids
+            last_seen[found] = np.maximum(last_seen[found], seen[rows[found]])
+        for i in np.flatnonzero(np.isin(doc_ids, np.fromiter(self._mem_docs, dtype=np.int64,
+                                                              count=len(self._mem_docs)))):
+            entry = self._mem_docs[int(doc_ids[i])]
+            last_seen[i] = entry[2]
+            if window_title is not None:
+                keep[i] = entry[3] == window_title
+        return last_seen, keep
+
+    def search(self, query: str, since: Optional[float] = None, window_title: Optional[str] = None,
+               limit: int = 50) -> List[SearchHit]:
+        """Screens matching every clause of the query, most recently seen first
+
+        Plain words must occur anywhere on the screen, `word*` matches any
+        word with that prefix and "quoted words" must occur consecutively.
+        since is a Unix time; window_title filters on an exact title.
+        """
+        clauses = []
+        for phrase, word in QUERY_PATTERN.findall(query):
+            text = phrase or word
+            prefix = text.endswith("*")
+            words = tokenize(text)
+            if words:
+                clauses.append((words, prefix))
+        if not clauses:
+            return []
+
+        with self._lock:
+            matches = None
+            for words, prefix in clauses:
+                postings = self._clause(words, prefix)
+                # Keep the first match per document for its bounding box
+                docs, first = np.unique(postings["doc"], return_index=True)
+                if matches is None:
+                    matches = postings[first]
+                else:
+                    matches = matches[np.isin(matches["doc"], docs)]
+                if not len(matches):
+                    return []
+
+            # Filter and rank on the document tables, then resolve only the returned rows
+            last_seen, keep = self._doc_filter(matches["doc"], window_title)
+            if since is not None:
+                keep &= last_seen >= since
+            rows = np.flatnonzero(keep)
+            rows = rows[np.argsort(-last_seen[rows], kind="stable")[:max(0, limit)]]
+            hits = []
+            for posting in matches[rows]:
+                first_seen, last, window, process = self._document(int(posting["doc"]))
+                hits.append(SearchHit(last, first_seen, window, process,
+                                      (int(posting["x"]), int(posting["y"]),
+                                       int(posting["width"]), int(posting["height"]))))
+        return hits
@@ -0,0 +1,292 @@
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from input_events import WindowInfoCache
+from platform_backend import PlatformBackend
+
+BBox = Tuple[int, int, int, int]
+
+# Foreground switches remembered for attributing queued input events
+FOREGROUND_HISTORY = 256
+
+
+@dataclass(slots=True)
+class WindowInfo:
+    hwnd: int
+    title: str
+    pid: int
+    process_name: str
+    rect: Optional[BBox] = None  # outer rectangle, screen coordinates
+    client_rect: Optional[BBox] = None  # client area, screen coordinates
+
+
+@dataclass(slots=True)
+class WindowDiff:
+    """Changes to the window list since the last notification"""
+    added: List[WindowInfo]
+    removed: List[int]
+    renamed: List[WindowInfo]
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.renamed)
+
+
+class WindowRegistry:
+    """Cache of top-level window metadata kept current by window events
+
+    After one full scan, the backend's foreground/create/destroy/show/hide/
+    rename/move events update single entries, so lookups by hwnd and of the
+    foreground window are dict reads. Geometry is only re-read for windows
+    that moved since it was last asked for. Listeners receive WindowDiffs
+    on the thread that delivers events (the GUI thread for Win32 hooks).
+
+    Without event support (or before start()), foreground lookups query the
+    backend each time through a WindowInfoCache, as before.
+    """
+
+    def __init__(self, backend: PlatformBackend, exclude_titles: Sequence[str] = ()):
+        self.backend = backend
+        self.exclude_titles = set(exclude_titles)
+        self.listeners: List[Callable[[WindowDiff], None]] = []
+        self.subscribed = False
+        self._windows: Dict[int, WindowInfo] = {}
+        # pid -> (process create time, name); the time catches reused pids
+        self._processes: Dict[int, Tuple[float, str]] = {}
+        self._stale_geometry = set()
+        self._foreground: Optional[int] = None
+        # (time.time(), hwnd) per foreground switch, oldest first
+        self._foreground_changes: List[Tuple[float, int]] = []
+        # Metadata of a foreground window that is not listed, e.g. our own
+        self._unlisted_foreground: Optional[WindowInfo] = None
+        self._fallback = WindowInfoCache(backend)
+        self._lock = threading.RLock()
+
+    def start(self) -> bool:
+        """Scan once and subscribe to window events; False if the backend cannot deliver them"""
+        self.subscribed = self.backend.subscribe(self.handle_event)
+        self.refresh()
+        return self.subscribed
+
+    def stop(self):
+        if self.subscribed:
+            self.backend.unsubscribe()
+            self.subscribed = False
+
+    def __len__(self):
+        return len(self._windows)
+
+    def __contains__(self, hwnd: int):
+        return hwnd in self._windows
+
+    def _process_name(self, pid: int) -> str:
+        try:
+            created = self.backend.process_create_time(pid)
+        except Exception:
+            created = None
+        entry = self._processes.get(pid)
+        if entry is not None and created is not None and entry[0] == created:
+            return entry[1]
+        try:
+            name = self.backend.process_name(pid)
+        except Exception:
+            name = ""
+        if created is not None:
+            self._processes[pid] = (created, name)
+        return name
+
+    def _load(self, hwnd: int, event: Optional[str] = None) -> Optional[WindowInfo]:
+        """Read a window's metadata, or None if it should not be listed
+
+        A known window whose pid is unchanged keeps its process name; the
+        process create time is only checked for created/shown windows and
+        pid changes, when the pid may belong to a new process.
+        """
+        backend = self.backend
+        try:
+            if not backend.is_listed_window(hwnd):
+                return None
+            title = backend.window_title(hwnd)
+            if title in self.exclude_titles:
+                return None
+            pid = backend.window_pid(hwnd)
+        except Exception:
+            return None
+        previous = self._windows.get(hwnd)
+        if previous is not None and previous.pid == pid and event not in ("created", "shown"):
+            process_name = previous.process_name
+        else:
+            if previous is not None and previous.pid != pid:
+                # The handle now belongs to another process
+                self._processes.pop(pid, None)
+            process_name = self._process_name(pid)
+        info = WindowInfo(hwnd, title, pid, process_name)
+        self._stale_geometry.add(hwnd)
+        return info
+
+    def refresh(self):
+        """Full rescan, reporting what changed since the last one"""
+        with self._lock:
+            seen = {}
+            for hwnd in self.backend.list_windows():
+                info = self._load(hwnd)
+                if info is not None:
+                    seen[hwnd] = info
+            diff = WindowDiff(
+                added=[info for hwnd, info in seen.items() if hwnd not in self._windows],
+                removed=[hwnd for hwnd in self._windows if hwnd not in seen],
+                renamed=[info for hwnd, info in seen.items()
+                         if hwnd in self._windows and self._windows[hwnd].title != info.title],
+            )
+            self._windows = seen
+            self._stale_geometry &= set(seen)
+            try:
+                self._foreground = self.backend.foreground_window()
+            except Exception:
+                self._foreground = None
+            if self._foreground is not None:
+                self._record_foreground(self._foreground)
+        self._notify(diff)
+
+    def _record_foreground(self, hwnd: int):
+        changes = self._foreground_changes
+        if changes and changes[-1][1] == hwnd:
+            return
+        changes.append((time.time(), hwnd))
+        if len(changes) > FOREGROUND_HISTORY:
+            del changes[:len(changes) - FOREGROUND_HISTORY]
+
+    def handle_event(self, event: str, hwnd: int):
+        """Apply one window event (see platform_backend.WINDOW_EVENTS)"""
+        diff = WindowDiff([], [], [])
+        with self._lock:
+            if event == "moved":
+                if hwnd in self._windows or hwnd == self._foreground:
+                    self._stale_geometry.add(hwnd)
+                return
+            if event == "foreground":
+                self._foreground = hwnd
+                self._unlisted_foreground = None
+                self._record_foreground(hwnd)
+            if event in ("destroyed", "hidden"):
+                if self._windows.pop(hwnd, None) is not None:
+                    self._stale_geometry.discard(hwnd)
+                    diff.removed.append(hwnd)
+            else:
+                # created, shown, renamed or foreground: (re)read the entry
+                previous = self._windows.get(hwnd)
+                info = self._load(hwnd, event)
+                if info is None:
+                    if previous is not None:
+                        del self._windows[hwnd]
+                        diff.removed.append(hwnd)
+                elif previous is None:
+                    self._windows[hwnd] = info
+                    diff.added.append(info)
+                elif previous.title != info.title or previous.pid != info.pid:
+                    self._windows[hwnd] = info
+                    diff.renamed.append(info)
+        if diff:
+            self._notify(diff)
+
+    def _notify(self, diff: WindowDiff):
+        if not diff:
+            return
+        for listener in self.listeners:
+            try:
+                listener(diff)
+            except Exception as e:
+                print(f"Error in window registry listener: {e}")
+
+    def _geometry(self, info: WindowInfo) -> WindowInfo:
+        if info.hwnd in self._stale_geometry or not self.subscribed:
+            try:
+                info.rect = tuple(self.backend.window_rect(info.hwnd))
+                info.client_rect = tuple(self.backend.client_area(info.hwnd))
+                self._stale_geometry.discard(info.hwnd)
+            except Exception as e:
+                print(f"Error reading window geometry: {e}")
+        return info
+
+    def get(self, hwnd: int) -> Optional[WindowInfo]:
+        """Metadata of a listed window, with current geometry"""
+        with self._lock:
+            info = self._windows.get(hwnd)
+            if info is None and not self.subscribed:
+                info = self._load(hwnd)
+            return self._geometry(info) if info is not None else None
+
+    def windows(self) -> List[WindowInfo]:
+        """Listed windows sorted by title"""
+        with self._lock:
+            return sorted(self._windows.values(), key=lambda info: info.title.lower())
+
+    def foreground_window(self) -> Optional[WindowInfo]:
+        """The foreground window's metadata, even if it is not listed (e.g. our own)"""
+        with self._lock:
+            hwnd = self._foreground if self.subscribed else self.backend.foreground_window()
+            if hwnd is None:
+                return None
+            info = self._windows.get(hwnd)
+            if info is None and self.subscribed:
+                cached = self._unlisted_foreground
+                if cached is not None and cached.hwnd == hwnd:
+                    info = cached
+            if info is None:
+                try:
+                    pid = self.backend.window_pid(hwnd)
+                    info = WindowInfo(hwnd, self.backend.window_title(hwnd), pid,
+                                      self._process_name(pid))
+                except Exception:
+                    return None
+                self._stale_geometry.add(hwnd)
+                self._unlisted_foreground = info
+            return self._geometry(info)
+
+    def foreground_info(self) -> Tuple[str, str]:
+        """Title and process name of the foreground window (WindowInfoCache interface)"""
+        with self._lock:
+            if not self.subscribed:
+                return self._fallback.foreground_info()
+            info = self._windows.get(self._foreground)
+            if info is not None:
+                return info.title, info.process_name
+        info = self.foreground_window()
+        return (info.title, info.process_name) if info is not None else ("", "")
+
+    def foreground_infos(self, timestamps: Sequence[float]) -> List[Tuple[str, str]]:
+        """Title and process name of the window in the foreground at each time.time() stamp"""
+        with self._lock:
+            if not self.subscribed or not self._foreground_changes:
+                return self._fallback.foreground_infos(timestamps)
+            changes = self._foreground_changes
+            resolved: Dict[int, Tuple[str, str]] = {}
+            result = []
+            for timestamp in timestamps:
+                # Stamps older than the remembered history go to its oldest window
+                index = max(bisect_right(changes, timestamp, key=lambda change: change[0]) - 1, 0)
+                hwnd = changes[index][1]
+                names = resolved.get(hwnd)
+                if names is None:
+                    info = self._describe(hwnd)
+                    names = resolved[hwnd] = (info.title, info.process_name) if info else ("", "")
+                result.append(names)
+            return result
+
+    def _describe(self, hwnd: int) -> Optional[WindowInfo]:
+        """Metadata of a window that may be unlisted or no longer in the foreground"""
+        info = self._windows.get(hwnd)
+        if info is not None:
+            return info
+        if hwnd == self._foreground:
+            return self.foreground_window()
+        try:
+            pid = self.backend.window_pid(hwnd)
+            return WindowInfo(hwnd, self.backend.window_title(hwnd), pid, self._process_name(pid))
+        except Exception:
+            return None
+
+    def invalidate(self, hwnd: Optional[int] = None):
+        self._fallback.invalidate(hwnd)
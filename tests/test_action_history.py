@@ -0,0 +1,79 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from action_history import ActionHistory, StringTable, UserAction
+
+
+def fill(history, count, titles=("Editor", "Browser", "Terminal")):
+    for i in range(count):
+        title = titles[i % len(titles)]
+        history.append_values(1000.0 + i, "click", title, title.lower() + ".exe", {"n": i})
+
+
+def numbers(actions):
+    return [action.extra_data["n"] for action in actions]
+
+
+def test_ring_wraps_around_keeping_the_newest_actions_in_order():
+    history = ActionHistory(capacity=4)
+    fill(history, 3)
+    assert len(history) == 3 and numbers(history) == [0, 1, 2]
+    assert numbers(history.for_window("Editor")) == [0]
+
+    fill(history, 10)
+    assert len(history) == 4
+    assert numbers(history) == [6, 7, 8, 9]
+    assert numbers(history[1:3]) == [7, 8]
+    assert history[0].extra_data["n"] == 6 and history[-1].extra_data["n"] == 9
+    with pytest.raises(IndexError):
+        history[4]
+    assert numbers(history.recent(2)) == [8, 9]
+    assert numbers(history.recent(10)) == [6, 7, 8, 9]
+
+    # Queries over the wrapped columns come back oldest first
+    assert numbers(history.for_window("Editor")) == [6, 9]
+    assert numbers(history.for_process("browser.exe")) == [7]
+    assert numbers(history.between(datetime.fromtimestamp(1007.0),
+                                   datetime.fromtimestamp(1009.0))) == [7, 8, 9]
+    assert history.for_window("Missing") == []
+
+
+def test_append_builds_actions_back_on_read():
+    history = ActionHistory(capacity=2)
+    action = UserAction(datetime.fromtimestamp(1234.5), "keyboard", "Editor", "code.exe", None)
+    history.append(action)
+    assert history[0] == action
+
+
+def test_unreferenced_strings_are_compacted_away():
+    history = ActionHistory(capacity=3)
+    for i in range(40):
+        history.append_values(float(i), "click", f"Title {i}", "app.exe")
+        assert len(history._strings) <= 4 * history.capacity
+    assert [action.window_title for action in history] == ["Title 37", "Title 38", "Title 39"]
+    assert [action.process_name for action in history] == ["app.exe"] * 3
+    assert history.for_window("Title 5") == []
+    assert [action.timestamp.timestamp() for action in history.for_window("Title 38")] == [38.0]
+    assert history.for_process("app.exe")[0].window_title == "Title 37"
+
+
+def test_clear_empties_the_ring():
+    history = ActionHistory(capacity=4)
+    fill(history, 6)
+    history.clear()
+    assert len(history) == 0 and list(history) == [] and history.for_window("Editor") == []
+    fill(history, 2)
+    assert numbers(history) == [0, 1]
+
+
+def test_string_table_interns_once():
+    table = StringTable()
+    assert table.intern("Editor") == table.intern("Editor") == 0
+    assert table.intern("Browser") == 1
+    assert table.lookup("Browser") == 1 and table.lookup("Missing") is None
+    assert table[0] == "Editor" and len(table) == 2
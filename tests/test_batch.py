@@ -0,0 +1,86 @@
+import json
+import os
+import sys
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from benchmark import install_platform_stubs, render_screenshot
+
+install_platform_stubs()
+
+from batch import resume_point, run_batch
+
+
+def write_frames(directory, count):
+    directory.mkdir()
+    for i in range(count):
+        rgb = render_screenshot(320, 240, density=0.5, seed=i)
+        cv2.imwrite(str(directory / f"frame-{i:03d}.png"), cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+    return str(directory)
+
+
+def frames_in(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["frame"] for line in f]
+
+
+def test_resume_point_drops_a_torn_final_line(tmp_path):
+    out = tmp_path / "out.jsonl"
+    assert resume_point(str(out)) is None
+    out.write_text("")
+    assert resume_point(str(out)) is None
+
+    out.write_text('{"frame": 0}\n{"frame": 2}\n{"frame": 4, "regi')
+    assert resume_point(str(out)) == 2
+    assert out.read_text() == '{"frame": 0}\n{"frame": 2}\n'
+    assert resume_point(str(out)) == 2
+
+    out.write_text('{"frame": 0, "regi')
+    assert resume_point(str(out)) is None
+    assert out.read_text() == ""
+
+
+def test_interrupted_run_resumes_after_the_last_complete_frame(tmp_path):
+    source = write_frames(tmp_path / "frames", 6)
+    out = str(tmp_path / "out.jsonl")
+    stats = run_batch(source, out, workers=1, ocr="stub")
+    assert stats["frames"] == 6 and frames_in(out) == list(range(6))
+    with open(out, encoding="utf-8") as f:
+        complete = f.readlines()
+    record = json.loads(complete[0])
+    assert record["size"] == [320, 240] and record["regions"] and "error" not in record
+
+    # Keep three records and half of the fourth, as if the run was killed mid-write
+    with open(out, "w", encoding="utf-8") as f:
+        f.writelines(complete[:3])
+        f.write(complete[3][:20])
+    stats = run_batch(source, out, workers=1, ocr="stub")
+    assert stats["first_frame"] == 3 and stats["frames"] == 3
+    assert frames_in(out) == list(range(6))
+
+    stats = run_batch(source, out, workers=1, ocr="stub")
+    assert stats["frames"] == 0 and frames_in(out) == list(range(6))
+
+
+def test_resume_keeps_the_step(tmp_path):
+    source = write_frames(tmp_path / "frames", 7)
+    out = tmp_path / "out.jsonl"
+    out.write_text('{"frame": 0}\n{"frame": 2}\n')
+    stats = run_batch(source, str(out), workers=1, step=2, ocr="stub")
+    assert stats["first_frame"] == 4
+    assert frames_in(out) == [0, 2, 4, 6]
+
+
+def test_unreadable_frame_is_recorded_and_the_run_continues(tmp_path):
+    source = write_frames(tmp_path / "frames", 3)
+    with open(os.path.join(source, "frame-001.png"), "wb") as f:
+        f.write(b"not a png")
+    out = str(tmp_path / "out.jsonl")
+    run_batch(source, out, workers=1, ocr="stub")
+    with open(out, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [record["frame"] for record in records] == [0, 1, 2]
+    assert records[1]["error"] == "unreadable image"
+    assert "error" not in records[0] and "error" not in records[2]
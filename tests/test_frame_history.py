@@ -0,0 +1,100 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from frame_history import FrameHistory
+
+
+def make_frames(count, seed=0, size=(192, 256)):
+    """Noise frame followed by frames that each repaint one small square"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 256, size=size + (4,), dtype=np.uint8)
+    frames = [frame.copy()]
+    for i in range(1, count):
+        y, x = (i * 37) % (size[0] - 20), (i * 53) % (size[1] - 20)
+        frame[y:y + 20, x:x + 20] = rng.integers(0, 256, size=(20, 20, 4), dtype=np.uint8)
+        frames.append(frame.copy())
+    return frames
+
+
+def test_keyframe_and_deltas_round_trip_in_any_order():
+    history = FrameHistory(codec="zlib")
+    frames = make_frames(10, size=(384, 512))
+    for i, frame in enumerate(frames):
+        history.add(frame, timestamp=100.0 + i)
+    assert history.stats()["gops"] == 1 and len(history) == 10
+    assert history.time_range() == (100.0, 109.0)
+
+    for i in [9, 2, 3, 7, 0, 5, 5, 1]:
+        timestamp, frame, origin = history.frame_at(100.0 + i + 0.5)
+        assert timestamp == 100.0 + i and origin == (0, 0)
+        assert np.array_equal(frame, frames[i])
+    assert history.frame_at(99.0) is None
+
+    # Returned frames are copies, so scrubbing on is not affected by callers
+    history.frame_at(104.0)[1][:] = 0
+    assert np.array_equal(history.frame_at(106.0)[1], frames[6])
+
+
+def test_unchanged_frames_are_not_stored():
+    history = FrameHistory(codec="zlib")
+    frames = make_frames(2)
+    history.add(frames[0], timestamp=1.0)
+    history.add(frames[0].copy(), timestamp=2.0)
+    history.add(frames[1], timestamp=3.0)
+    assert len(history) == 2
+    timestamp, frame, _ = history.frame_at(2.5)
+    assert timestamp == 1.0 and np.array_equal(frame, frames[0])
+
+
+def test_new_gop_on_interval_origin_or_size_change():
+    history = FrameHistory(codec="zlib", keyframe_interval=5.0)
+    frames = make_frames(4)
+    history.add(frames[0], timestamp=0.0)
+    history.add(frames[1], timestamp=1.0)
+    history.add(frames[2], timestamp=6.0)
+    assert history.stats()["gops"] == 2
+    history.add(frames[2], timestamp=7.0, origin=(-1920, 0))
+    assert history.stats()["gops"] == 3
+    history.add(frames[3][:96], timestamp=8.0, origin=(-1920, 0))
+    assert history.stats()["gops"] == 4
+
+    assert history.frame_at(1.5)[2] == (0, 0)
+    timestamp, frame, origin = history.frame_at(7.5)
+    assert (timestamp, origin) == (7.0, (-1920, 0)) and np.array_equal(frame, frames[2])
+    assert history.frame_at(9.0)[1].shape == (96, 256, 4)
+
+
+def test_oldest_gops_are_evicted_but_never_the_current_one():
+    frames = make_frames(6)
+    keyframe_bytes = FrameHistory(codec="zlib")
+    keyframe_bytes.add(frames[0], timestamp=0.0)
+    history = FrameHistory(codec="zlib", keyframe_interval=1.0,
+                           max_bytes=int(keyframe_bytes.nbytes * 2.5))
+    for i, frame in enumerate(frames):
+        history.add(frame, timestamp=float(i))
+        assert history.nbytes <= history.max_bytes
+    assert history.stats()["gops"] == 2
+    assert history.time_range() == (4.0, 5.0)
+    assert history.frame_at(3.5) is None
+    assert np.array_equal(history.frame_at(5.0)[1], frames[5])
+
+    tiny = FrameHistory(codec="zlib", max_bytes=1)
+    tiny.add(frames[0], timestamp=0.0)
+    assert tiny.stats()["gops"] == 1 and np.array_equal(tiny.frame_at(0.0)[1], frames[0])
+
+
+def test_add_async_stores_the_last_frame_and_stops_on_close():
+    history = FrameHistory(codec="zlib")
+    frames = make_frames(3)
+    for i, frame in enumerate(frames):
+        history.add_async(frame, timestamp=float(i))
+    history.close()
+    assert np.array_equal(history.frame_at(2.0)[1], frames[2])
+    assert len(history) + history.merged == 3
+
+    history.add_async(make_frames(1, seed=1)[0], timestamp=3.0)
+    assert history.time_range()[1] == 2.0
@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from action_history import ActionHistory
+from input_events import InputEventPipeline, WindowInfoCache
+from platform_backend import FakeBackend
+from window_registry import WindowRegistry
+
+
+def two_windows():
+    backend = FakeBackend()
+    backend.add_window(1, "Editor", 10, "code.exe")
+    backend.add_window(2, "Browser", 20, "firefox.exe")
+    return backend
+
+
+def test_window_cache_refetches_on_foreground_change_and_invalidate():
+    backend = two_windows()
+    cache = WindowInfoCache(backend, title_ttl=60)
+    assert cache.foreground_info() == ("Editor", "code.exe")
+    backend.calls.clear()
+
+    backend.windows[1]["title"] = "Editor - main.py"
+    assert cache.foreground_info() == ("Editor", "code.exe")
+    assert "window_title" not in backend.calls and "process_name" not in backend.calls
+
+    cache.invalidate(1)
+    assert cache.foreground_info() == ("Editor - main.py", "code.exe")
+    assert backend.calls["process_name"] == 1
+
+    backend.foreground = 2
+    assert cache.foreground_info() == ("Browser", "firefox.exe")
+    cache.invalidate()
+    backend.foreground = 1
+    assert cache.foreground_info() == ("Editor - main.py", "code.exe")
+
+
+def test_events_are_credited_to_the_window_in_front_when_they_happened():
+    backend = two_windows()
+    registry = WindowRegistry(backend)
+    registry.start()
+    history = ActionHistory(16)
+    pipeline = InputEventPipeline(backend, history, window_cache=registry)
+
+    pipeline.push("keyboard", {"key": "a"})
+    time.sleep(0.01)
+    backend.set_foreground(2)
+    pipeline.push("mouse", {"position": (5, 5), "button": "left"})
+    time.sleep(0.01)
+    backend.set_foreground(1)
+    pipeline.push("keyboard", {"key": "b"})
+
+    assert pipeline.process_pending() == 3
+    assert [(action.action_type, action.window_title, action.process_name)
+            for action in history.recent(3)] == [
+        ("keyboard", "Editor", "code.exe"),
+        ("mouse", "Browser", "firefox.exe"),
+        ("keyboard", "Editor", "code.exe"),
+    ]
+    assert pipeline.process_pending() == 0
+
+
+def test_failed_lookup_drops_the_batch_and_counts_it():
+    class FailingCache:
+        invalidated = 0
+
+        def foreground_infos(self, timestamps):
+            raise OSError("window is gone")
+
+        def invalidate(self, hwnd=None):
+            self.invalidated += 1
+
+    backend = two_windows()
+    history = ActionHistory(16)
+    counts = []
+    cache = FailingCache()
+    pipeline = InputEventPipeline(backend, history, on_actions=counts.append, window_cache=cache)
+    for key in "abc":
+        pipeline.push("keyboard", {"key": key})
+
+    assert pipeline.process_pending() == 0
+    assert pipeline.dropped == 3 and cache.invalidated == 1
+    assert len(history) == 0 and counts == []
+
+    pipeline.window_cache = WindowInfoCache(backend)
+    pipeline.push("keyboard", {"key": "d"})
+    assert pipeline.process_pending() == 1
+    assert counts == [1] and history.recent(1)[0].window_title == "Editor"
@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import sys
+from contextlib import closing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from journal import COMPACTED_VERSION, ActionJournal
+
+
+def segment_pragma(path, name):
+    with closing(sqlite3.connect(path)) as connection:
+        return connection.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+def test_flush_writes_one_wal_transaction_without_keys(tmp_path):
+    journal = ActionJournal(str(tmp_path), record_keys=False)
+    journal.record_actions([
+        (100.0, "keyboard", "Editor", "code.exe", {"key": "a"}),
+        (101.0, "mouse", "Editor", "code.exe", {"position": [1, 2], "button": "left"}),
+    ])
+    journal.record_snapshot("Editor", "print('hi')", rect=(0, 0, 10, 10), timestamp=102.0)
+
+    assert journal.flush() == 3
+    assert journal.flush() == 0
+    assert segment_pragma(journal.segments()[-1], "journal_mode") == "wal"
+
+    actions = journal.actions_before(200.0, 10)
+    assert [(action.action_type, action.extra_data) for action in actions] == [
+        ("keyboard", None), ("mouse", {"position": [1, 2], "button": "left"})]
+    snapshot, = journal.recent_snapshots()
+    assert (snapshot.window_title, snapshot.rect, snapshot.text) == ("Editor", (0, 0, 10, 10), "print('hi')")
+    journal.close()
+
+
+def test_record_keys_keeps_the_key(tmp_path):
+    journal = ActionJournal(str(tmp_path), record_keys=True)
+    journal.record_actions([(100.0, "keyboard", "Editor", "code.exe", {"key": "a"})])
+    journal.close()
+    assert journal.actions_before(200.0, 1)[0].extra_data == {"key": "a"}
+
+
+def test_rotation_compacts_duplicate_snapshots(tmp_path):
+    journal = ActionJournal(str(tmp_path), segment_bytes=1)
+    for ts, window, text in [(1, "Editor", "a"), (2, "Editor", "a"), (3, "Browser", "a"),
+                             (4, "Editor", "b"), (5, "Editor", "a"), (6, "Editor", "a")]:
+        journal.record_snapshot(window, text, timestamp=float(ts))
+    journal.flush()
+
+    first, active = journal.segments()
+    assert segment_pragma(first, "user_version") == COMPACTED_VERSION
+    assert segment_pragma(first, "journal_mode") == "delete"
+    assert segment_pragma(active, "user_version") == 0
+    assert [(s.window_title, s.text) for s in journal.recent_snapshots(10)] == [
+        ("Editor", "a"), ("Browser", "a"), ("Editor", "b"), ("Editor", "a")]
+
+    # Compacting twice is a no-op
+    journal.compact(first)
+    assert len(journal.recent_snapshots(10)) == 4
+    journal.close()
+
+
+def test_retention_deletes_oldest_segments_but_keeps_the_active_one(tmp_path):
+    journal = ActionJournal(str(tmp_path), segment_bytes=1)
+    journal.record_actions([(0.0, "click", "Editor", "code.exe", None)])
+    journal.flush()
+    # Room for one compacted segment next to the fresh active one
+    journal.max_bytes = journal.size_bytes()
+    for ts in range(1, 4):
+        journal.record_actions([(float(ts), "click", "Editor", "code.exe", None)])
+        journal.flush()
+        assert len(journal.segments()) == 2
+    assert [action.timestamp.timestamp() for action in journal.replay()] == [3.0]
+
+    journal.max_bytes = 1
+    journal.record_actions([(4.0, "click", "Editor", "code.exe", None)])
+    journal.flush()
+    assert journal.segments() == [journal._segment_path(journal._sequence)]
+    assert list(journal.replay()) == []
+    journal.close()
+
+
+def test_reopening_starts_a_new_segment(tmp_path):
+    journal = ActionJournal(str(tmp_path))
+    journal.record_actions([(1.0, "click", "Editor", "code.exe", None)])
+    journal.close()
+
+    reopened = ActionJournal(str(tmp_path))
+    reopened.record_actions([(2.0, "click", "Browser", "firefox.exe", None)])
+    reopened.flush()
+    assert len(reopened.segments()) == 2
+    assert [action.window_title for action in reopened.replay()] == ["Editor", "Browser"]
+    reopened.close()
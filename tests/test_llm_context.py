@@ -0,0 +1,71 @@
+import json
+import os
+import sys
+import threading
+import urllib.request
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from action_history import UserAction
+from llm_context import ContextBuilder, LLMService
+from llm_stub_server import serve_in_thread
+
+
+def sse_stream(base_url):
+    """LLMService stream function speaking the OpenAI streaming protocol over urllib"""
+    def stream(messages):
+        body = json.dumps({"model": "stub", "messages": messages, "stream": True}).encode("utf-8")
+        request = urllib.request.Request(base_url + "/chat/completions", data=body,
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            for raw in response:
+                line = raw.decode("utf-8").strip()
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                content = json.loads(line[len("data: "):])["choices"][0]["delta"].get("content")
+                if content:
+                    yield content
+    return stream
+
+
+def action(action_type, window):
+    return UserAction(datetime.now(), action_type, window, "")
+
+
+def test_identical_requests_share_one_completion_then_hit_the_cache():
+    server = serve_in_thread(0, delay=0.05)
+    try:
+        service = LLMService(stream=sse_stream(f"http://127.0.0.1:{server.server_port}/v1"))
+        context = ContextBuilder().build("What is open?", "Editor", "main.py\nprint('hi')")
+        answers, done = [], threading.Event()
+
+        def on_done(answer, cached):
+            answers.append((answer, cached))
+            if len(answers) == 2:
+                done.set()
+
+        service.ask(context, lambda chunk: None, on_done)
+        service.ask(context, lambda chunk: None, on_done)
+        assert done.wait(10)
+        assert server.completions == 1
+        assert answers[0] == answers[1] and answers[0][0].startswith("Stub answer")
+
+        cached = []
+        service.ask(context, lambda chunk: None, lambda answer, hit: cached.append((answer, hit)))
+        assert cached == [(answers[0][0], True)]
+        assert server.completions == 1
+        assert service.stats()["hits"] == 1 and service.stats()["coalesced"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_key_ignores_own_window_and_run_counts():
+    builder = ContextBuilder(exclude_windows=["Screen Assistant"])
+    actions = [action("click", "Editor"), action("key_press", "Editor")]
+    key = builder.build("Why?", "Editor", "text", actions).key
+    more = actions + [action("key_press", "Editor"), action("click", "Screen Assistant")]
+    assert builder.build("Why?", "Editor", "text", more).key == key
+    assert builder.build("Why?", "Editor", "other text", actions).key != key
+    assert builder.build("Why?", "Editor", "text", actions + [action("click", "Browser")]).key != key
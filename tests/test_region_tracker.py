@@ -0,0 +1,90 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from benchmark import install_platform_stubs, make_stub_engine
+
+install_platform_stubs()
+
+from context_manager import ContextManager
+from platform_backend import FakeBackend
+from region_tracker import RegionTracker
+
+HEIGHT = 480
+SCROLL = 80
+
+
+def make_page():
+    """A long white document with a line of text every 40 px"""
+    page = np.full((1600, 640, 4), 255, dtype=np.uint8)
+    for i in range(38):
+        cv2.putText(page, f"line {i} some text here", (20, 30 + 40 * i),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0, 255), 2)
+    return page
+
+
+def boxes(regions):
+    return [tuple(int(v) for v in row) for row in
+            zip(regions.data["x"], regions.data["y"], regions.data["width"], regions.data["height"])]
+
+
+def make_tracker():
+    context_manager = ContextManager(ocr_engine=make_stub_engine(), backend=FakeBackend(),
+                                     start_tracking=False)
+    return context_manager, RegionTracker(context_manager)
+
+
+def test_scrolled_regions_keep_their_ids_and_only_the_new_strip_is_new():
+    context_manager, tracker = make_tracker()
+    page = make_page()
+    first = tracker.update(page[:HEIGHT].copy(), "editor")
+    assert first.offset == (0, 0) and first.reused == 0 and first.new_text
+
+    second = tracker.update(page[SCROLL:SCROLL + HEIGHT].copy(), "editor")
+    assert second.offset == (0, -SCROLL)
+    assert second.reused > 0
+
+    previous_ids = {(x, y - SCROLL, w, h): region_id
+                    for (x, y, w, h), region_id in zip(boxes(first.regions), first.ids)}
+    carried = [previous_ids.get(box) for box in boxes(second.regions)]
+    strip_top = min(y for _, y, _, _ in second.dirty_rects)
+    assert strip_top >= HEIGHT - SCROLL - tracker.detector.tile_size
+    for box, region_id, previous_id in zip(boxes(second.regions), second.ids, carried):
+        if previous_id is not None:
+            assert region_id == previous_id
+        else:
+            # Only regions in the strip scrolled into view are new
+            assert box[1] >= strip_top and region_id > first.ids.max()
+    assert sum(region_id is not None for region_id in carried) == second.reused
+    assert len(set(second.ids.tolist())) == len(second.ids)
+    assert 0 < len(second.new_text) < len(first.new_text)
+
+    # The tracker never touches the live analysis state
+    assert len(context_manager.active_regions) == 0
+
+
+def test_unchanged_frame_reuses_everything():
+    _, tracker = make_tracker()
+    frame = make_page()[:HEIGHT].copy()
+    first = tracker.update(frame, "editor")
+    again = tracker.update(frame.copy(), "editor")
+    assert again.offset == (0, 0) and again.new_text == [] and again.dirty_rects == []
+    assert again.reused == len(first.regions)
+    assert np.array_equal(again.ids, first.ids)
+
+
+def test_windows_are_tracked_separately_and_forget_restarts():
+    _, tracker = make_tracker()
+    page = make_page()
+    editor = tracker.update(page[:HEIGHT].copy(), "editor")
+    browser = tracker.update(page[400:400 + HEIGHT].copy(), "browser")
+    assert not set(editor.ids.tolist()) & set(browser.ids.tolist())
+    assert tracker.update(page[:HEIGHT].copy(), "editor").new_text == []
+
+    tracker.forget("editor")
+    restarted = tracker.update(page[:HEIGHT].copy(), "editor")
+    assert restarted.reused == 0 and restarted.ids.min() > browser.ids.max()
@@ -0,0 +1,97 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from text_index import TextIndex
+
+
+def add_screen(index, line, window, timestamp):
+    """Index one screen whose words sit side by side, 50 px apart"""
+    words = line.split()
+    boxes = np.asarray([(i * 50, 10, 40, 12) for i in range(len(words))])
+    return index.add_words(words, boxes, window, window.lower() + ".exe", timestamp)
+
+
+def fill(index):
+    add_screen(index, "def parse_config path", "Editor", 100.0)
+    add_screen(index, "parser error in config file", "Terminal", 200.0)
+    add_screen(index, "config file reference docs", "Browser", 300.0)
+
+
+def titles(hits):
+    return [hit.window_title for hit in hits]
+
+
+def check_queries(index):
+    assert titles(index.search("config")) == ["Browser", "Terminal"]
+    assert titles(index.search("pars*")) == ["Terminal", "Editor"]
+    assert titles(index.search('"config file"')) == ["Browser", "Terminal"]
+    assert titles(index.search('"file config"')) == []
+    assert titles(index.search('"error in conf*"')) == ["Terminal"]
+    assert titles(index.search('file "reference docs"')) == ["Browser"]
+    assert titles(index.search("config", window_title="Terminal")) == ["Terminal"]
+    assert titles(index.search("config", since=250.0)) == ["Browser"]
+    # The box is that of the first matched word
+    assert index.search('"config file"', window_title="Terminal")[0].bbox == (150, 10, 40, 12)
+
+
+def test_prefix_and_phrase_queries_in_memory():
+    index = TextIndex()
+    fill(index)
+    check_queries(index)
+    assert index.search("missing") == [] and index.search("") == []
+
+
+def test_duplicate_screen_bumps_last_seen():
+    index = TextIndex()
+    fill(index)
+    assert add_screen(index, "def parse_config path", "Editor", 400.0) == 0
+    assert len(index) == 3
+    hit = index.search("parse_config")[0]
+    assert (hit.first_seen, hit.timestamp) == (100.0, 400.0)
+
+
+def test_results_survive_flush_merge_and_reopen(tmp_path):
+    index = TextIndex(str(tmp_path), flush_interval=0)
+    add_screen(index, "def parse_config path", "Editor", 100.0)
+    index.flush()
+    add_screen(index, "parser error in config file", "Terminal", 200.0)
+    index.flush()
+    add_screen(index, "config file reference docs", "Browser", 300.0)
+    assert index.memory_postings == 4
+    check_queries(index)
+
+    index.flush()
+    assert len(index._segments) == 3 and index.memory_postings == 0
+    check_queries(index)
+
+    # A repeat of an on-disk screen only updates its last-seen time
+    add_screen(index, "parser error in config file", "Terminal", 500.0)
+    assert titles(index.search("config")) == ["Terminal", "Browser"]
+
+    index.merge()
+    assert len(index._segments) == 1
+    assert sorted(os.listdir(tmp_path)) == ["manifest.json", "seg-000004"]
+    assert titles(index.search("config")) == ["Terminal", "Browser"]
+    assert titles(index.search("pars*")) == ["Terminal", "Editor"]
+    index.close()
+
+    reopened = TextIndex(str(tmp_path), flush_interval=0)
+    assert len(reopened) == 3
+    assert titles(reopened.search("config")) == ["Terminal", "Browser"]
+    assert titles(reopened.search('"error in conf*"')) == ["Terminal"]
+    reopened.close()
+
+
+def test_flush_merges_once_there_are_too_many_segments(tmp_path):
+    index = TextIndex(str(tmp_path), max_segments=2, flush_interval=0)
+    for i in range(4):
+        add_screen(index, f"screen number{i} shared", f"Window {i}", float(i))
+        index.flush()
+        assert len(index._segments) <= 2
+    assert titles(index.search("shared")) == ["Window 3", "Window 2", "Window 1", "Window 0"]
+    assert titles(index.search("number*", limit=2)) == ["Window 3", "Window 2"]
+    index.close()
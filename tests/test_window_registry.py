@@ -0,0 +1,94 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from platform_backend import FakeBackend
+from window_registry import WindowRegistry
+
+
+def started_registry(backend):
+    registry = WindowRegistry(backend)
+    diffs = []
+    registry.listeners.append(diffs.append)
+    assert registry.start()
+    return registry, diffs
+
+
+def test_refresh_reports_added_removed_and_renamed_windows():
+    backend = FakeBackend()
+    backend.add_window(1, "Editor", 10, "code.exe")
+    backend.add_window(2, "Browser", 20, "firefox.exe")
+    registry = WindowRegistry(backend)
+    diffs = []
+    registry.listeners.append(diffs.append)
+
+    registry.refresh()
+    assert [info.hwnd for info in diffs[-1].added] == [1, 2]
+
+    backend.windows[1]["title"] = "Editor - main.py"
+    del backend.windows[2]
+    backend.windows[3] = dict(backend.windows[1], title="Terminal", pid=30)
+    backend.processes[30] = "cmd.exe"
+    backend.process_started[30] = 5.0
+    registry.refresh()
+    diff = diffs[-1]
+    assert [info.hwnd for info in diff.added] == [3]
+    assert diff.removed == [2]
+    assert [info.title for info in diff.renamed] == ["Editor - main.py"]
+    assert [info.title for info in registry.windows()] == ["Editor - main.py", "Terminal"]
+
+    count = len(diffs)
+    registry.refresh()
+    assert len(diffs) == count
+
+
+def test_window_events_update_single_entries():
+    backend = FakeBackend()
+    backend.add_window(1, "Editor", 10, "code.exe")
+    registry, diffs = started_registry(backend)
+
+    backend.add_window(2, "Browser", 20, "firefox.exe")
+    assert [info.title for info in diffs[-1].added] == ["Browser"]
+    backend.set_title(2, "Browser - docs")
+    assert [info.title for info in diffs[-1].renamed] == ["Browser - docs"]
+    backend.set_visible(2, False)
+    assert diffs[-1].removed == [2] and 2 not in registry
+    backend.set_visible(2, True)
+    assert 2 in registry
+    backend.remove_window(2)
+    assert diffs[-1].removed == [2] and len(registry) == 1
+
+    backend.set_foreground(1)
+    backend.calls.clear()
+    assert registry.foreground_info() == ("Editor", "code.exe")
+    assert backend.calls == {}
+
+
+def test_reused_pid_gets_the_new_process_name():
+    backend = FakeBackend()
+    backend.add_window(1, "Editor", 10, "code.exe")
+    registry, diffs = started_registry(backend)
+
+    backend.remove_window(1)
+    backend.add_window(2, "Terminal", 10, "cmd.exe")
+    assert registry.get(2).process_name == "cmd.exe"
+
+    # Same handle handed to another process
+    backend.add_window(3, "Viewer", 40, "viewer.exe")
+    backend.windows[3]["pid"] = 10
+    backend.set_title(3, "Viewer")
+    assert [(info.pid, info.process_name) for info in diffs[-1].renamed] == [(10, "cmd.exe")]
+
+
+def test_renames_do_not_query_the_process():
+    backend = FakeBackend()
+    backend.add_window(1, "Editor", 10, "code.exe")
+    registry, _ = started_registry(backend)
+    backend.calls.clear()
+
+    for index in range(5):
+        backend.set_title(1, f"Editor {index}")
+    assert registry.get(1).process_name == "code.exe"
+    assert "process_create_time" not in backend.calls
+    assert "process_name" not in backend.calls